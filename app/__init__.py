@@ -2,11 +2,26 @@
 Flask application factory for Hostel Manager
 """
 
+import time
+
 from flask import Flask
-from app.database.connection import init_db
+from app.database.connection import init_db, init_app as init_db_pool
+from app.utils.profiler import init_app as init_profiler
 
-def create_app():
-    """Create and configure the Flask application"""
+def create_app(start_background=True):
+    """
+    Create and configure the Flask application
+    
+    Args:
+        start_background: Start the job worker threads now. A pre-forking
+            server passes False and calls start_background() in each worker,
+            since threads do not survive fork().
+    
+    Returns:
+        Flask app; app.config['STARTUP_TIMINGS'] holds seconds per startup phase
+    """
+    started = time.perf_counter()
+    timings = {}
     app = Flask(__name__, template_folder='templates', static_folder='static')
     
     # Configuration
@@ -14,8 +29,20 @@ def create_app():
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
     
-    # Initialize database
+    # Initialize database and per-request connection handling
     init_db()
+    timings['init_db'] = time.perf_counter() - started
+    init_db_pool(app)
+    init_profiler(app)
+    
+    # Settings are read from memory; writes and other processes refresh them
+    from app.utils.settings_store import load_settings
+    load_settings()
+    
+    # Load room vacancies once; allocations keep the index up to date
+    from app.utils.vacancy_index import get_vacancy_index
+    get_vacancy_index().rebuild()
+    timings['caches'] = time.perf_counter() - started - timings['init_db']
     
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -24,6 +51,9 @@ def create_app():
     from app.routes.rooms import rooms_bp
     from app.routes.installments import installments_bp
     from app.routes.settings import settings_bp
+    from app.routes.jobs import jobs_bp
+    from app.routes.api import api_bp
+    from app.routes.metrics import metrics_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
@@ -31,5 +61,22 @@ def create_app():
     app.register_blueprint(rooms_bp)
     app.register_blueprint(installments_bp)
     app.register_blueprint(settings_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(metrics_bp)
+    
+    # Register background job handlers, then start the worker threads
+    from app.utils import email_service, student_import  # noqa: F401
+    from app.utils.installment_manager import schedule_aging_job
+    schedule_aging_job()
+    if start_background:
+        start_background_workers()
     
+    timings['total'] = time.perf_counter() - started
+    app.config['STARTUP_TIMINGS'] = {phase: round(seconds, 4) for phase, seconds in timings.items()}
     return app
+
+def start_background_workers():
+    """Start this process's job worker threads"""
+    from app.utils.job_queue import start_workers
+    start_workers()
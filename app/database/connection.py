@@ -1,26 +1,461 @@
 """
 Database connection utility for Hostel Manager
-Handles SQLite database initialization and connection
+Handles SQLite database initialization and connection pooling
 """
 
 import sqlite3
 import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
+import config
 
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'hostel_manager.db')
 
-def get_db_connection():
+# Pragmas that may be set from config.SQLITE_PRAGMAS, in the order they are applied.
+# journal_mode comes first because it decides how the others behave.
+SUPPORTED_PRAGMAS = ('journal_mode', 'busy_timeout', 'synchronous', 'cache_size',
+                     'mmap_size', 'temp_store')
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,
+    'mmap_size': 134217728,
+    'temp_store': 'MEMORY',
+}
+
+# Optional instrumentation (see app.utils.profiler): a cursor class used for
+# every statement and a callback run on every pool checkout. Both are None
+# unless profiling is enabled, so the normal path pays nothing.
+_cursor_factory = None
+_checkout_listener = None
+
+
+def set_instrumentation(cursor_factory=None, checkout_listener=None):
+    """Install (or with no arguments remove) the statement and checkout hooks"""
+    global _cursor_factory, _checkout_listener
+    _cursor_factory = cursor_factory
+    _checkout_listener = checkout_listener
+
+
+def get_pragma_profile():
     """
-    Get a connection to the SQLite database with foreign keys enabled
-    
+    Get the pragma profile configured for new connections
+
     Returns:
-        sqlite3.Connection object
+        List of (pragma, value) tuples in the order they are applied
+
+    Raises:
+        ValueError if the profile names an unsupported pragma or bad value
     """
-    conn = sqlite3.connect(DATABASE_PATH)
+    profile = getattr(config, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+
+    unknown = [name for name in profile if name not in SUPPORTED_PRAGMAS]
+    if unknown:
+        raise ValueError(f"Unsupported SQLite pragma(s): {', '.join(unknown)}")
+
+    result = []
+    for name in SUPPORTED_PRAGMAS:
+        if name not in profile or profile[name] is None:
+            continue
+        value = profile[name]
+        # Values are interpolated into the PRAGMA statement, so only allow
+        # integers and bare keywords such as WAL or NORMAL
+        if not isinstance(value, int) and not str(value).isalpha():
+            raise ValueError(f"Invalid value for PRAGMA {name}: {value!r}")
+        result.append((name, value))
+    return result
+
+
+def apply_pragmas(conn):
+    """Apply the configured pragma profile to a new connection"""
     # Enable foreign key constraints for cascading deletes
     conn.execute("PRAGMA foreign_keys = ON")
+    for name, value in get_pragma_profile():
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+
+def read_pragmas(conn):
+    """Read back the effective pragma values of a connection"""
+    values = {'foreign_keys': conn.execute("PRAGMA foreign_keys").fetchone()[0]}
+    for name in SUPPORTED_PRAGMAS:
+        row = conn.execute(f"PRAGMA {name}").fetchone()
+        values[name] = row[0] if row else None
+    return values
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    SQLite connection that goes back to its pool instead of closing
+
+    Existing helpers call conn.close() when they are done; for a pooled
+    connection that hands it back for reuse. A connection bound to the
+    current Flask app context stays open until the context tears down;
+    close() rolls back uncommitted work and lets the next helper have it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.request_scoped = False
+        self.checked_out = False
+        # Handed out by get_db_connection() and not yet closed
+        self.in_use = False
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = _cursor_factory or sqlite3.Cursor
+        return super().cursor(factory)
+
+    # The C shortcuts below bypass cursor(), so route them through it while
+    # instrumentation is installed
+    def execute(self, sql, parameters=()):
+        if _cursor_factory is None:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if _cursor_factory is None:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        if _cursor_factory is None:
+            return super().executescript(sql_script)
+        return self.cursor().executescript(sql_script)
+
+    def close(self):
+        if self.request_scoped:
+            # A real close() used to discard uncommitted work; do the same
+            # before the next helper in this context gets the connection
+            if self.in_transaction:
+                self.rollback()
+            self.in_use = False
+            return
+        if self.pool is not None and self.checked_out:
+            self.pool.release(self)
+        elif self.pool is None:
+            super().close()
+
+    def really_close(self):
+        """Close the underlying SQLite handle"""
+        super().close()
+
+    def __del__(self):
+        # A helper that returned early without close() must not leak its slot
+        if getattr(self, 'checked_out', False) and self.pool is not None:
+            self.pool.release(self)
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of pre-configured SQLite connections
+
+    Connections are created lazily up to max_size. When all of them are
+    checked out, callers wait up to `timeout` seconds for one to be released.
+    """
+
+    def __init__(self, database_path, max_size=5, timeout=10.0):
+        self.database_path = database_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, factory=PooledConnection,
+                               check_same_thread=False)
+        try:
+            apply_pragmas(conn)
+        except Exception:
+            conn.really_close()
+            raise
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        """
+        Check a connection out of the pool
+
+        Returns:
+            PooledConnection object
+
+        Raises:
+            TimeoutError if no connection is released within the timeout
+        """
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats['hits'] += 1
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.max_size:
+                    self._created += 1
+                    self._stats['misses'] += 1
+                    create = True
+                else:
+                    self._stats['waits'] += 1
+                    create = False
+
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise TimeoutError(
+                        f"No database connection available within {self.timeout}s")
+
+        conn.checked_out = True
+        if _checkout_listener is not None:
+            _checkout_listener(conn)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any uncommitted work"""
+        if not conn.checked_out:
+            return
+        conn.checked_out = False
+        conn.request_scoped = False
+        conn.in_use = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            # Broken connection: drop it and free its slot
+            with self._lock:
+                self._created -= 1
+            conn.really_close()
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown and in tests)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            conn.really_close()
+
+    def stats(self):
+        """Get pool counters and current sizing"""
+        with self._lock:
+            result = dict(self._stats)
+            result['size'] = self._created
+        result['idle'] = self._idle.qsize()
+        result['max_size'] = self.max_size
+        return result
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None or _pool.database_path != DATABASE_PATH:
+        with _pool_lock:
+            if _pool is None or _pool.database_path != DATABASE_PATH:
+                if _pool is not None:
+                    _pool.close_all()
+                _pool = ConnectionPool(
+                    DATABASE_PATH,
+                    max_size=getattr(config, 'DB_POOL_SIZE', 5),
+                    timeout=getattr(config, 'DB_POOL_TIMEOUT', 10.0)
+                )
+    return _pool
+
+
+def reset_pool():
+    """Close idle connections and drop the pool; the next get_pool() builds a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+
+
+# Pools inherited across fork() are kept referenced so their SQLite handles
+# are never used or closed by the child
+_inherited_pools = []
+
+
+def _abandon_pool_after_fork():
+    global _pool, _pool_lock
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_abandon_pool_after_fork)
+
+
+def open_read_only_connection():
+    """
+    Open a read-only connection that does not come from the pool
+
+    For long-lived readers such as streamed downloads, which would otherwise
+    hold a pool slot for as long as the client takes to receive the data.
+    The caller must close it.
+
+    Returns:
+        sqlite3.Connection object
+    """
+    path = os.path.abspath(DATABASE_PATH)
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    try:
+        for name, value in get_pragma_profile():
+            # The journal mode is a property of the database file and
+            # synchronous only affects writes
+            if name not in ('journal_mode', 'synchronous'):
+                conn.execute(f"PRAGMA {name} = {value}").fetchall()
+    except Exception:
+        conn.close()
+        raise
     return conn
 
+
+def get_pool_stats():
+    """Get hit/miss/wait counters for the connection pool"""
+    return get_pool().stats()
+
+
+def get_database_diagnostics():
+    """
+    Get connection pool and pragma information for the diagnostics page
+
+    Returns:
+        Dictionary with database path, SQLite version, effective pragmas and pool stats
+    """
+    conn = get_db_connection()
+    try:
+        pragmas = read_pragmas(conn)
+    finally:
+        conn.close()
+
+    return {
+        'database_path': os.path.abspath(DATABASE_PATH),
+        'sqlite_version': sqlite3.sqlite_version,
+        'configured_pragmas': dict(get_pragma_profile()),
+        'effective_pragmas': pragmas,
+        'pool': get_pool_stats()
+    }
+
+
+def get_db_connection():
+    """
+    Get a connection to the SQLite database with foreign keys enabled
+
+    Inside a Flask app context the same pooled connection is reused for the
+    whole request; outside one (scripts, background threads) a connection is
+    checked out of the pool and returned on close().
+
+    While a helper still has the request's connection open (including one
+    that returned without closing it), further calls get a connection of
+    their own, so a nested helper can never change the outer one's row
+    factory or roll back its transaction.
+
+    Returns:
+        sqlite3.Connection object
+    """
+    if has_app_context():
+        conn = g.get('db_conn')
+        if conn is None:
+            conn = get_pool().acquire()
+            conn.request_scoped = True
+            g.db_conn = conn
+        elif conn.in_use:
+            return get_pool().acquire()
+        conn.in_use = True
+        # Helpers expect a fresh connection with the default row factory
+        conn.row_factory = None
+        return conn
+
+    return get_pool().acquire()
+
+
+@contextmanager
+def write_transaction(conn):
+    """
+    Run a block inside BEGIN IMMEDIATE ... COMMIT
+
+    IMMEDIATE takes SQLite's write lock before the first read, so a
+    read-then-write sequence (e.g. check a room has space, then fill it)
+    cannot interleave with another writer. Rolls back if the block raises.
+
+    If the connection is already inside a transaction the block runs in a
+    SAVEPOINT instead: its own work is undone if it raises, and committing
+    or rolling back the outer transaction is left to whoever started it.
+
+    Usage:
+        with write_transaction(conn):
+            conn.execute(...)
+    """
+    if conn.in_transaction:
+        # sqlite3 only opens a transaction implicitly on a write, so the
+        # write lock is already held and the block stays serialised
+        conn.execute('SAVEPOINT write_transaction')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK TO SAVEPOINT write_transaction')
+            conn.execute('RELEASE SAVEPOINT write_transaction')
+            raise
+        conn.execute('RELEASE SAVEPOINT write_transaction')
+        return
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def release_request_connection(exception=None):
+    """Return the app context's connection to the pool"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.request_scoped = False
+        get_pool().release(conn)
+
+
+def init_app(app):
+    """Register connection pool hooks on the Flask app"""
+    app.teardown_appcontext(release_request_connection)
+
+
 def init_db():
-    """Initialize the database with all tables"""
+    """Initialize the database with all tables and apply pending migrations"""
     from app.database.models import Student
+    from app.database.migrations import upgrade
     Student.create_table()
+
+    conn = get_db_connection()
+    try:
+        upgrade(conn)
+    finally:
+        conn.close()
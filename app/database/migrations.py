@@ -0,0 +1,662 @@
+"""
+Schema migrations for Hostel Manager
+Applies versioned, ordered schema changes on top of the base tables
+"""
+
+from datetime import datetime
+
+
+def _migration_0001_hot_query_indexes(cursor):
+    """Index the columns used by room occupancy joins, due-date scans and list ordering"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_room_allocation
+        ON students(room_allocation)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_registration_date
+        ON students(registration_date)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_installments_due_date
+        ON installments(due_date)
+    ''')
+    # Expression index: matches the LOWER(payment_status) = '...' predicates
+    # in installment_manager so they become index seeks ordered by due date
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_installments_status_due
+        ON installments(LOWER(payment_status), due_date)
+    ''')
+
+
+def _migration_0002_student_keyset_indexes(cursor):
+    """Composite indexes for keyset pagination of the students list"""
+    # Supersedes idx_students_registration_date: the aadhaar tie-breaker lets
+    # "(registration_date, aadhaar_number) < (?, ?)" seek straight to a page
+    cursor.execute('DROP INDEX IF EXISTS idx_students_registration_date')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_registration_keyset
+        ON students(registration_date, aadhaar_number)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_name_keyset
+        ON students(full_name, aadhaar_number)
+    ''')
+
+
+def fts5_supported(cursor):
+    """Check whether this SQLite build includes the FTS5 extension"""
+    cursor.execute('PRAGMA compile_options')
+    return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def _migration_0003_student_search_index(cursor):
+    """FTS5 index over the searchable student columns, kept in sync by triggers"""
+    if not fts5_supported(cursor):
+        # Student.search_students falls back to LIKE matching; upgrade()
+        # builds the index later if SQLite gains FTS5 (ensure_search_index)
+        return
+    _create_student_search_index(cursor)
+
+
+def _create_student_search_index(cursor):
+    """Create students_fts with its sync triggers and index existing students"""
+    # External-content table: the text lives in students, the index maps
+    # tokens to students.rowid
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+            full_name, admission_number, aadhaar_number, email,
+            content='students', content_rowid='rowid',
+            tokenize='unicode61'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students
+        BEGIN
+            INSERT INTO students_fts(rowid, full_name, admission_number, aadhaar_number, email)
+            VALUES (new.rowid, new.full_name, new.admission_number, new.aadhaar_number, new.email);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students
+        BEGIN
+            INSERT INTO students_fts(students_fts, rowid, full_name, admission_number,
+                                     aadhaar_number, email)
+            VALUES ('delete', old.rowid, old.full_name, old.admission_number,
+                    old.aadhaar_number, old.email);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_update
+        AFTER UPDATE OF full_name, admission_number, aadhaar_number, email ON students
+        BEGIN
+            INSERT INTO students_fts(students_fts, rowid, full_name, admission_number,
+                                     aadhaar_number, email)
+            VALUES ('delete', old.rowid, old.full_name, old.admission_number,
+                    old.aadhaar_number, old.email);
+            INSERT INTO students_fts(rowid, full_name, admission_number, aadhaar_number, email)
+            VALUES (new.rowid, new.full_name, new.admission_number, new.aadhaar_number, new.email);
+        END
+    ''')
+    # Index students that existed before this migration
+    cursor.execute("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+
+
+def _migration_0004_jobs_table(cursor):
+    """Table backing the background job queue"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after TEXT NOT NULL,
+            progress_current INTEGER NOT NULL DEFAULT 0,
+            progress_total INTEGER,
+            result TEXT,
+            error TEXT,
+            locked_by TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    # Workers poll for the oldest due job in 'queued'
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after
+        ON jobs(status, run_after)
+    ''')
+
+
+def _migration_0005_room_occupancy_counters(cursor):
+    """Resync rooms.occupied_count and index rooms that still have a free bed"""
+    # occupied_count was not maintained before; rebuild it from allocations
+    cursor.execute('''
+        UPDATE rooms SET occupied_count = (
+            SELECT COUNT(*) FROM students WHERE students.room_allocation = rooms.room_number
+        )
+    ''')
+    # Partial index: "WHERE occupied_count < capacity" finds a free room
+    # without looking at full ones
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_rooms_vacant
+        ON rooms(room_number) WHERE occupied_count < capacity
+    ''')
+
+
+def _migration_0006_room_occupancy_triggers(cursor):
+    """Keep rooms.occupied_count in step with students.room_allocation using triggers"""
+    # Rows whose room_allocation is 'Not Allocated' (or names no room) match
+    # no room, so the counter updates are simply no-ops for them
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_room_insert AFTER INSERT ON students
+        WHEN new.room_allocation IS NOT NULL
+        BEGIN
+            UPDATE rooms SET occupied_count = occupied_count + 1
+            WHERE room_number = new.room_allocation;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_room_delete AFTER DELETE ON students
+        WHEN old.room_allocation IS NOT NULL
+        BEGIN
+            UPDATE rooms SET occupied_count = MAX(occupied_count - 1, 0)
+            WHERE room_number = old.room_allocation;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_room_update
+        AFTER UPDATE OF room_allocation ON students
+        WHEN old.room_allocation IS NOT new.room_allocation
+        BEGIN
+            UPDATE rooms SET occupied_count = MAX(occupied_count - 1, 0)
+            WHERE room_number = old.room_allocation;
+            UPDATE rooms SET occupied_count = occupied_count + 1
+            WHERE room_number = new.room_allocation;
+        END
+    ''')
+    # Start from exact counts
+    cursor.execute('''
+        UPDATE rooms SET occupied_count = (
+            SELECT COUNT(*) FROM students WHERE students.room_allocation = rooms.room_number
+        )
+    ''')
+
+
+# Ledger recompute as shipped in migration 7, before partial payments
+# (installments.amount_paid) existed. Kept so that migration still runs on a
+# fresh database; LEDGER_RECOMPUTE_SQL below is the current version.
+_LEDGER_RECOMPUTE_SQL_0007 = '''
+    UPDATE student_ledger SET (
+        installments_total, installments_paid, installments_pending,
+        amount_total, amount_paid, amount_pending,
+        next_due_date, overdue_count, overdue_amount, overdue_as_of
+    ) = (
+        SELECT COUNT(*),
+               COALESCE(SUM(LOWER(payment_status) = 'paid'), 0),
+               COALESCE(SUM(LOWER(payment_status) = 'pending'), 0),
+               COALESCE(SUM(amount), 0),
+               COALESCE(SUM(CASE WHEN LOWER(payment_status) = 'paid' THEN amount ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN LOWER(payment_status) = 'pending' THEN amount ELSE 0 END), 0),
+               MIN(CASE WHEN LOWER(payment_status) = 'pending' THEN due_date END),
+               COALESCE(SUM(LOWER(payment_status) = 'pending'
+                            AND due_date < date('now', 'localtime')), 0),
+               COALESCE(SUM(CASE WHEN LOWER(payment_status) = 'pending'
+                                  AND due_date < date('now', 'localtime')
+                                 THEN amount ELSE 0 END), 0),
+               date('now', 'localtime')
+        FROM installments WHERE aadhaar_number = {key}
+    )
+'''
+
+LEDGER_SUM_COLUMNS = ('installments_total', 'installments_paid', 'installments_pending',
+                      'amount_total', 'amount_paid', 'amount_pending',
+                      'overdue_count', 'overdue_amount')
+
+
+def _migration_0007_payment_ledger(cursor):
+    """Per-student payment ledger and a global rollup row, maintained by triggers"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_ledger (
+            aadhaar_number TEXT PRIMARY KEY
+                REFERENCES students(aadhaar_number) ON DELETE CASCADE,
+            installments_total INTEGER NOT NULL DEFAULT 0,
+            installments_paid INTEGER NOT NULL DEFAULT 0,
+            installments_pending INTEGER NOT NULL DEFAULT 0,
+            amount_total REAL NOT NULL DEFAULT 0,
+            amount_paid REAL NOT NULL DEFAULT 0,
+            amount_pending REAL NOT NULL DEFAULT 0,
+            next_due_date TEXT,
+            overdue_count INTEGER NOT NULL DEFAULT 0,
+            overdue_amount REAL NOT NULL DEFAULT 0,
+            overdue_as_of TEXT
+        )
+    ''')
+    # The daily overdue refresh only visits students with a past due date
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_student_ledger_next_due
+        ON student_ledger(next_due_date)
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS ledger_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            students INTEGER NOT NULL DEFAULT 0,
+            {', '.join(f"{column} {'REAL' if 'amount' in column else 'INTEGER'} NOT NULL DEFAULT 0"
+                       for column in LEDGER_SUM_COLUMNS)}
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO ledger_totals (id) VALUES (1)')
+
+    # Rollup: every change to a ledger row is applied to the totals as a delta
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_ledger_totals_insert AFTER INSERT ON student_ledger
+        BEGIN
+            UPDATE ledger_totals SET students = students + 1,
+                {', '.join(f"{c} = {c} + new.{c}" for c in LEDGER_SUM_COLUMNS)}
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_ledger_totals_update AFTER UPDATE ON student_ledger
+        BEGIN
+            UPDATE ledger_totals SET
+                {', '.join(f"{c} = {c} + new.{c} - old.{c}" for c in LEDGER_SUM_COLUMNS)}
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_ledger_totals_delete AFTER DELETE ON student_ledger
+        BEGIN
+            UPDATE ledger_totals SET students = students - 1,
+                {', '.join(f"{c} = {c} - old.{c}" for c in LEDGER_SUM_COLUMNS)}
+            WHERE id = 1;
+        END
+    ''')
+
+    # Every student gets a ledger row; the FK cascade removes it with them
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_ledger_insert AFTER INSERT ON students
+        BEGIN
+            INSERT OR IGNORE INTO student_ledger (aadhaar_number, overdue_as_of)
+            VALUES (new.aadhaar_number, date('now', 'localtime'));
+        END
+    ''')
+    # New installments are added as deltas (the bulk schedule path); updates
+    # and deletes recompute the student's few rows
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS installments_ledger_insert AFTER INSERT ON installments
+        BEGIN
+            UPDATE student_ledger SET
+                installments_total = installments_total + 1,
+                installments_paid = installments_paid + (LOWER(new.payment_status) = 'paid'),
+                installments_pending = installments_pending + (LOWER(new.payment_status) = 'pending'),
+                amount_total = amount_total + new.amount,
+                amount_paid = amount_paid
+                    + CASE WHEN LOWER(new.payment_status) = 'paid' THEN new.amount ELSE 0 END,
+                amount_pending = amount_pending
+                    + CASE WHEN LOWER(new.payment_status) = 'pending' THEN new.amount ELSE 0 END,
+                next_due_date = CASE
+                    WHEN LOWER(new.payment_status) = 'pending'
+                         AND (next_due_date IS NULL OR new.due_date < next_due_date)
+                    THEN new.due_date ELSE next_due_date END,
+                overdue_count = overdue_count + (LOWER(new.payment_status) = 'pending'
+                                                 AND new.due_date < date('now', 'localtime')),
+                overdue_amount = overdue_amount
+                    + CASE WHEN LOWER(new.payment_status) = 'pending'
+                                AND new.due_date < date('now', 'localtime')
+                           THEN new.amount ELSE 0 END
+            WHERE aadhaar_number = new.aadhaar_number;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS installments_ledger_update
+        AFTER UPDATE OF aadhaar_number, due_date, amount, payment_status ON installments
+        BEGIN
+            {_LEDGER_RECOMPUTE_SQL_0007.format(key='new.aadhaar_number')}
+            WHERE aadhaar_number = new.aadhaar_number;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS installments_ledger_delete AFTER DELETE ON installments
+        BEGIN
+            {_LEDGER_RECOMPUTE_SQL_0007.format(key='old.aadhaar_number')}
+            WHERE aadhaar_number = old.aadhaar_number;
+        END
+    ''')
+
+    # Backfill existing students
+    cursor.execute('''
+        INSERT OR IGNORE INTO student_ledger (aadhaar_number)
+        SELECT aadhaar_number FROM students
+    ''')
+    cursor.execute(_LEDGER_RECOMPUTE_SQL_0007.format(key='student_ledger.aadhaar_number'))
+
+
+# Aging bucket of one installment relative to the date {today}; {row} is the
+# column prefix ('' in an UPDATE, 'new.' inside a trigger). Only pending
+# installments are aged, so paid rows stay out of the partial index.
+AGING_BUCKET_SQL = '''
+    CASE
+        WHEN LOWER({row}payment_status) != 'pending' THEN NULL
+        WHEN {row}due_date > date({today}, '+30 days') THEN 'not_due'
+        WHEN {row}due_date > date({today}, '+7 days') THEN 'due_30'
+        WHEN {row}due_date >= {today} THEN 'due_7'
+        WHEN {row}due_date >= date({today}, '-30 days') THEN 'overdue_30'
+        WHEN {row}due_date >= date({today}, '-60 days') THEN 'overdue_60'
+        WHEN {row}due_date >= date({today}, '-90 days') THEN 'overdue_90'
+        ELSE 'overdue_90_plus'
+    END
+'''
+
+
+def _migration_0008_installment_aging(cursor):
+    """Stored aging bucket per pending installment, indexed for per-bucket queries"""
+    cursor.execute('ALTER TABLE installments ADD COLUMN aging_bucket TEXT')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_installments_aging
+        ON installments(aging_bucket, due_date)
+        WHERE aging_bucket IS NOT NULL
+    ''')
+    # Date the buckets were last rolled forward to
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS installment_aging (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            as_of TEXT,
+            refreshed_at TEXT,
+            rows_updated INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO installment_aging (id) VALUES (1)')
+
+    # Writers get the right bucket straight away; the nightly job only has to
+    # move rows across bucket boundaries as the calendar advances
+    bucket = AGING_BUCKET_SQL.format(row='new.', today="date('now', 'localtime')")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS installments_aging_insert AFTER INSERT ON installments
+        BEGIN
+            UPDATE installments SET aging_bucket = {bucket} WHERE id = new.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS installments_aging_update
+        AFTER UPDATE OF due_date, payment_status ON installments
+        BEGIN
+            UPDATE installments SET aging_bucket = {bucket} WHERE id = new.id;
+        END
+    ''')
+
+    # Backfill
+    cursor.execute(f'''
+        UPDATE installments
+        SET aging_bucket = {AGING_BUCKET_SQL.format(row='', today="date('now', 'localtime')")}
+    ''')
+    cursor.execute('''
+        UPDATE installment_aging
+        SET as_of = date('now', 'localtime'), refreshed_at = datetime('now', 'localtime')
+        WHERE id = 1
+    ''')
+
+
+# Recompute ledger rows from installments ({key} names the student column;
+# add a WHERE clause to limit it to one student). Partly paid installments
+# count towards amount_paid and only their balance is pending. Overdue
+# figures are relative to today; refresh_overdue_ledger() rolls them forward.
+LEDGER_RECOMPUTE_SQL = '''
+    UPDATE student_ledger SET (
+        installments_total, installments_paid, installments_pending,
+        amount_total, amount_paid, amount_pending,
+        next_due_date, overdue_count, overdue_amount, overdue_as_of
+    ) = (
+        SELECT COUNT(*),
+               COALESCE(SUM(LOWER(payment_status) = 'paid'), 0),
+               COALESCE(SUM(LOWER(payment_status) = 'pending'), 0),
+               COALESCE(SUM(amount), 0),
+               COALESCE(SUM(CASE WHEN LOWER(payment_status) = 'paid' THEN amount
+                                 ELSE amount_paid END), 0),
+               COALESCE(SUM(CASE WHEN LOWER(payment_status) = 'pending'
+                                 THEN amount - amount_paid ELSE 0 END), 0),
+               MIN(CASE WHEN LOWER(payment_status) = 'pending' THEN due_date END),
+               COALESCE(SUM(LOWER(payment_status) = 'pending'
+                            AND due_date < date('now', 'localtime')), 0),
+               COALESCE(SUM(CASE WHEN LOWER(payment_status) = 'pending'
+                                  AND due_date < date('now', 'localtime')
+                                 THEN amount - amount_paid ELSE 0 END), 0),
+               date('now', 'localtime')
+        FROM installments WHERE aadhaar_number = {key}
+    )
+'''
+
+
+def _migration_0009_payment_postings(cursor):
+    """Partial payments on installments and a postings table keyed for idempotent replays"""
+    cursor.execute('ALTER TABLE installments ADD COLUMN amount_paid REAL NOT NULL DEFAULT 0')
+    cursor.execute('''
+        UPDATE installments SET amount_paid = amount WHERE LOWER(payment_status) = 'paid'
+    ''')
+    # One row per posted payment. A replayed idempotency key returns the
+    # stored outcome instead of applying the money twice.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payment_postings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            aadhaar_number TEXT NOT NULL,
+            installment_number INTEGER,
+            amount REAL NOT NULL,
+            amount_applied REAL NOT NULL,
+            amount_unapplied REAL NOT NULL,
+            allocations TEXT NOT NULL,
+            paid_date TEXT NOT NULL,
+            reference TEXT,
+            posted_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_payment_postings_aadhaar
+        ON payment_postings(aadhaar_number, paid_date)
+    ''')
+
+    # The ledger triggers now account for amount_paid
+    cursor.execute('DROP TRIGGER IF EXISTS installments_ledger_insert')
+    cursor.execute('DROP TRIGGER IF EXISTS installments_ledger_update')
+    cursor.execute('DROP TRIGGER IF EXISTS installments_ledger_delete')
+    cursor.execute('''
+        CREATE TRIGGER installments_ledger_insert AFTER INSERT ON installments
+        BEGIN
+            UPDATE student_ledger SET
+                installments_total = installments_total + 1,
+                installments_paid = installments_paid + (LOWER(new.payment_status) = 'paid'),
+                installments_pending = installments_pending + (LOWER(new.payment_status) = 'pending'),
+                amount_total = amount_total + new.amount,
+                amount_paid = amount_paid
+                    + CASE WHEN LOWER(new.payment_status) = 'paid' THEN new.amount
+                           ELSE new.amount_paid END,
+                amount_pending = amount_pending
+                    + CASE WHEN LOWER(new.payment_status) = 'pending'
+                           THEN new.amount - new.amount_paid ELSE 0 END,
+                next_due_date = CASE
+                    WHEN LOWER(new.payment_status) = 'pending'
+                         AND (next_due_date IS NULL OR new.due_date < next_due_date)
+                    THEN new.due_date ELSE next_due_date END,
+                overdue_count = overdue_count + (LOWER(new.payment_status) = 'pending'
+                                                 AND new.due_date < date('now', 'localtime')),
+                overdue_amount = overdue_amount
+                    + CASE WHEN LOWER(new.payment_status) = 'pending'
+                                AND new.due_date < date('now', 'localtime')
+                           THEN new.amount - new.amount_paid ELSE 0 END
+            WHERE aadhaar_number = new.aadhaar_number;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER installments_ledger_update
+        AFTER UPDATE OF aadhaar_number, due_date, amount, amount_paid, payment_status
+        ON installments
+        BEGIN
+            {LEDGER_RECOMPUTE_SQL.format(key='new.aadhaar_number')}
+            WHERE aadhaar_number = new.aadhaar_number;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER installments_ledger_delete AFTER DELETE ON installments
+        BEGIN
+            {LEDGER_RECOMPUTE_SQL.format(key='old.aadhaar_number')}
+            WHERE aadhaar_number = old.aadhaar_number;
+        END
+    ''')
+
+
+# Tables whose writes bump a change counter in table_versions
+VERSIONED_TABLES = ('students', 'rooms', 'installments', 'settings')
+
+
+def _migration_0010_table_versions(cursor):
+    """Per-table change counters for conditional GET and cache invalidation"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            changed_at INTEGER NOT NULL
+        )
+    ''')
+    for table in VERSIONED_TABLES:
+        cursor.execute('''
+            INSERT OR IGNORE INTO table_versions (table_name, version, changed_at)
+            VALUES (?, 1, CAST(strftime('%s', 'now') AS INTEGER))
+        ''', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions
+                    SET version = version + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER)
+                    WHERE table_name = '{table}';
+                END
+            ''')
+
+
+def _migration_0011_job_heartbeats(cursor):
+    """Heartbeat column so jobs left by a dead worker are found quickly"""
+    cursor.execute('ALTER TABLE jobs ADD COLUMN heartbeat_at TEXT')
+
+
+def _migration_0012_job_checkpoints(cursor):
+    """Checkpoint column so a retried job can skip work it already did"""
+    cursor.execute('ALTER TABLE jobs ADD COLUMN checkpoint TEXT')
+
+
+# Ordered list of (version, description, function). Never edit or reorder an
+# entry once it has shipped; add a new migration instead.
+MIGRATIONS = [
+    (1, 'Indexes for hot query columns', _migration_0001_hot_query_indexes),
+    (2, 'Keyset pagination indexes for students', _migration_0002_student_keyset_indexes),
+    (3, 'Full-text search index for students', _migration_0003_student_search_index),
+    (4, 'Background jobs table', _migration_0004_jobs_table),
+    (5, 'Room occupancy counters', _migration_0005_room_occupancy_counters),
+    (6, 'Triggers maintaining room occupancy counters', _migration_0006_room_occupancy_triggers),
+    (7, 'Materialized payment ledger', _migration_0007_payment_ledger),
+    (8, 'Installment aging buckets', _migration_0008_installment_aging),
+    (9, 'Partial payments and payment postings', _migration_0009_payment_postings),
+    (10, 'Per-table change counters', _migration_0010_table_versions),
+    (11, 'Background job heartbeats', _migration_0011_job_heartbeats),
+    (12, 'Background job checkpoints', _migration_0012_job_checkpoints),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    conn.commit()
+
+
+def get_schema_version(conn):
+    """Get the highest migration version applied to the database"""
+    _ensure_version_table(conn)
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def upgrade(conn):
+    """
+    Apply all pending migrations in order
+
+    Each migration runs in its own IMMEDIATE transaction so two processes
+    starting at the same time cannot apply the same step twice.
+
+    Args:
+        conn: sqlite3.Connection to migrate
+
+    Returns:
+        List of versions that were applied (empty if already up to date)
+    """
+    _ensure_version_table(conn)
+    applied = []
+
+    for version, description, migrate in MIGRATIONS:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT 1 FROM schema_version WHERE version = ?',
+                               (version,)).fetchone()
+            if row:
+                conn.rollback()
+                continue
+
+            migrate(conn.cursor())
+            conn.execute('''
+                INSERT INTO schema_version (version, description, applied_at)
+                VALUES (?, ?, ?)
+            ''', (version, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            conn.commit()
+            applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+
+    built_search_index = ensure_search_index(conn)
+
+    if applied or built_search_index:
+        # Refresh planner statistics for the new indexes
+        conn.execute('PRAGMA optimize')
+
+    return applied
+
+
+def ensure_search_index(conn):
+    """
+    Build the student search index if it is missing but FTS5 is available
+
+    Migration 3 is recorded as applied even when SQLite lacks FTS5, so a
+    database migrated on such a build gets its index here once SQLite is
+    upgraded, backfilled from the existing students.
+
+    Args:
+        conn: sqlite3.Connection to check
+
+    Returns:
+        True if the index was created
+    """
+    def exists():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'")
+        return cursor.fetchone() is not None
+
+    cursor = conn.cursor()
+    if exists() or not fts5_supported(cursor):
+        return False
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Another process may have built it while we waited for the lock
+        if exists():
+            conn.rollback()
+            return False
+        _create_student_search_index(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
@@ -3,9 +3,68 @@ Database models for Hostel Manager
 Defines the Student table structure with all required fields
 """
 
+import base64
+import json
+import re
 import sqlite3
 from datetime import datetime
 from app.database.connection import get_db_connection
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+from app.utils.vacancy_index import invalidate_vacancy_index
+from app.utils.room_manager import sync_room_index
+
+# Columns the students list may be ordered by; aadhaar_number breaks ties
+STUDENT_SORT_COLUMNS = ('registration_date', 'full_name')
+
+# Columns the students list may be filtered on (equality match)
+STUDENT_FILTER_COLUMNS = ('college_name', 'gender', 'room_allocation')
+
+# Default cap on search results returned to the type-ahead box
+SEARCH_RESULT_LIMIT = 50
+
+# Fields every new student record must provide
+STUDENT_REQUIRED_FIELDS = ('full_name', 'date_of_birth', 'mobile_number', 'college_name',
+                           'admission_number', 'parent_names', 'aadhaar_number', 'gender',
+                           'registration_date', 'session_expiration_date', 'full_address',
+                           'email', 'emergency_contact', 'total_fee', 'installment_count')
+
+# Column order used when inserting a student row
+STUDENT_INSERT_COLUMNS = ('aadhaar_number', 'full_name', 'date_of_birth', 'mobile_number',
+                          'college_name', 'admission_number', 'parent_names', 'gender',
+                          'registration_date', 'session_expiration_date', 'full_address',
+                          'email', 'emergency_contact', 'room_allocation', 'total_fee',
+                          'installment_count')
+
+
+def encode_cursor(values):
+    """Encode keyset values as an opaque URL-safe cursor string"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size=2):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string
+        size: Number of keyset values the cursor must hold
+
+    Raises:
+        ValueError if the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid page cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid page cursor")
+    # Values are bound as SQL parameters, which must be scalars
+    if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+        raise ValueError("Invalid page cursor")
+    return values
+
 
 class Student:
     """Student model for database operations"""
@@ -83,6 +142,56 @@ class Student:
         conn.commit()
         conn.close()
     
+    INSERT_SQL = f'''
+        INSERT INTO students ({', '.join(STUDENT_INSERT_COLUMNS)})
+        VALUES ({', '.join('?' for _ in STUDENT_INSERT_COLUMNS)})
+    '''
+    
+    @staticmethod
+    def validate_student_data(data):
+        """
+        Validate the Aadhaar and mobile numbers of a new student record
+        
+        Args:
+            data: Dictionary containing student information
+            
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        # Validate 12-digit Aadhaar number
+        aadhaar = (data.get('aadhaar_number') or '').strip()
+        if not aadhaar.isdigit() or len(aadhaar) != 12:
+            return False, "Aadhaar number must be exactly 12 digits"
+        
+        # Validate mobile number (10 digits)
+        mobile = (data.get('mobile_number') or '').strip()
+        if not mobile.isdigit() or len(mobile) != 10:
+            return False, "Mobile number must be exactly 10 digits"
+        
+        return True, "Valid"
+    
+    @staticmethod
+    def to_insert_row(data):
+        """Build the parameter tuple for INSERT_SQL from a student dictionary"""
+        return (
+            (data.get('aadhaar_number') or '').strip(),
+            data.get('full_name'),
+            data.get('date_of_birth'),
+            (data.get('mobile_number') or '').strip(),
+            data.get('college_name'),
+            data.get('admission_number'),
+            data.get('parent_names'),
+            data.get('gender'),
+            data.get('registration_date'),
+            data.get('session_expiration_date'),
+            data.get('full_address'),
+            data.get('email'),
+            data.get('emergency_contact'),
+            data.get('room_allocation', 'Not Allocated'),
+            float(data.get('total_fee', 0)),
+            int(data.get('installment_count', 1))
+        )
+    
     @staticmethod
     def add_student(data):
         """
@@ -95,48 +204,17 @@ class Student:
             Tuple (success: bool, message: str)
         """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Validate 12-digit Aadhaar number
-            aadhaar = data.get('aadhaar_number', '').strip()
-            if not aadhaar.isdigit() or len(aadhaar) != 12:
-                return False, "Aadhaar number must be exactly 12 digits"
-            
-            # Validate mobile number (10 digits)
-            mobile = data.get('mobile_number', '').strip()
-            if not mobile.isdigit() or len(mobile) != 10:
-                return False, "Mobile number must be exactly 10 digits"
+            success, message = Student.validate_student_data(data)
+            if not success:
+                return False, message
             
-            cursor.execute('''
-                INSERT INTO students (
-                    aadhaar_number, full_name, date_of_birth, mobile_number,
-                    college_name, admission_number, parent_names, gender,
-                    registration_date, session_expiration_date, full_address,
-                    email, emergency_contact, room_allocation, total_fee,
-                    installment_count
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                aadhaar,
-                data.get('full_name'),
-                data.get('date_of_birth'),
-                mobile,
-                data.get('college_name'),
-                data.get('admission_number'),
-                data.get('parent_names'),
-                data.get('gender'),
-                data.get('registration_date'),
-                data.get('session_expiration_date'),
-                data.get('full_address'),
-                data.get('email'),
-                data.get('emergency_contact'),
-                data.get('room_allocation', 'Not Allocated'),
-                float(data.get('total_fee', 0)),
-                int(data.get('installment_count', 1))
-            ))
-            
-            conn.commit()
-            conn.close()
+            conn = get_db_connection()
+            try:
+                conn.execute(Student.INSERT_SQL, Student.to_insert_row(data))
+                conn.commit()
+            finally:
+                conn.close()
+            invalidate_dashboard_cache()
             return True, "Student added successfully"
             
         except sqlite3.IntegrityError as e:
@@ -158,16 +236,149 @@ class Student:
         return [dict(student) for student in students]
     
     @staticmethod
-    def search_students(query):
+    def get_students_page(limit=20, cursor=None, sort='registration_date',
+                          direction='desc', filters=None):
+        """
+        Get one page of students using keyset pagination
+
+        Pages are addressed by the (sort column, aadhaar_number) of the last
+        row shown, so each page is a single index seek regardless of how
+        many students come before it.
+
+        Args:
+            limit: Maximum number of students to return
+            cursor: Opaque cursor from a previous page's next_cursor
+            sort: Column to order by (one of STUDENT_SORT_COLUMNS)
+            direction: 'asc' or 'desc'
+            filters: Optional dict of column -> value (STUDENT_FILTER_COLUMNS)
+
+        Returns:
+            Dictionary with students, next_cursor and has_more
+
+        Raises:
+            ValueError for an unknown sort/filter column or bad cursor
+        """
+        if sort not in STUDENT_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort students by {sort}")
+        if direction not in ('asc', 'desc'):
+            raise ValueError("Sort direction must be 'asc' or 'desc'")
+
+        conditions = []
+        params = []
+
+        for column, value in (filters or {}).items():
+            if column not in STUDENT_FILTER_COLUMNS:
+                raise ValueError(f"Cannot filter students by {column}")
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+
+        if cursor:
+            last_value, last_aadhaar = decode_cursor(cursor)
+            operator = '<' if direction == 'desc' else '>'
+            conditions.append(f"({sort}, aadhaar_number) {operator} (?, ?)")
+            params.extend([last_value, last_aadhaar])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = 'DESC' if direction == 'desc' else 'ASC'
+
+        conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
+        db_cursor = conn.cursor()
+
+        # Fetch one extra row to know whether another page exists
+        db_cursor.execute(f'''
+            SELECT * FROM students
+            {where}
+            ORDER BY {sort} {order}, aadhaar_number {order}
+            LIMIT ?
+        ''', params + [limit + 1])
+        rows = db_cursor.fetchall()
+        conn.close()
+
+        students = [dict(row) for row in rows[:limit]]
+        has_more = len(rows) > limit
+        next_cursor = None
+        if has_more and students:
+            last = students[-1]
+            next_cursor = encode_cursor([last[sort], last['aadhaar_number']])
+
+        return {
+            'students': students,
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
+    
+    @staticmethod
+    def search_index_available():
+        """Check whether the students_fts full-text index exists"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'")
+        available = cursor.fetchone() is not None
+        conn.close()
+        return available
+    
+    @staticmethod
+    def rebuild_search_index():
         """
-        Search students by name, admission number, or Aadhaar
+        Rebuild the full-text index from the students table
+
+        Needed after VACUUM, which may renumber the rowids the index refers to.
+
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        if not Student.search_index_available():
+            return False, "Full-text search is not available in this SQLite build"
+        try:
+            conn = get_db_connection()
+            conn.execute("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+            conn.commit()
+            conn.close()
+            return True, "Search index rebuilt"
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+    
+    @staticmethod
+    def search_students(query, limit=SEARCH_RESULT_LIMIT):
+        """
+        Search students by name, admission number, Aadhaar or email
+
+        Uses the FTS5 index with prefix matching on every word of the query,
+        best matches first. Falls back to LIKE matching when the index is
+        not available.
         
         Args:
             query: Search string
+            limit: Maximum number of results
             
         Returns:
             List of matching student records
         """
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return []
+
+        if Student.search_index_available():
+            # Quote each term so FTS5 operators typed by the user are literal
+            match = ' '.join(f'"{term}"*' for term in terms)
+
+            conn = get_db_connection()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT s.* FROM students_fts
+                JOIN students s ON s.rowid = students_fts.rowid
+                WHERE students_fts MATCH ?
+                ORDER BY students_fts.rank
+                LIMIT ?
+            ''', (match, limit))
+            students = cursor.fetchall()
+            conn.close()
+
+            return [dict(student) for student in students]
+
         conn = get_db_connection()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
@@ -178,7 +389,8 @@ class Student:
             WHERE full_name LIKE ? OR admission_number LIKE ? 
                OR aadhaar_number LIKE ? OR email LIKE ?
             ORDER BY registration_date DESC
-        ''', (search_param, search_param, search_param, search_param))
+            LIMIT ?
+        ''', (search_param, search_param, search_param, search_param, limit))
         
         students = cursor.fetchall()
         conn.close()
@@ -211,9 +423,6 @@ class Student:
             Tuple (success: bool, message: str)
         """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
             # Validate mobile number if provided
             if 'mobile_number' in data:
                 mobile = data['mobile_number'].strip()
@@ -235,9 +444,15 @@ class Student:
             values.append(aadhaar_number)
             query = f"UPDATE students SET {', '.join(update_fields)} WHERE aadhaar_number = ?"
             
-            cursor.execute(query, values)
-            conn.commit()
-            conn.close()
+            conn = get_db_connection()
+            try:
+                conn.execute(query, values)
+                conn.commit()
+            finally:
+                conn.close()
+            if 'room_allocation' in data:
+                invalidate_vacancy_index()
+            invalidate_dashboard_cache()
             
             return True, "Student updated successfully"
             
@@ -257,29 +472,30 @@ class Student:
         """
         try:
             conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get student's room allocation before deletion
-            cursor.execute('SELECT room_allocation FROM students WHERE aadhaar_number = ?', 
-                          (aadhaar_number,))
-            student = cursor.fetchone()
-            
-            if student and student[0] and student[0] != 'Not Allocated':
-                # Vacate the room
-                cursor.execute('''
-                    UPDATE rooms SET occupied_count = occupied_count - 1 
-                    WHERE room_number = ?
-                ''', (student[0],))
-            
-            # Delete student (cascade delete will handle installments)
-            cursor.execute('DELETE FROM students WHERE aadhaar_number = ?', (aadhaar_number,))
-            
-            conn.commit()
-            conn.close()
+            try:
+                cursor = conn.cursor()
+                
+                # Get student's room allocation before deletion
+                cursor.execute('SELECT room_allocation FROM students WHERE aadhaar_number = ?', 
+                              (aadhaar_number,))
+                student = cursor.fetchone()
+                
+                # Delete student (cascade delete will handle installments;
+                # the students_room_delete trigger frees their bed)
+                cursor.execute('DELETE FROM students WHERE aadhaar_number = ?', (aadhaar_number,))
+                
+                if student:
+                    sync_room_index(cursor, student[0])
+                
+                conn.commit()
+            finally:
+                conn.close()
+            invalidate_dashboard_cache()
             
             return True, "Student deleted successfully"
             
         except Exception as e:
+            invalidate_vacancy_index()
             return False, f"Error: {str(e)}"
     
     @staticmethod
@@ -0,0 +1,242 @@
+"""
+JSON API (version 1) for Hostel Manager
+Read-only access to students, rooms and installments for integrations
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Blueprint, Response, request
+
+from app.routes.auth import api_login_required
+from app.database.connection import get_db_connection
+from app.database.models import encode_cursor, decode_cursor
+from app.utils.data_export import (
+    students_export, rooms_export, installments_export, parse_columns,
+    STUDENT_EXPORT_COLUMNS, ROOM_EXPORT_COLUMNS, INSTALLMENT_EXPORT_COLUMNS, INSTALLMENT_VIEWS
+)
+from app.utils.table_versions import get_table_versions
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def json_response(payload, status=200):
+    """Serialize without whitespace; integrations pay for every byte they poll"""
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+    return Response(body, status=status, mimetype='application/json')
+
+
+def api_error(message, status=400):
+    return json_response({'error': message}, status)
+
+
+def versioned(*tables, dated=False):
+    """
+    Decorator adding ETag/Last-Modified to a GET route and answering 304s
+
+    The validators come from the change counters of the tables the route
+    reads, so a client polling unchanged data costs one primary-key lookup
+    and never runs the route's query.
+
+    Args:
+        tables: Tables whose change counters the response depends on
+        dated: The response also depends on today's date (aging buckets,
+            overdue days), so validators from an earlier day never match
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            versions = get_table_versions(tables)
+            changed_at = max(changed for _, changed in versions.values())
+            # The query string is part of the tag: each page/field set differs
+            tag_source = f"{request.full_path}|{sorted(versions.items())}"
+            if dated:
+                midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                tag_source += f"|{midnight.date().isoformat()}"
+                changed_at = max(changed_at, midnight.timestamp())
+            etag = hashlib.sha1(tag_source.encode('utf-8')).hexdigest()[:24]
+            last_modified = datetime.fromtimestamp(changed_at, timezone.utc)
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                fresh = since is not None and last_modified <= since
+            if fresh:
+                response = Response(status=304)
+            else:
+                response = f(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+
+def _page_size():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be a whole number")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _rows_payload(columns, rows):
+    """Rows as objects, or with ?shape=rows as arrays under a single field list"""
+    if request.args.get('shape') == 'rows':
+        return {'fields': columns, 'rows': [list(row) for row in rows]}
+    return {'data': [dict(zip(columns, row)) for row in rows]}
+
+
+def _page(export):
+    """Run one keyset page of an export and build the list response"""
+    limit = _page_size()
+    cursor = request.args.get('cursor')
+    # A malformed or crafted cursor raises ValueError here (a 400), before
+    # any of its values are bound into the query
+    after = decode_cursor(cursor, size=len(export.keys)) if cursor else None
+
+    sql, params = export.query(after=after, limit=limit + 1)
+    conn = get_db_connection()
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    width = len(export.columns)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    payload = _rows_payload(export.columns, [row[:width] for row in rows])
+    payload['next_cursor'] = encode_cursor(list(rows[-1][width:])) if has_more else None
+    payload['has_more'] = has_more
+    return json_response(payload)
+
+
+def _one(export):
+    """Run an export expected to match a single row"""
+    sql, params = export.query()
+    conn = get_db_connection()
+    row = conn.execute(sql, params).fetchone()
+    conn.close()
+
+    if row is None:
+        return api_error('Not found', 404)
+    return json_response({'data': dict(zip(export.columns, row))})
+
+
+def _fields():
+    return parse_columns(request.args.get('fields'))
+
+
+def _arg(name):
+    return request.args.get(name, '').strip()
+
+
+@api_bp.errorhandler(ValueError)
+def handle_value_error(error):
+    return api_error(str(error), 400)
+
+
+@api_bp.route('/')
+@api_login_required
+def index():
+    """List the resources and the fields each one offers"""
+    return json_response({
+        'version': 1,
+        'resources': {
+            'students': {'path': '/api/v1/students', 'fields': list(STUDENT_EXPORT_COLUMNS)},
+            'rooms': {'path': '/api/v1/rooms', 'fields': list(ROOM_EXPORT_COLUMNS)},
+            'installments': {'path': '/api/v1/installments',
+                             'fields': list(INSTALLMENT_EXPORT_COLUMNS),
+                             'views': list(INSTALLMENT_VIEWS)}
+        }
+    })
+
+
+@api_bp.route('/students')
+@api_login_required
+@versioned('students')
+def list_students():
+    """
+    Page through students
+
+    Query parameters: fields, limit, cursor, shape=rows, sort
+    (registration_date|full_name), direction, college, gender, room,
+    registered_from, registered_to.
+    """
+    export = students_export(
+        columns=_fields(),
+        filters={'college_name': _arg('college'), 'gender': _arg('gender'),
+                 'room_allocation': _arg('room')},
+        registered_from=_arg('registered_from'),
+        registered_to=_arg('registered_to'),
+        sort=request.args.get('sort', 'registration_date'),
+        direction=request.args.get('direction', 'asc')
+    )
+    return _page(export)
+
+
+@api_bp.route('/students/<aadhaar>')
+@api_login_required
+@versioned('students')
+def get_student(aadhaar):
+    """Get one student (query parameter: fields)"""
+    return _one(students_export(columns=_fields()).where('aadhaar_number = ?', aadhaar))
+
+
+@api_bp.route('/students/<aadhaar>/installments')
+@api_login_required
+@versioned('students', 'installments', dated=True)
+def get_student_installments(aadhaar):
+    """Get a student's installments in due date order (query parameters: fields, shape)"""
+    export = installments_export(columns=_fields(), aadhaar_number=aadhaar)
+    sql, params = export.query()
+    conn = get_db_connection()
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return json_response(_rows_payload(export.columns, rows))
+
+
+@api_bp.route('/rooms')
+@api_login_required
+@versioned('rooms')
+def list_rooms():
+    """Page through rooms (query parameters: fields, limit, cursor, shape, vacant=1)"""
+    export = rooms_export(columns=_fields(),
+                          vacant_only=_arg('vacant').lower() in ('1', 'true', 'yes'))
+    return _page(export)
+
+
+@api_bp.route('/rooms/<room_number>')
+@api_login_required
+@versioned('rooms')
+def get_room(room_number):
+    """Get one room (query parameter: fields)"""
+    return _one(rooms_export(columns=_fields()).where('room_number = ?', room_number))
+
+
+@api_bp.route('/installments')
+@api_login_required
+@versioned('students', 'installments', dated=True)
+def list_installments():
+    """
+    Page through installments in due date order
+
+    Query parameters: fields, limit, cursor, shape=rows, view
+    (all|pending|overdue|upcoming|paid), bucket, aadhaar, due_from, due_to.
+    """
+    export = installments_export(
+        columns=_fields(),
+        view=request.args.get('view', 'all'),
+        bucket=_arg('bucket'),
+        aadhaar_number=_arg('aadhaar'),
+        due_from=_arg('due_from'),
+        due_to=_arg('due_to')
+    )
+    return _page(export)
@@ -20,6 +20,17 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def api_login_required(f):
+    """
+    Decorator for JSON API routes - answers 401 instead of redirecting to login
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'admin_id' not in session:
+            return jsonify({'error': 'Authentication required'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Handle admin login"""
@@ -31,7 +42,8 @@ def login():
             return render_template('auth/login.html', 
                                  error='Username and password are required')
         
-        success, admin_id, message = verify_admin_credentials(username, password)
+        success, admin_id, message = verify_admin_credentials(username, password,
+                                                              request.remote_addr)
         
         if success:
             session['admin_id'] = admin_id
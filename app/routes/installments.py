@@ -2,39 +2,24 @@
 Installment and payment routes for Hostel Manager
 """
 
-from flask import Blueprint, render_template, request, jsonify
-from datetime import datetime
+import io
+
+from flask import Blueprint, render_template, request, jsonify, url_for
 from app.routes.auth import login_required
 from app.utils.installment_manager import (
     get_student_installments, mark_installment_paid,
     get_overdue_installments, get_upcoming_installments,
-    get_payment_statistics, get_pending_installments
+    get_payment_statistics, get_pending_installments, get_student_ledger,
+    get_aging_report, get_installments_by_bucket, AGING_BUCKETS, OVERDUE_BUCKETS
 )
-from app.utils.email_service import send_reminder_email, send_bulk_reminders
+from app.utils.email_service import send_reminder_email, start_bulk_reminders
+from app.utils.payment_posting import post_payments, upload_fingerprint
+from app.utils.student_import import iter_file_rows
+from app.utils.data_export import installments_export, export_response, parse_columns
 from app.database.models import Student
 
 installments_bp = Blueprint('installments', __name__, url_prefix='/installments')
 
-def calculate_overdue_days(due_date_str):
-    """
-    Calculate number of days overdue given a due date string.
-    
-    Args:
-        due_date_str: Date string in 'YYYY-MM-DD' format
-        
-    Returns:
-        Number of days overdue (positive if past due, 0 if today, negative if future)
-    """
-    try:
-        if isinstance(due_date_str, str):
-            due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
-        else:
-            due_date = due_date_str
-        today = datetime.now().date()
-        return (today - due_date).days
-    except Exception:
-        return 0
-
 @installments_bp.route('/student/<aadhaar>')
 @login_required
 def student_installments(aadhaar):
@@ -48,7 +33,8 @@ def student_installments(aadhaar):
     
     return render_template('installments/student_installments.html',
                          student=student,
-                         installments=installments)
+                         installments=installments,
+                         ledger=get_student_ledger(aadhaar))
 
 @installments_bp.route('/mark-paid', methods=['POST'])
 @login_required
@@ -71,69 +57,92 @@ def mark_paid():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
+@installments_bp.route('/payments', methods=['POST'])
+@login_required
+def post_payments_route():
+    """
+    Post a batch of payments and return a reconciliation report
+    
+    Accepts a CSV/XLSX upload in the 'file' field (columns aadhaar_number,
+    amount, and optionally installment_number, paid_date, reference,
+    idempotency_key) or a JSON list of the same objects, either bare or as
+    {"payments": [...], "dry_run": true}. Re-posting a payment with the same
+    idempotency key or reference is reported as a duplicate, not applied.
+    Rows without either are keyed by this upload's contents and row number:
+    resending the identical file/body is a no-op, but the same payment in a
+    new upload is applied again.
+    """
+    data = request.get_json(silent=True)
+    if data is not None:
+        source = upload_fingerprint(request.get_data())
+        records = data.get('payments') if isinstance(data, dict) else data
+        dry_run = isinstance(data, dict) and bool(data.get('dry_run'))
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            return jsonify({'success': False,
+                            'message': 'Expected a list of payment objects'}), 400
+    else:
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({'success': False, 'message': 'No payments file uploaded'}), 400
+        dry_run = request.form.get('dry_run', '').lower() in ('1', 'true', 'yes', 'on')
+        content = upload.read()
+        source = upload_fingerprint(content)
+        try:
+            records = list(iter_file_rows(io.BytesIO(content), upload.filename))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+    
+    success, report, message = post_payments(records, dry_run=dry_run, source=source)
+    if not success:
+        return jsonify({'success': False, 'message': message}), 400
+    return jsonify({'success': True, 'message': message, **report}), 200
+
+@installments_bp.route('/export')
+@login_required
+def export_installments():
+    """
+    Download installments as CSV or XLSX, streamed row by row
+    
+    ?view=all|pending|overdue|upcoming|paid selects the same rows as the
+    payment pages; ?bucket=, ?aadhaar=, ?due_from= and ?due_to= narrow it.
+    Also takes ?columns=a,b,c, ?format=csv|xlsx and ?gzip=1.
+    """
+    try:
+        export = installments_export(
+            columns=parse_columns(request.args.get('columns')),
+            view=request.args.get('view', 'all'),
+            bucket=request.args.get('bucket', '').strip(),
+            aadhaar_number=request.args.get('aadhaar', '').strip(),
+            due_from=request.args.get('due_from', '').strip(),
+            due_to=request.args.get('due_to', '').strip()
+        )
+        return export_response(export, request.args.get('format', 'csv'),
+                               request.args.get('gzip', '').lower() in ('1', 'true', 'yes', 'on'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
 @installments_bp.route('/pending')
 @login_required
 def view_pending():
     """View all pending payments"""
-    # Get all pending installments regardless of due date
+    # Buckets and overdue days come from the stored aging data
     pending_installments = get_pending_installments()
     stats = get_payment_statistics()
 
-    overdue_installments = []
-    total_amount = 0.0
-    today = datetime.now().date()
-
-    # Normalize status comparisons and parse due dates into date objects
+    overdue_installments = [inst for inst in pending_installments
+                            if inst['aging_bucket'] in OVERDUE_BUCKETS]
     for inst in pending_installments:
-        # Ensure status comparison is case-insensitive
-        status = inst.get('payment_status') or ''
-        inst['payment_status_normalized'] = status.strip().lower()
-
-        # Parse due_date into a date object when possible
-        due_date = inst.get('due_date')
-        try:
-            if isinstance(due_date, str):
-                due_date_obj = datetime.strptime(due_date, '%Y-%m-%d').date()
-            else:
-                due_date_obj = due_date
-        except Exception:
-            due_date_obj = None
-
-        inst['due_date_obj'] = due_date_obj
-
-        # Compute overdue
-        if due_date_obj and due_date_obj < today:
-            inst['overdue_days'] = (today - due_date_obj).days
-            overdue_installments.append(inst)
-        else:
-            inst['overdue_days'] = 0
-
-        # Sum amount safely
-        try:
-            amt = float(inst.get('amount') or 0)
-        except Exception:
-            amt = 0.0
-        total_amount += amt
+        inst['overdue_days'] = max(0, inst['overdue_days'])
+    total_amount = sum((inst['amount'] or 0) - (inst['amount_paid'] or 0)
+                       for inst in pending_installments)
 
     total_pending = len(pending_installments)
     total_overdue = len(overdue_installments)
 
-    # Update stats dict so the summary banners (which read from `stats`) reflect
-    # the same computed values used for the table below.
-    try:
-        stats['pending_installments'] = int(total_pending)
-    except Exception:
-        stats['pending_installments'] = total_pending
-
-    try:
-        stats['overdue_count'] = int(total_overdue)
-    except Exception:
-        stats['overdue_count'] = total_overdue
-
-    try:
-        stats['total_pending_amount'] = float(total_amount)
-    except Exception:
-        stats['total_pending_amount'] = total_amount
+    # Keep the summary banners consistent with the table below
+    stats['pending_installments'] = total_pending
+    stats['overdue_count'] = total_overdue
+    stats['total_pending_amount'] = float(total_amount)
 
     return render_template('installments/pending.html',
                          pending_installments=pending_installments,
@@ -154,8 +163,7 @@ def view_upcoming():
     
     # Add days_until_due to each installment for cleaner template rendering
     for inst in installments:
-        days_until = -calculate_overdue_days(inst.get('due_date', ''))
-        inst['days_until_due'] = max(0, days_until)
+        inst['days_until_due'] = max(0, -inst['overdue_days'])
     
     return render_template('installments/upcoming.html',
                          installments=installments,
@@ -213,25 +221,49 @@ def send_bulk_reminders_route():
             }
     
     overdue_students = list(students_dict.values())
-    total, sent, failed, errors = send_bulk_reminders(overdue_students)
+    job_id = start_bulk_reminders(overdue_students)
     
     return jsonify({
         'success': True,
-        'total': total,
-        'sent': sent,
-        'failed': failed,
-        'errors': errors
-    }), 200
+        'job_id': job_id,
+        'total': len(overdue_students),
+        'status_url': url_for('jobs.status', job_id=job_id)
+    }), 202
 
 @installments_bp.route('/statistics')
 @login_required
 def statistics():
     """View payment statistics"""
     stats = get_payment_statistics()
-    overdue = get_overdue_installments()
-    upcoming = get_upcoming_installments(days_ahead=30)
+    aging = get_aging_report()
     
     return render_template('installments/statistics.html',
                          stats=stats,
-                         overdue_count=len(overdue),
-                         upcoming_count=len(upcoming))
+                         overdue_count=aging['overdue']['count'],
+                         upcoming_count=aging['upcoming']['count'])
+
+@installments_bp.route('/aging')
+@login_required
+def aging_report():
+    """
+    Get the aging report: count, amount and students per bucket
+    
+    With ?bucket=<name> the installments in that bucket are included,
+    paged with ?limit= (default 100, max 1000) and ?offset=.
+    """
+    report = get_aging_report()
+    
+    bucket = request.args.get('bucket')
+    if bucket:
+        if bucket not in dict(AGING_BUCKETS):
+            return jsonify({'success': False,
+                            'message': f"Unknown bucket '{bucket}'. Choose from: "
+                                       f"{', '.join(name for name, _ in AGING_BUCKETS)}"}), 400
+        try:
+            limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+            offset = max(0, int(request.args.get('offset', 0)))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'limit and offset must be integers'}), 400
+        report['installments'] = get_installments_by_bucket(bucket, limit=limit, offset=offset)
+    
+    return jsonify(report)
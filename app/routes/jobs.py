@@ -0,0 +1,34 @@
+"""
+Background job routes for Hostel Manager
+"""
+
+from flask import Blueprint, request, jsonify
+from app.routes.auth import login_required
+from app.utils.job_queue import get_job, list_jobs
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+@jobs_bp.route('/')
+@login_required
+def list_all():
+    """List recent jobs, optionally filtered by ?status= and ?kind="""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 200))
+    except ValueError:
+        limit = 50
+    
+    jobs = list_jobs(status=request.args.get('status'),
+                     kind=request.args.get('kind'),
+                     limit=limit)
+    return jsonify({'jobs': jobs})
+
+@jobs_bp.route('/<int:job_id>')
+@login_required
+def status(job_id):
+    """Get the status, progress and result of a job"""
+    job = get_job(job_id)
+    
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    
+    return jsonify({'success': True, **job}), 200
@@ -0,0 +1,34 @@
+"""
+Metrics route for Hostel Manager
+Serves profiling counters to Prometheus when profiling is enabled
+"""
+
+import hmac
+
+from flask import Blueprint, Response, abort, request, session
+
+import config
+from app.utils.profiler import profiling_enabled, render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """
+    Prometheus text exposition of this process's request and SQL counters
+
+    Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`;
+    without a configured token an admin session is required.
+    """
+    if not profiling_enabled():
+        abort(404)
+
+    token = getattr(config, 'METRICS_TOKEN', None)
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif 'admin_id' not in session:
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -7,9 +7,16 @@ from app.routes.auth import login_required
 from app.utils.room_manager import (
     create_room, get_all_rooms, get_available_rooms,
     get_room_statistics, set_room_capacity, get_room_capacity,
-    update_room_capacity_for_all
+    update_room_capacity_for_all, get_allocation_metrics, get_room
 )
 from app.utils.room_manager import vacate_student
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+from app.utils.vacancy_index import get_vacancy_index
+from app.utils.data_export import rooms_export, export_response, parse_columns
+from app.utils.room_allocator import allocate_batch, POLICIES
+from app.utils.capacity_planner import (
+    apply_capacity_change, glob_escape, parse_capacity_rules, preview_capacity_change
+)
 
 rooms_bp = Blueprint('rooms', __name__, url_prefix='/rooms')
 
@@ -52,50 +59,128 @@ def get_available():
     rooms = get_available_rooms()
     return jsonify({'rooms': rooms})
 
+@rooms_bp.route('/export')
+@login_required
+def export_rooms():
+    """Download rooms as CSV or XLSX (?columns=, ?vacant=1, ?format=csv|xlsx, ?gzip=1)"""
+    try:
+        export = rooms_export(
+            columns=parse_columns(request.args.get('columns')),
+            vacant_only=request.args.get('vacant', '').lower() in ('1', 'true', 'yes', 'on')
+        )
+        return export_response(export, request.args.get('format', 'csv'),
+                               request.args.get('gzip', '').lower() in ('1', 'true', 'yes', 'on'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@rooms_bp.route('/metrics')
+@login_required
+def allocation_metrics():
+    """Get room allocation counters (allocations, conflicts, latency)"""
+    metrics = get_allocation_metrics()
+    metrics['vacancy_index'] = get_vacancy_index().stats()
+    return jsonify(metrics)
+
+@rooms_bp.route('/allocate-batch', methods=['POST'])
+@login_required
+def allocate_batch_route():
+    """
+    Allocate rooms to unallocated students in one pass
+    
+    Accepts JSON (policy, dry_run, aadhaar_numbers, preferences) or form
+    fields (policy, dry_run). Returns the plan that was (or would be) applied.
+    """
+    data = request.get_json(silent=True) or request.form
+    policy = (data.get('policy') or 'pack').strip()
+    dry_run = str(data.get('dry_run', '')).lower() in ('1', 'true', 'yes', 'on')
+    aadhaar_numbers = data.get('aadhaar_numbers') if request.is_json else None
+    preferences = data.get('preferences') if request.is_json else None
+    
+    if preferences is not None and not isinstance(preferences, dict):
+        return jsonify({'success': False, 'message': 'preferences must map Aadhaar numbers to room lists'}), 400
+    if preferences:
+        # Accept a single room as well as a list
+        preferences = {a: [rooms] if isinstance(rooms, str) else list(rooms)
+                       for a, rooms in preferences.items()}
+    
+    success, result, message = allocate_batch(aadhaar_numbers, policy, preferences, dry_run)
+    if not success:
+        return jsonify({'success': False, 'message': message}), 400
+    
+    return jsonify({'success': True, 'message': message, **result})
+
+@rooms_bp.route('/vacancy-index/check')
+@login_required
+def check_vacancy_index():
+    """Compare the in-memory vacancy index with the database"""
+    return jsonify(get_vacancy_index().check())
+
 @rooms_bp.route('/capacity', methods=['GET', 'POST'])
 @login_required
 def manage_capacity():
-    """Manage room capacity settings"""
+    """
+    Manage room capacity settings
+    
+    Either sets one capacity for every room, or applies per-block/per-floor
+    rules ("pattern = capacity" lines). The Preview button shows the impact
+    without changing anything.
+    """
+    form = {
+        'rules': request.form.get('rules', ''),
+        'rehome': bool(request.form.get('rehome')),
+        'policy': request.form.get('policy', 'pack')
+    }
+    
+    def render(**kwargs):
+        return render_template('rooms/capacity.html',
+                             current_capacity=kwargs.pop('current_capacity', get_room_capacity()),
+                             form=form, policies=POLICIES, **kwargs)
+    
     if request.method == 'POST':
-        capacity = request.form.get('capacity', '').strip()
-        
-        if not capacity:
-            return render_template('rooms/capacity.html',
-                                 error='Capacity is required',
-                                 current_capacity=get_room_capacity())
+        preview = request.form.get('action') == 'preview'
+        rules_text = form['rules'].strip()
         
-        try:
-            capacity = int(capacity)
-            if capacity <= 0:
-                return render_template('rooms/capacity.html',
-                                     error='Capacity must be greater than 0',
-                                     current_capacity=get_room_capacity())
+        if rules_text:
+            try:
+                rules = parse_capacity_rules(rules_text)
+            except ValueError as e:
+                return render(error=str(e))
+        else:
+            capacity = request.form.get('capacity', '').strip()
             
-            success, message = update_room_capacity_for_all(capacity)
+            if not capacity:
+                return render(error='Capacity is required')
             
-            if success:
-                return render_template('rooms/capacity.html',
-                                     success='Room capacity updated successfully!',
-                                     current_capacity=capacity)
-            else:
-                return render_template('rooms/capacity.html',
-                                     error=message,
-                                     current_capacity=get_room_capacity())
-                
-        except ValueError:
-            return render_template('rooms/capacity.html',
-                                 error='Capacity must be a valid number',
-                                 current_capacity=get_room_capacity())
+            try:
+                capacity = int(capacity)
+            except ValueError:
+                return render(error='Capacity must be a valid number')
+            if capacity <= 0:
+                return render(error='Capacity must be greater than 0')
+            rules = [('*', capacity)]
+        
+        if preview:
+            success, impact, message = preview_capacity_change(rules)
+            if not success:
+                return render(error=message)
+            return render(impact=impact, preview_message=message)
+        
+        if rules_text:
+            success, result, message = apply_capacity_change(rules, form['rehome'], form['policy'])
+        else:
+            success, message = update_room_capacity_for_all(capacity, form['rehome'], form['policy'])
+        
+        if success:
+            return render(success=message)
+        return render(error=message)
     
-    return render_template('rooms/capacity.html',
-                         current_capacity=get_room_capacity())
+    return render()
 
 @rooms_bp.route('/<room_number>')
 @login_required
 def view_room(room_number):
     """View a specific room with occupancy details"""
-    rooms = get_all_rooms()
-    room = next((r for r in rooms if r.get('room_number') == room_number), None)
+    room = get_room(room_number)
     
     if not room:
         flash(f'Room {room_number} not found', 'error')
@@ -134,8 +219,7 @@ def vacate_student_route(room_number, aadhaar):
 @login_required
 def edit_room(room_number):
     """Edit room capacity"""
-    rooms = get_all_rooms()
-    room = next((r for r in rooms if r.get('room_number') == room_number), None)
+    room = get_room(room_number)
     
     if not room:
         flash(f'Room {room_number} not found', 'error')
@@ -152,15 +236,14 @@ def edit_room(room_number):
             if capacity <= 0:
                 return render_template('rooms/edit.html', room=room, error='Capacity must be greater than 0')
             
-            # Update this specific room's capacity
-            from app.database.connection import get_db_connection
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('UPDATE rooms SET capacity = ? WHERE room_number = ?', (capacity, room_number))
-            conn.commit()
-            conn.close()
+            # Refused if the room would overflow, unless its extra students are re-homed
+            success, result, message = apply_capacity_change(
+                [(glob_escape(room_number), capacity)], rehome=bool(request.form.get('rehome')))
+            if not success:
+                return render_template('rooms/edit.html', room=room, error=message)
             
-            flash(f'Room {room_number} capacity updated to {capacity}', 'success')
+            moved = f" ({len(result['moves'])} student(s) moved)" if result['moves'] else ''
+            flash(f'Room {room_number} capacity updated to {capacity}{moved}', 'success')
             return redirect(url_for('rooms.list_rooms'))
         
         except ValueError:
@@ -190,6 +273,8 @@ def delete_room(room_number):
         cursor.execute('DELETE FROM rooms WHERE room_number = ?', (room_number,))
         conn.commit()
         conn.close()
+        get_vacancy_index().remove_room(room_number)
+        invalidate_dashboard_cache()
         
         flash(f'Room {room_number} deleted successfully', 'success')
         return redirect(url_for('rooms.list_rooms'))
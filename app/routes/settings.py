@@ -2,9 +2,11 @@
 Settings and configuration routes for Hostel Manager
 """
 
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app
 from app.routes.auth import login_required
 from app.utils.email_service import get_email_config, save_email_config
+from app.database.connection import get_database_diagnostics
+from app.utils.profiler import get_slow_queries
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/settings')
 
@@ -36,3 +38,15 @@ def email_settings():
     
     config = get_email_config()
     return render_template('settings/email.html', config=config)
+
+@settings_bp.route('/diagnostics')
+@login_required
+def diagnostics():
+    """Report database pragmas, pool counters, slow queries and startup timings"""
+    try:
+        diagnostics = get_database_diagnostics()
+        diagnostics['slow_queries'] = get_slow_queries()
+        diagnostics['startup'] = current_app.config.get('STARTUP_TIMINGS')
+        return jsonify(diagnostics), 200
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
@@ -4,20 +4,106 @@ Student management routes for Hostel Manager
 
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from app.routes.auth import login_required
-from app.database.models import Student
+from app.database.models import Student, STUDENT_REQUIRED_FIELDS
 from app.utils.room_manager import allocate_room_to_student
 from app.utils.room_manager import assign_student_to_room, vacate_student
 from app.utils.installment_manager import create_installments, get_student_installments
+from app.utils.installment_manager import get_student_ledger
 from app.utils.room_manager import get_available_rooms
+from app.utils.job_queue import enqueue, get_job
+from app.utils.data_export import students_export, export_response, parse_columns
+import config
+import os
+import uuid
 
 students_bp = Blueprint('students', __name__, url_prefix='/students')
 
+MAX_PAGE_SIZE = 100
+
+def get_page_args():
+    """
+    Read pagination, sort and filter options from the query string
+
+    Returns:
+        Dictionary of keyword arguments for Student.get_students_page
+    """
+    try:
+        limit = int(request.args.get('per_page', config.ITEMS_PER_PAGE))
+    except ValueError:
+        limit = config.ITEMS_PER_PAGE
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    return {
+        'limit': limit,
+        'cursor': request.args.get('cursor') or None,
+        'sort': request.args.get('sort', 'registration_date'),
+        'direction': request.args.get('direction', 'desc'),
+        'filters': {
+            'college_name': request.args.get('college', '').strip(),
+            'gender': request.args.get('gender', '').strip(),
+            'room_allocation': request.args.get('room', '').strip()
+        }
+    }
+
 @students_bp.route('/')
 @login_required
 def list_students():
-    """Display list of all students"""
-    students = Student.get_all_students()
-    return render_template('students/list.html', students=students)
+    """Display one page of students"""
+    page_args = get_page_args()
+    try:
+        page = Student.get_students_page(**page_args)
+    except ValueError as e:
+        return render_template('error.html', error=str(e)), 400
+
+    # Query-string values to carry over into the next-page link
+    list_args = {k: v for k, v in request.args.items() if k != 'cursor' and v}
+
+    return render_template('students/list.html',
+                         students=page['students'],
+                         next_cursor=page['next_cursor'],
+                         has_more=page['has_more'],
+                         is_first_page=not page_args['cursor'],
+                         list_args=list_args)
+
+@students_bp.route('/page')
+@login_required
+def page():
+    """Get one page of students as JSON (same options as the list view)"""
+    try:
+        page = Student.get_students_page(**get_page_args())
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    return jsonify({
+        'results': page['students'],
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more']
+    })
+
+@students_bp.route('/export')
+@login_required
+def export_students():
+    """
+    Download students as CSV or XLSX, streamed row by row
+    
+    Takes the students list filters (college, gender, room, sort, direction)
+    plus registered_from/registered_to, ?columns=a,b,c, ?format=csv|xlsx
+    and ?gzip=1.
+    """
+    page_args = get_page_args()
+    try:
+        export = students_export(
+            columns=parse_columns(request.args.get('columns')),
+            filters=page_args['filters'],
+            registered_from=request.args.get('registered_from', '').strip(),
+            registered_to=request.args.get('registered_to', '').strip(),
+            sort=page_args['sort'],
+            direction=request.args.get('direction', 'asc')
+        )
+        return export_response(export, request.args.get('format', 'csv'),
+                               request.args.get('gzip', '').lower() in ('1', 'true', 'yes', 'on'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
 @students_bp.route('/search')
 @login_required
@@ -28,7 +114,12 @@ def search():
     if not query or len(query) < 2:
         return jsonify({'results': []})
     
-    students = Student.search_students(query)
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), MAX_PAGE_SIZE))
+    except ValueError:
+        limit = 20
+    
+    students = Student.search_students(query, limit=limit)
     
     return jsonify({
         'results': students
@@ -59,12 +150,7 @@ def add_student():
             }
             
             # Validate required fields
-            required_fields = ['full_name', 'date_of_birth', 'mobile_number', 'college_name',
-                             'admission_number', 'parent_names', 'aadhaar_number', 'gender',
-                             'registration_date', 'session_expiration_date', 'full_address',
-                             'email', 'emergency_contact', 'total_fee', 'installment_count']
-            
-            missing_fields = [f for f in required_fields if not data[f]]
+            missing_fields = [f for f in STUDENT_REQUIRED_FIELDS if not data[f]]
             if missing_fields:
                 return render_template('students/add.html',
                                      error=f"Missing required fields: {', '.join(missing_fields)}")
@@ -97,6 +183,47 @@ def add_student():
     
     return render_template('students/add.html')
 
+@students_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_students_route():
+    """Bulk import students from an uploaded CSV or XLSX file (runs in the background)"""
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return render_template('students/import.html', error='Please choose a file to import')
+        
+        extension = os.path.splitext(upload.filename)[1].lower()
+        if extension not in ('.csv', '.xlsx', '.xlsm'):
+            return render_template('students/import.html',
+                                 error='Unsupported file type. Upload a .csv or .xlsx file')
+        
+        try:
+            os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
+            path = os.path.join(config.UPLOAD_FOLDER, f"{uuid.uuid4().hex}{extension}")
+            upload.save(path)
+            
+            job_id = enqueue('import_students', {
+                'path': path,
+                'filename': upload.filename,
+                'allocate_rooms': bool(request.form.get('allocate_rooms'))
+            }, max_attempts=1)
+        except Exception as e:
+            return render_template('students/import.html',
+                                 error=f"An error occurred: {str(e)}")
+        
+        return redirect(url_for('students.import_students_route', job=job_id))
+    
+    # Show the progress or report of a queued import
+    job = None
+    job_id = request.args.get('job', type=int)
+    if job_id:
+        job = get_job(job_id)
+        if not job or job['kind'] != 'import_students':
+            return render_template('students/import.html', error='Import job not found'), 404
+    
+    return render_template('students/import.html', job=job,
+                         report=job['result'] if job else None)
+
 @students_bp.route('/<aadhaar>')
 @login_required
 def view_student(aadhaar):
@@ -115,6 +242,7 @@ def view_student(aadhaar):
     return render_template('students/detail.html',
                          student=student,
                          installments=installments,
+                         ledger=get_student_ledger(aadhaar),
                          available_rooms=available_rooms)
 
 @students_bp.route('/<aadhaar>/edit', methods=['GET', 'POST'])
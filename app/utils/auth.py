@@ -3,40 +3,109 @@ Authentication utilities for Hostel Manager
 Handles password hashing and admin login
 """
 
-import hashlib
-import os
+import math
 import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+import config
 from app.database.connection import get_db_connection
+from app.utils.passwords import hash_password, verify_password, needs_rehash
 
-def hash_password(password):
-    """
-    Hash a password using SHA256
-    
-    Args:
-        password: Plain text password
-        
-    Returns:
-        Hashed password string
-    """
-    salt = os.urandom(32)
-    pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 100000)
-    return salt.hex() + pwd_hash.hex()
 
-def verify_password(password, password_hash):
+class LoginThrottle:
     """
-    Verify a password against its hash
-    
-    Args:
-        password: Plain text password to verify
-        password_hash: Stored hash to compare against
-        
-    Returns:
-        Boolean indicating if password is correct
+    Recent failed logins per username and per client address
+
+    Checked before any password hashing, so a brute-force run is turned away
+    cheaply once it passes the limit. Counts live in process memory: with
+    several worker processes each one enforces the limits separately. At
+    most MAX_KEYS usernames/addresses are tracked; the ones whose last
+    failure is oldest are forgotten first.
     """
-    salt = bytes.fromhex(password_hash[:64])
-    stored_hash = password_hash[64:]
-    pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 100000).hex()
-    return pwd_hash == stored_hash
+
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> failure times, least recently failed first
+        self._failures = OrderedDict()
+
+    @staticmethod
+    def _limits():
+        return (getattr(config, 'LOGIN_MAX_FAILURES', 5),
+                getattr(config, 'LOGIN_MAX_FAILURES_PER_ADDRESS', 20),
+                getattr(config, 'LOGIN_THROTTLE_WINDOW', 900))
+
+    @staticmethod
+    def _keys(username, address):
+        keys = [('user', (username or '').strip().lower())]
+        if address:
+            keys.append(('addr', address))
+        return keys
+
+    def _recent(self, key, now, window):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, username, address=None):
+        """Seconds until this username/address may try again (0 = allowed)"""
+        user_limit, address_limit, window = self._limits()
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for key in self._keys(username, address):
+                failures = self._recent(key, now, window)
+                limit = user_limit if key[0] == 'user' else address_limit
+                if failures is not None and len(failures) >= limit:
+                    wait = max(wait, failures[-limit] + window - now)
+        return wait
+
+    def record_failure(self, username, address=None):
+        _, _, window = self._limits()
+        now = time.monotonic()
+        with self._lock:
+            for key in self._keys(username, address):
+                failures = self._recent(key, now, window)
+                if failures is None:
+                    failures = self._failures[key] = deque()
+                else:
+                    self._failures.move_to_end(key)
+                failures.append(now)
+            while len(self._failures) > self.MAX_KEYS:
+                self._failures.popitem(last=False)
+
+    def reset(self, username):
+        """Forget a username's failures after it logs in successfully"""
+        with self._lock:
+            self._failures.pop(self._keys(username, None)[0], None)
+
+
+login_throttle = LoginThrottle()
+
+# Password hashing is deliberately slow; cap how many request threads can be
+# doing it at once so a burst of logins cannot occupy every worker
+_hash_slots = threading.BoundedSemaphore(getattr(config, 'LOGIN_MAX_CONCURRENT_HASHES', 2))
+
+_dummy_hash = None
+_dummy_hash_lock = threading.Lock()
+
+
+def _dummy_password_hash():
+    """A hash to verify against for unknown usernames, so they take as long as known ones"""
+    global _dummy_hash
+    with _dummy_hash_lock:
+        if _dummy_hash is None:
+            _dummy_hash = hash_password('not-a-real-password')
+        return _dummy_hash
 
 def create_admin_user(username, password):
     """
@@ -70,18 +139,29 @@ def create_admin_user(username, password):
     except Exception as e:
         return False, f"Error: {str(e)}"
 
-def verify_admin_credentials(username, password):
+def verify_admin_credentials(username, password, client_address=None):
     """
     Verify admin login credentials
     
+    Throttled usernames and addresses are rejected before the password is
+    hashed. A hash made with an older algorithm or cost is replaced after a
+    successful login.
+    
     Args:
         username: Admin username
         password: Admin password
+        client_address: Remote address of the request, for per-address limits
         
     Returns:
         Tuple (success: bool, admin_id: int or None, message: str)
     """
     try:
+        wait = login_throttle.retry_after(username, client_address)
+        if wait:
+            minutes = max(1, math.ceil(wait / 60))
+            return False, None, (f"Too many failed login attempts. "
+                                 f"Try again in {minutes} minute{'s' if minutes != 1 else ''}.")
+        
         conn = get_db_connection()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
@@ -90,13 +170,35 @@ def verify_admin_credentials(username, password):
         admin = cursor.fetchone()
         conn.close()
         
-        if not admin:
-            return False, None, "Invalid username or password"
+        # Unknown usernames are checked against a dummy hash so the response
+        # time does not reveal which usernames exist
+        password_hash = admin['password_hash'] if admin else _dummy_password_hash()
+        
+        if not _hash_slots.acquire(timeout=getattr(config, 'LOGIN_HASH_WAIT', 5)):
+            return False, None, "The server is busy. Please try again."
+        try:
+            valid = verify_password(password, password_hash) and admin is not None
+            if valid and needs_rehash(password_hash):
+                _upgrade_password_hash(admin['id'], password)
+        finally:
+            _hash_slots.release()
         
-        if verify_password(password, admin['password_hash']):
+        if valid:
+            login_throttle.reset(username)
             return True, admin['id'], "Login successful"
         else:
+            login_throttle.record_failure(username, client_address)
             return False, None, "Invalid username or password"
             
     except Exception as e:
         return False, None, f"Error: {str(e)}"
+
+def _upgrade_password_hash(admin_id, password):
+    """Re-hash a password with the current algorithm and cost"""
+    conn = get_db_connection()
+    try:
+        conn.execute('UPDATE admin_users SET password_hash = ? WHERE id = ?',
+                     (hash_password(password), admin_id))
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,261 @@
+"""
+Capacity planning for Hostel Manager
+Previews and applies bulk room capacity changes, re-homing students that no longer fit
+"""
+
+import re
+import time
+
+from app.database.connection import get_db_connection, write_transaction
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+from app.utils.vacancy_index import invalidate_vacancy_index
+from app.utils.room_allocator import place_students, POLICIES
+
+NOT_ALLOCATED = 'Not Allocated'
+
+MAX_RULES = 100
+
+
+class CapacityChangeAborted(Exception):
+    """Raised inside the transaction to roll a capacity change back"""
+
+
+def glob_escape(room_number):
+    """Quote a room number so GLOB matches it literally"""
+    return re.sub(r'([*?\[])', r'[\1]', room_number)
+
+
+def parse_capacity_rules(text):
+    """
+    Parse capacity rules, one per line, in the form "pattern = capacity"
+
+    Patterns use GLOB syntax over room numbers, so a block or floor is
+    selected by its prefix, e.g. "A-1* = 3" for floor 1 of block A. The first
+    matching rule wins; rooms matching no rule keep their capacity.
+
+    Args:
+        text: Rules text; blank lines and lines starting with # are ignored
+
+    Returns:
+        List of (pattern, capacity) tuples
+
+    Raises:
+        ValueError describing the first invalid line
+    """
+    rules = []
+    for line_number, line in enumerate((text or '').splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        pattern, sep, capacity = line.rpartition('=')
+        pattern = pattern.strip()
+        if not sep or not pattern:
+            raise ValueError(f"Line {line_number}: expected 'pattern = capacity'")
+        try:
+            capacity = int(capacity)
+        except ValueError:
+            raise ValueError(f"Line {line_number}: capacity must be a whole number")
+        rules.append((pattern, capacity))
+    validate_capacity_rules(rules)
+    return rules
+
+
+def validate_capacity_rules(rules):
+    """Raise ValueError if rules is empty, too long or has a bad capacity"""
+    if not rules:
+        raise ValueError("At least one capacity rule is required")
+    if len(rules) > MAX_RULES:
+        raise ValueError(f"At most {MAX_RULES} capacity rules are allowed")
+    for pattern, capacity in rules:
+        if not pattern:
+            raise ValueError("Rule patterns cannot be empty")
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError(f"Capacity for '{pattern}' must be greater than 0")
+
+
+def _capacity_expression(rules):
+    """SQL CASE giving each room's new capacity, and its parameters"""
+    whens = ' '.join('WHEN room_number GLOB ? THEN ?' for _ in rules)
+    params = [value for rule in rules for value in rule]
+    return f'CASE {whens} ELSE capacity END', params
+
+
+def _impact(cursor, rules):
+    """Compute the effect of the rules on every room in one aggregate query"""
+    expression, params = _capacity_expression(rules)
+    cursor.execute(f'''
+        WITH target AS (
+            SELECT room_number, capacity AS old_capacity, occupied_count,
+                   {expression} AS new_capacity
+            FROM rooms
+        )
+        SELECT COUNT(*),
+               COALESCE(SUM(new_capacity != old_capacity), 0),
+               COALESCE(SUM(old_capacity), 0),
+               COALESCE(SUM(new_capacity), 0),
+               COALESCE(SUM(occupied_count > new_capacity), 0),
+               COALESCE(SUM(MAX(occupied_count - new_capacity, 0)), 0),
+               COALESCE(SUM(MAX(new_capacity - occupied_count, 0)), 0)
+        FROM target
+    ''', params)
+    (total_rooms, rooms_changed, capacity_before, capacity_after,
+     overflow_count, students_to_move, free_beds_after) = cursor.fetchone()
+
+    overflow_rooms = []
+    if overflow_count:
+        cursor.execute(f'''
+            SELECT room_number, capacity, {expression} AS new_capacity, occupied_count
+            FROM rooms
+            WHERE occupied_count > {expression}
+            ORDER BY room_number
+        ''', params + params)
+        overflow_rooms = [{'room_number': row[0], 'capacity': row[1], 'new_capacity': row[2],
+                           'occupied_count': row[3], 'overflow': row[3] - row[2]}
+                          for row in cursor.fetchall()]
+
+    return {
+        'total_rooms': total_rooms,
+        'rooms_changed': rooms_changed,
+        'capacity_before': capacity_before,
+        'capacity_after': capacity_after,
+        'overflow_rooms': overflow_rooms,
+        'students_to_move': students_to_move,
+        'free_beds_after': free_beds_after,
+        'can_rehome': free_beds_after >= students_to_move
+    }
+
+
+def preview_capacity_change(rules):
+    """
+    Show what a capacity change would do without applying it
+
+    Args:
+        rules: List of (pattern, capacity) tuples, first match wins
+
+    Returns:
+        Tuple (success: bool, impact: dict or None, message: str)
+    """
+    try:
+        validate_capacity_rules(rules)
+    except ValueError as e:
+        return False, None, str(e)
+
+    try:
+        conn = get_db_connection()
+        impact = _impact(conn.cursor(), rules)
+        conn.close()
+    except Exception as e:
+        return False, None, f"Error: {str(e)}"
+
+    message = f"{impact['rooms_changed']} room(s) would change capacity"
+    if impact['students_to_move']:
+        message += (f"; {len(impact['overflow_rooms'])} room(s) would overflow by "
+                    f"{impact['students_to_move']} student(s)")
+    return True, impact, message
+
+
+def _select_overflow_students(cursor):
+    """Pick the most recently registered students in each over-capacity room"""
+    cursor.execute('''
+        SELECT aadhaar_number, room_allocation FROM (
+            SELECT s.aadhaar_number, s.room_allocation,
+                   r.occupied_count - r.capacity AS excess,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY s.room_allocation
+                       ORDER BY s.registration_date DESC, s.aadhaar_number DESC
+                   ) AS position
+            FROM students s
+            JOIN rooms r ON r.room_number = s.room_allocation
+            WHERE r.occupied_count > r.capacity
+        )
+        WHERE position <= excess
+    ''')
+    return cursor.fetchall()
+
+
+def apply_capacity_change(rules, rehome=False, policy='pack'):
+    """
+    Change room capacities in one transaction
+
+    Without rehome the change is refused if any room would hold more
+    students than its new capacity. With rehome, the most recently registered
+    students of each overflowing room are moved with the batch allocator in
+    the same transaction; if they cannot all be placed nothing is changed.
+
+    Args:
+        rules: List of (pattern, capacity) tuples, first match wins
+        rehome: Move students out of rooms that would overflow
+        policy: Allocation policy used for re-homing (see room_allocator.POLICIES)
+
+    Returns:
+        Tuple (success: bool, result: dict or None, message: str); result has
+        the impact, rooms_changed, moves and seconds
+    """
+    try:
+        validate_capacity_rules(rules)
+    except ValueError as e:
+        return False, None, str(e)
+    if policy not in POLICIES:
+        return False, None, f"Unknown policy '{policy}'. Choose from: {', '.join(POLICIES)}"
+
+    started = time.perf_counter()
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        moves = []
+
+        with write_transaction(conn):
+            impact = _impact(cursor, rules)
+            if impact['students_to_move'] and not rehome:
+                raise CapacityChangeAborted(
+                    f"{len(impact['overflow_rooms'])} room(s) would hold more students than "
+                    f"their new capacity ({impact['students_to_move']} to move). "
+                    f"Enable re-homing or choose a larger capacity")
+            if impact['students_to_move'] > impact['free_beds_after']:
+                raise CapacityChangeAborted(
+                    f"Not enough free beds to re-home {impact['students_to_move']} student(s) "
+                    f"({impact['free_beds_after']} available after the change)")
+
+            expression, params = _capacity_expression(rules)
+            cursor.execute(f'''
+                UPDATE rooms SET capacity = {expression}
+                WHERE capacity != {expression}
+            ''', params + params)
+            rooms_changed = cursor.rowcount
+
+            if impact['students_to_move']:
+                overflow = _select_overflow_students(cursor)
+                previous = dict(overflow)
+                # Triggers free the beds; the rooms are now exactly full
+                cursor.executemany('UPDATE students SET room_allocation = ? WHERE aadhaar_number = ?',
+                                   [(NOT_ALLOCATED, aadhaar) for aadhaar, _ in overflow])
+                _, plan, unplaced = place_students(cursor, [a for a, _ in overflow], policy)
+                if unplaced:
+                    raise CapacityChangeAborted(
+                        f"Could not re-home {len(unplaced)} student(s); no changes were made")
+                moves = [{'aadhaar_number': aadhaar, 'from_room': previous[aadhaar],
+                          'to_room': room_number} for aadhaar, room_number in plan]
+
+        conn.close()
+        invalidate_vacancy_index()
+        invalidate_dashboard_cache()
+
+        result = {
+            'impact': impact,
+            'rooms_changed': rooms_changed,
+            'moves': moves,
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        message = f"Updated capacity of {rooms_changed} room(s)"
+        if moves:
+            message += f" and moved {len(moves)} student(s)"
+        return True, result, message
+
+    except CapacityChangeAborted as e:
+        conn.close()
+        return False, None, str(e)
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        return False, None, f"Error: {str(e)}"
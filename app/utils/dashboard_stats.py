@@ -0,0 +1,102 @@
+"""
+Dashboard statistics for Hostel Manager
+Computes all dashboard KPIs in two aggregate queries and caches the result
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import config
+from app.database.connection import get_db_connection
+
+_cache_lock = threading.Lock()
+_snapshot = None
+_snapshot_date = None
+_snapshot_time = 0.0
+_generation = 0
+
+
+def invalidate_dashboard_cache():
+    """Drop the cached snapshot; call after writing students, rooms or installments"""
+    global _snapshot, _generation
+    with _cache_lock:
+        _snapshot = None
+        _generation += 1
+
+
+def _compute_snapshot():
+    """Run the aggregate queries and build the snapshot dictionary"""
+    from app.utils.installment_manager import get_payment_statistics
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Room occupancy comes from the trigger-maintained counters
+    cursor.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM students),
+            COUNT(*),
+            COALESCE(SUM(capacity), 0),
+            COALESCE(SUM(occupied_count), 0),
+            COALESCE(SUM(CASE WHEN occupied_count > 0 THEN 1 ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN occupied_count < capacity THEN 1 ELSE 0 END), 0)
+        FROM rooms
+    ''')
+    (total_students, total_rooms, total_capacity, total_occupied,
+     occupied_rooms, vacant_rooms) = cursor.fetchone()
+
+    conn.close()
+
+    # All payment KPIs come from a single scan of installments
+    payment_stats = get_payment_statistics()
+
+    return {
+        'total_students': total_students,
+        'total_rooms': total_rooms,
+        'total_capacity': total_capacity,
+        'total_occupied': total_occupied,
+        'total_vacant': total_capacity - total_occupied,
+        'occupied_rooms': occupied_rooms,
+        'vacant_rooms': vacant_rooms,
+        'total_installments': payment_stats['total_installments'],
+        'paid_installments': payment_stats['paid_installments'],
+        'pending_payments': payment_stats['pending_installments'],
+        'overdue_payments': payment_stats['overdue_count'],
+        'total_pending_amount': float(payment_stats['total_pending_amount'] or 0),
+        'as_of': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def get_dashboard_snapshot():
+    """
+    Get dashboard KPIs, served from the in-process cache when fresh
+
+    The cache is dropped explicitly by write helpers, expires after
+    DASHBOARD_CACHE_TTL seconds (covers writes from other processes) and is
+    recomputed when the date changes so overdue counts stay correct.
+
+    Returns:
+        Dictionary with student, room and payment totals
+    """
+    global _snapshot, _snapshot_date, _snapshot_time
+    ttl = getattr(config, 'DASHBOARD_CACHE_TTL', 30)
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    with _cache_lock:
+        if (_snapshot is not None and _snapshot_date == today
+                and time.monotonic() - _snapshot_time < ttl):
+            return dict(_snapshot)
+        generation = _generation
+
+    snapshot = _compute_snapshot()
+
+    with _cache_lock:
+        # A write during the computation makes this result stale already
+        if generation != _generation:
+            return dict(snapshot)
+        _snapshot = snapshot
+        _snapshot_date = today
+        _snapshot_time = time.monotonic()
+
+    return dict(snapshot)
@@ -0,0 +1,392 @@
+"""
+Data export for Hostel Manager
+Streams students, rooms and installments as CSV or XLSX without loading them into memory
+"""
+
+import csv
+import io
+import tempfile
+import zlib
+from datetime import datetime
+
+from flask import Response
+
+from app.database.connection import open_read_only_connection
+from app.database.migrations import AGING_BUCKET_SQL
+from app.database.models import STUDENT_FILTER_COLUMNS, STUDENT_SORT_COLUMNS
+from app.utils.installment_manager import (
+    AGING_BUCKETS, OVERDUE_BUCKETS, UPCOMING_BUCKETS, aging_bucket_condition
+)
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Rows fetched from SQLite per round trip
+FETCH_SIZE = 1000
+
+# Bytes of CSV buffered before a chunk is sent
+CHUNK_SIZE = 64 * 1024
+
+# Exportable columns: name -> SQL expression, in default column order
+STUDENT_EXPORT_COLUMNS = {
+    'aadhaar_number': 'aadhaar_number',
+    'full_name': 'full_name',
+    'admission_number': 'admission_number',
+    'college_name': 'college_name',
+    'gender': 'gender',
+    'date_of_birth': 'date_of_birth',
+    'mobile_number': 'mobile_number',
+    'email': 'email',
+    'parent_names': 'parent_names',
+    'emergency_contact': 'emergency_contact',
+    'full_address': 'full_address',
+    'registration_date': 'registration_date',
+    'session_expiration_date': 'session_expiration_date',
+    'room_allocation': 'room_allocation',
+    'total_fee': 'total_fee',
+    'installment_count': 'installment_count',
+}
+
+ROOM_EXPORT_COLUMNS = {
+    'room_number': 'room_number',
+    'capacity': 'capacity',
+    'occupied_count': 'occupied_count',
+    'vacant_count': 'MAX(capacity - occupied_count, 0)',
+}
+
+INSTALLMENT_EXPORT_COLUMNS = {
+    'aadhaar_number': 'i.aadhaar_number',
+    'full_name': 's.full_name',
+    'email': 's.email',
+    'mobile_number': 's.mobile_number',
+    'college_name': 's.college_name',
+    'installment_number': 'i.installment_number',
+    'due_date': 'i.due_date',
+    'amount': 'i.amount',
+    'amount_paid': 'i.amount_paid',
+    'balance': 'i.amount - i.amount_paid',
+    'payment_status': 'i.payment_status',
+    'paid_date': 'i.paid_date',
+    'aging_bucket': AGING_BUCKET_SQL.format(row='i.', today="date('now', 'localtime')"),
+    'overdue_days': "MAX(CAST(julianday('now', 'localtime', 'start of day')"
+                    " - julianday(i.due_date) AS INTEGER), 0)",
+}
+
+# Installment views, matching get_pending/get_overdue/get_upcoming_installments
+INSTALLMENT_VIEWS = ('all', 'pending', 'overdue', 'upcoming', 'paid')
+INSTALLMENT_VIEW_BUCKETS = {
+    'pending': tuple(name for name, _ in AGING_BUCKETS),
+    'overdue': OVERDUE_BUCKETS,
+    'upcoming': UPCOMING_BUCKETS,
+}
+
+
+class Export:
+    """
+    A validated query over one table: selected columns, filters and row order
+
+    Streams use the whole query; the API reads it one keyset page at a time,
+    ordered by `keys` (a unique, indexed ordering ending in a key column).
+    """
+
+    def __init__(self, name, columns, expressions, source, conditions, params,
+                 keys, descending=False):
+        self.name = name
+        self.columns = columns
+        self.expressions = expressions
+        self.source = source
+        self.conditions = conditions
+        self.params = params
+        self.keys = keys
+        self.descending = descending
+
+    def query(self, after=None, limit=None):
+        """
+        Build the SELECT statement
+
+        Args:
+            after: Key values of the last row already seen (keyset paging)
+            limit: Maximum rows; when set, each row ends with its key values
+
+        Returns:
+            Tuple (sql, params)
+        """
+        select = [f'{self.expressions[c]} AS {c}' for c in self.columns]
+        conditions = list(self.conditions)
+        params = list(self.params)
+        if limit is not None:
+            select += [f'{key} AS _key{i}' for i, key in enumerate(self.keys)]
+        if after is not None:
+            operator = '<' if self.descending else '>'
+            conditions.append(f"({', '.join(self.keys)}) {operator} "
+                              f"({', '.join('?' * len(self.keys))})")
+            params.extend(after)
+
+        order = 'DESC' if self.descending else 'ASC'
+        sql = f"SELECT {', '.join(select)} FROM {self.source}"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        sql += f" ORDER BY {', '.join(f'{key} {order}' for key in self.keys)}"
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return sql, params
+
+    def where(self, condition, *params):
+        """Narrow the export by one more SQL condition; returns self for chaining"""
+        self.conditions = list(self.conditions) + [condition]
+        self.params = list(self.params) + list(params)
+        return self
+
+    def filename(self, fmt, compress=False):
+        stamp = datetime.now().strftime('%Y%m%d')
+        return f"{self.name}-{stamp}.{fmt}{'.gz' if compress else ''}"
+
+
+def parse_columns(value):
+    """Split a comma-separated ?columns= value into column names"""
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def _select_columns(available, columns):
+    """Validate a column selection (None or empty means all, in default order)"""
+    if not columns:
+        return list(available)
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}. "
+                         f"Choose from: {', '.join(available)}")
+    return list(columns)
+
+
+def students_export(columns=None, filters=None, registered_from=None, registered_to=None,
+                    sort='registration_date', direction='asc'):
+    """
+    Build a students export
+
+    Args:
+        columns: Column names from STUDENT_EXPORT_COLUMNS (default: all)
+        filters: Optional dict of column -> value (STUDENT_FILTER_COLUMNS),
+            as on the students list
+        registered_from, registered_to: Optional inclusive registration date range
+        sort: One of STUDENT_SORT_COLUMNS
+        direction: 'asc' or 'desc'
+
+    Returns:
+        Export object
+
+    Raises:
+        ValueError for an unknown column, filter or sort
+    """
+    columns = _select_columns(STUDENT_EXPORT_COLUMNS, columns)
+    if sort not in STUDENT_SORT_COLUMNS:
+        raise ValueError(f"Cannot sort students by {sort}")
+    if direction not in ('asc', 'desc'):
+        raise ValueError("Sort direction must be 'asc' or 'desc'")
+
+    conditions = []
+    params = []
+    for column, value in (filters or {}).items():
+        if column not in STUDENT_FILTER_COLUMNS:
+            raise ValueError(f"Cannot filter students by {column}")
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if registered_from:
+        conditions.append('registration_date >= ?')
+        params.append(registered_from)
+    if registered_to:
+        conditions.append('registration_date <= ?')
+        params.append(registered_to)
+
+    # The keyset indexes cover these orderings, so no sort step is needed
+    return Export('students', columns, STUDENT_EXPORT_COLUMNS, 'students', conditions, params,
+                  keys=[sort, 'aadhaar_number'], descending=direction == 'desc')
+
+
+def rooms_export(columns=None, vacant_only=False):
+    """
+    Build a rooms export
+
+    Args:
+        columns: Column names from ROOM_EXPORT_COLUMNS (default: all)
+        vacant_only: Only rooms with at least one free bed
+
+    Returns:
+        Export object
+    """
+    columns = _select_columns(ROOM_EXPORT_COLUMNS, columns)
+    conditions = ['occupied_count < capacity'] if vacant_only else []
+    return Export('rooms', columns, ROOM_EXPORT_COLUMNS, 'rooms', conditions, [],
+                  keys=['room_number'])
+
+
+def installments_export(columns=None, view='all', bucket=None, aadhaar_number=None,
+                        due_from=None, due_to=None):
+    """
+    Build an installments export
+
+    Args:
+        columns: Column names from INSTALLMENT_EXPORT_COLUMNS (default: all)
+        view: One of INSTALLMENT_VIEWS; pending, overdue and upcoming select
+            the same rows as the payment pages
+        bucket: Optional aging bucket (see installment_manager.AGING_BUCKETS)
+        aadhaar_number: Only this student's installments
+        due_from, due_to: Optional inclusive due date range
+
+    Returns:
+        Export object
+
+    Raises:
+        ValueError for an unknown column, view or bucket
+    """
+    columns = _select_columns(INSTALLMENT_EXPORT_COLUMNS, columns)
+    if view not in INSTALLMENT_VIEWS:
+        raise ValueError(f"Unknown view '{view}'. Choose from: {', '.join(INSTALLMENT_VIEWS)}")
+
+    conditions = []
+    params = []
+    buckets = INSTALLMENT_VIEW_BUCKETS.get(view)
+    if bucket:
+        if bucket not in dict(AGING_BUCKETS):
+            raise ValueError(f"Unknown bucket '{bucket}'")
+        # A bucket outside the chosen view matches nothing
+        in_view = view != 'paid' and (buckets is None or bucket in buckets)
+        buckets = [bucket] if in_view else []
+    if buckets is not None:
+        # Current buckets, whether or not tonight's aging run has happened
+        condition, bucket_params = aging_bucket_condition(buckets)
+        conditions.append(f'({condition})')
+        params.extend(bucket_params)
+    if view == 'paid':
+        conditions.append("LOWER(i.payment_status) = 'paid'")
+    if aadhaar_number:
+        conditions.append('i.aadhaar_number = ?')
+        params.append(aadhaar_number)
+    if due_from:
+        conditions.append('i.due_date >= ?')
+        params.append(due_from)
+    if due_to:
+        conditions.append('i.due_date <= ?')
+        params.append(due_to)
+
+    name = 'installments' if view == 'all' else f'installments-{view}'
+    # (due_date, id) is the order of idx_installments_due_date
+    return Export(name, columns, INSTALLMENT_EXPORT_COLUMNS,
+                  'installments i JOIN students s ON s.aadhaar_number = i.aadhaar_number',
+                  conditions, params, keys=['i.due_date', 'i.id'])
+
+
+def iter_rows(export):
+    """
+    Yield result rows of an export straight from a SQLite cursor
+
+    The stream gets its own read-only connection rather than a pool slot, so
+    slow downloads cannot starve other requests. It is opened when the first
+    row is needed (the request context has ended by then) and closed when
+    the generator finishes or is closed.
+    """
+    sql, params = export.query()
+    conn = open_read_only_connection()
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def iter_csv(export):
+    """Yield the export as UTF-8 CSV in chunks of about CHUNK_SIZE bytes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(export.columns)
+    for row in iter_rows(export):
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_xlsx(export):
+    """
+    Yield the export as an XLSX workbook
+
+    Requires the optional openpyxl package. A workbook is a zip archive, so
+    it cannot be sent before it is complete; openpyxl's write-only mode keeps
+    memory flat while the sheet is written to a temporary file, which is
+    then streamed out in chunks.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("XLSX export requires the openpyxl package (pip install openpyxl)")
+
+    def generate():
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(export.name[:31])
+        sheet.append(export.columns)
+        for row in iter_rows(export):
+            sheet.append(list(row))
+        with tempfile.TemporaryFile() as stream:
+            workbook.save(stream)
+            stream.seek(0)
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    return generate()
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of byte chunks into a single gzip stream"""
+    # wbits=31 writes the gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(export, fmt='csv', compress=False):
+    """
+    Build a streamed download response for an export
+
+    Args:
+        export: Export object
+        fmt: 'csv' or 'xlsx'
+        compress: Gzip the output (file name gets a .gz suffix)
+
+    Returns:
+        flask.Response streaming the file
+
+    Raises:
+        ValueError for an unknown format or missing XLSX support
+    """
+    if fmt == 'csv':
+        chunks = iter_csv(export)
+        mimetype = 'text/csv'
+    elif fmt == 'xlsx':
+        chunks = iter_xlsx(export)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        raise ValueError(f"Unknown format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}")
+
+    if compress:
+        chunks = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{export.filename(fmt, compress)}"')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
@@ -3,30 +3,27 @@ Email utilities for Hostel Manager
 Handles sending reminder emails for overdue payments
 """
 
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from app.database.connection import get_db_connection
+
+import config
+from app.utils.settings_store import get_settings, save_settings
+from app.utils.job_queue import register_handler, enqueue, PermanentJobError
+
+EMAIL_SETTINGS = ('email_sender', 'email_password', 'smtp_server', 'smtp_port')
 
 def get_email_config():
     """
-    Get email configuration from settings table
+    Get email configuration from the settings cache
     
     Returns:
-        Dictionary with email config (sender_email, sender_password, smtp_server, smtp_port)
+        Dictionary with email_sender, email_password, smtp_server and smtp_port (int)
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT key, value FROM settings WHERE key LIKE ?', ('%email%',))
-    settings = cursor.fetchall()
-    conn.close()
-    
-    config = {}
-    for key, value in settings:
-        config[key] = value
-    
-    return config
+    return get_settings(EMAIL_SETTINGS)
 
 def save_email_config(sender_email, sender_password, smtp_server='smtp.gmail.com', smtp_port='587'):
     """
@@ -42,54 +39,28 @@ def save_email_config(sender_email, sender_password, smtp_server='smtp.gmail.com
         Tuple (success: bool, message: str)
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Save or update email settings
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                      ('email_sender', sender_email))
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                      ('email_password', sender_password))
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                      ('smtp_server', smtp_server))
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                      ('smtp_port', smtp_port))
-        
-        conn.commit()
-        conn.close()
-        
+        save_settings({
+            'email_sender': sender_email,
+            'email_password': sender_password,
+            'smtp_server': smtp_server,
+            'smtp_port': smtp_port
+        })
         return True, "Email configuration saved successfully"
         
+    except ValueError as e:
+        return False, str(e)
     except Exception as e:
         return False, f"Error: {str(e)}"
 
-def send_reminder_email(recipient_email, student_name, amount, due_date):
+def build_reminder_message(sender_email, recipient_email, student_name, amount, due_date):
     """
-    Send a reminder email for overdue payment
+    Build the reminder email for an overdue payment
     
-    Args:
-        recipient_email: Email address to send to
-        student_name: Name of the student
-        amount: Amount due
-        due_date: Due date of the payment
-        
     Returns:
-        Tuple (success: bool, message: str)
+        MIMEMultipart message ready to send
     """
-    try:
-        config = get_email_config()
-        
-        if not config.get('email_sender') or not config.get('email_password'):
-            return False, "Email configuration not set. Please configure email settings first."
-        
-        sender_email = config['email_sender']
-        sender_password = config['email_password']
-        smtp_server = config.get('smtp_server', 'smtp.gmail.com')
-        smtp_port = int(config.get('smtp_port', 587))
-        
-        # Create email message
-        subject = f"Hostel Fee Reminder - Payment Overdue"
-        body = f"""
+    subject = f"Hostel Fee Reminder - Payment Overdue"
+    body = f"""
 Dear {student_name},
 
 This is a reminder that your hostel fee payment is overdue.
@@ -103,17 +74,62 @@ Please make the payment as soon as possible. Contact the hostel office if you ha
 Best regards,
 Hostel Management
         """
+    
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def open_smtp_session(email_config):
+    """
+    Open an authenticated SMTP connection
+    
+    Args:
+        email_config: Dictionary from get_email_config()
         
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
+    Returns:
+        smtplib.SMTP object, ready for send_message()
+    """
+    smtp_server = email_config.get('smtp_server', 'smtp.gmail.com')
+    smtp_port = int(email_config.get('smtp_port', 587))
+    
+    server = smtplib.SMTP(smtp_server, smtp_port,
+                          timeout=getattr(config, 'SMTP_TIMEOUT', 30))
+    try:
+        if getattr(config, 'SMTP_USE_TLS', True):
+            server.starttls()
+        server.login(email_config['email_sender'], email_config['email_password'])
+    except Exception:
+        server.close()
+        raise
+    return server
+
+def send_reminder_email(recipient_email, student_name, amount, due_date):
+    """
+    Send a reminder email for overdue payment
+    
+    Args:
+        recipient_email: Email address to send to
+        student_name: Name of the student
+        amount: Amount due
+        due_date: Due date of the payment
+        
+    Returns:
+        Tuple (success: bool, message: str)
+    """
+    try:
+        email_config = get_email_config()
+        
+        if not email_config.get('email_sender') or not email_config.get('email_password'):
+            return False, "Email configuration not set. Please configure email settings first."
+        
+        msg = build_reminder_message(email_config['email_sender'], recipient_email,
+                                     student_name, amount, due_date)
         
         # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
+        server = open_smtp_session(email_config)
         server.send_message(msg)
         server.quit()
         
@@ -124,6 +140,170 @@ Hostel Management
     except Exception as e:
         return False, f"Error sending email: {str(e)}"
 
+class RateLimiter:
+    """
+    Spaces out calls so no more than `rate` happen per second
+
+    Shared by every connection to the same SMTP server, so adding workers
+    never exceeds the server's sending limit.
+    """
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+    
+    def wait(self):
+        """Block until the caller may send the next message"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(smtp_server):
+    """Get the process-wide rate limiter for an SMTP server"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(smtp_server)
+        if limiter is None:
+            limiter = RateLimiter(getattr(config, 'SMTP_MESSAGES_PER_SECOND', 5))
+            _rate_limiters[smtp_server] = limiter
+        return limiter
+
+def is_transient_smtp_error(error):
+    """
+    Whether sending might succeed if tried again later
+
+    Connection problems and 4xx replies are transient; authentication
+    failures, refused recipients and other 5xx replies are not.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+class BulkMailer:
+    """
+    Sends reminder emails over a small pool of persistent SMTP sessions
+
+    Each worker thread opens one connection (STARTTLS and LOGIN once) and
+    reuses it for every message it sends, reconnecting only if the server
+    drops it. Sends are throttled per SMTP server by a shared RateLimiter.
+    """
+    
+    def __init__(self, email_config, max_connections=None, on_progress=None, on_result=None):
+        self.email_config = email_config
+        self.max_connections = max_connections or getattr(config, 'SMTP_MAX_CONNECTIONS', 3)
+        self.limiter = get_rate_limiter(email_config.get('smtp_server', 'smtp.gmail.com'))
+        self.on_progress = on_progress
+        # Called as on_result(student, error, transient) after each message;
+        # error is None when it was sent
+        self.on_result = on_result
+        self.progress = {}
+        self._lock = threading.Lock()
+    
+    def _record(self, success, student, message, transient=False):
+        if self.on_result:
+            self.on_result(student, None if success else f"{student['full_name']}: {message}",
+                           transient)
+        with self._lock:
+            if success:
+                self.progress['sent'] += 1
+            else:
+                self.progress['failed'] += 1
+                self.progress['errors'].append(f"{student['full_name']}: {message}")
+            snapshot = dict(self.progress)
+        if self.on_progress:
+            self.on_progress(snapshot)
+    
+    def _send(self, server, student):
+        msg = build_reminder_message(self.email_config['email_sender'], student['email'],
+                                     student['full_name'], student['amount'],
+                                     student['due_date'])
+        self.limiter.wait()
+        server.send_message(msg)
+    
+    def _worker(self, work):
+        server = None
+        try:
+            while True:
+                try:
+                    student = work.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    if server is None:
+                        server = open_smtp_session(self.email_config)
+                    try:
+                        self._send(server, student)
+                    except smtplib.SMTPServerDisconnected:
+                        # Idle sessions get dropped; reconnect once and retry
+                        server.close()
+                        server = None
+                        server = open_smtp_session(self.email_config)
+                        self._send(server, student)
+                    self._record(True, student, None)
+                except smtplib.SMTPAuthenticationError:
+                    # Every other worker would fail the same way: fail the rest fast
+                    message = "Email authentication failed. Check your email and password."
+                    self._record(False, student, message)
+                    while True:
+                        try:
+                            self._record(False, work.get_nowait(), message)
+                        except queue.Empty:
+                            return
+                except Exception as e:
+                    # Drop the session on connection-level failures only; a
+                    # refused recipient leaves it usable for the next message
+                    if (isinstance(e, smtplib.SMTPServerDisconnected)
+                            or not isinstance(e, smtplib.SMTPException)):
+                        if server is not None:
+                            server.close()
+                        server = None
+                    self._record(False, student, f"Error sending email: {str(e)}",
+                                 transient=is_transient_smtp_error(e))
+        finally:
+            if server is not None:
+                try:
+                    server.quit()
+                except Exception:
+                    pass
+    
+    def send(self, overdue_students):
+        """
+        Send one reminder per student and wait for all workers to finish
+        
+        Args:
+            overdue_students: List of dictionaries with full_name, email, amount, due_date
+            
+        Returns:
+            The progress dictionary (total, sent, failed, errors)
+        """
+        work = queue.Queue()
+        for student in overdue_students:
+            work.put(student)
+        
+        with self._lock:
+            self.progress.update({'total': len(overdue_students), 'sent': 0,
+                                  'failed': 0, 'errors': []})
+        
+        workers = [threading.Thread(target=self._worker, args=(work,), daemon=True)
+                   for _ in range(min(self.max_connections, len(overdue_students)))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        return self.progress
+
 def send_bulk_reminders(overdue_students):
     """
     Send reminder emails to multiple students with overdue payments
@@ -135,22 +315,81 @@ def send_bulk_reminders(overdue_students):
         Tuple (total: int, sent: int, failed: int, errors: list)
     """
     total = len(overdue_students)
-    sent = 0
-    failed = 0
-    errors = []
-    
-    for student in overdue_students:
-        success, message = send_reminder_email(
-            student['email'],
-            student['full_name'],
-            student['amount'],
-            student['due_date']
-        )
-        
-        if success:
-            sent += 1
-        else:
-            failed += 1
-            errors.append(f"{student['full_name']}: {message}")
-    
-    return total, sent, failed, errors
+    email_config = get_email_config()
+    
+    if not email_config.get('email_sender') or not email_config.get('email_password'):
+        message = "Email configuration not set. Please configure email settings first."
+        return total, 0, total, [f"{s['full_name']}: {message}" for s in overdue_students]
+    
+    progress = BulkMailer(email_config).send(overdue_students)
+    return progress['total'], progress['sent'], progress['failed'], progress['errors']
+
+@register_handler('bulk_reminders')
+def bulk_reminders_job(overdue_students, job):
+    """
+    Background job: send reminders to every student in the payload
+    
+    Each student sent (or refused for good) is recorded in the job's
+    checkpoint as soon as it happens, so a retry only sends to the rest.
+    If some messages failed for a transient reason (connection lost, 4xx
+    reply) and attempts remain, the job fails and is retried for those.
+    
+    Args:
+        overdue_students: List of dictionaries with full_name, email, amount, due_date
+        job: JobContext used to report progress
+        
+    Returns:
+        Dictionary with total, sent, failed and errors
+    """
+    email_config = get_email_config()
+    if not email_config.get('email_sender') or not email_config.get('email_password'):
+        raise PermanentJobError("Email configuration not set. "
+                                "Please configure email settings first.")
+    
+    # Positions in the payload of students already sent / failed for good
+    state = job.checkpoint or {'sent': [], 'failed': {}}
+    done = set(state['sent']) | {int(index) for index in state['failed']}
+    pending = [student for index, student in enumerate(overdue_students) if index not in done]
+    positions = {id(student): index for index, student in enumerate(overdue_students)}
+    transient_errors = []
+    lock = threading.Lock()
+    total = len(overdue_students)
+    
+    def on_result(student, error, transient):
+        index = positions[id(student)]
+        with lock:
+            if error is None:
+                state['sent'].append(index)
+            elif transient:
+                transient_errors.append(error)
+                return
+            else:
+                state['failed'][str(index)] = error
+            job.save_checkpoint(state)
+    
+    def on_progress(progress):
+        job.set_progress(len(state['sent']) + len(state['failed']), total)
+    
+    BulkMailer(email_config, on_progress=on_progress, on_result=on_result).send(pending)
+    
+    if transient_errors and job.will_retry:
+        raise RuntimeError(f"{len(transient_errors)} reminder(s) could not be sent yet "
+                           f"and will be retried; first error: {transient_errors[0]}")
+    
+    job.set_progress(total, total, force=True)
+    errors = list(state['failed'].values()) + transient_errors
+    return {'total': total, 'sent': len(state['sent']), 'failed': len(errors),
+            'errors': errors}
+
+def start_bulk_reminders(overdue_students):
+    """
+    Queue bulk reminders to be sent by a background worker
+    
+    Args:
+        overdue_students: List of dictionaries with student and payment info
+        
+    Returns:
+        Job id (see app.utils.job_queue.get_job)
+    """
+    # Retries are safe: bulk_reminders_job skips students already sent
+    return enqueue('bulk_reminders', overdue_students)
@@ -3,52 +3,174 @@ Installment management utilities for Hostel Manager
 Handles payment tracking and installment calculations
 """
 
+import calendar
 import sqlite3
+import threading
 from datetime import datetime, timedelta
-from app.database.connection import get_db_connection
+from functools import lru_cache
 
-def create_installments(aadhaar_number, total_fee, installment_count, start_date_str):
+import config
+from app.database.connection import get_db_connection, write_transaction
+from app.database.migrations import AGING_BUCKET_SQL, LEDGER_RECOMPUTE_SQL, LEDGER_SUM_COLUMNS
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+from app.utils.job_queue import enqueue, list_jobs, register_handler
+
+INSERT_INSTALLMENT_SQL = '''
+    INSERT INTO installments
+    (aadhaar_number, installment_number, due_date, amount, payment_status)
+    VALUES (?, ?, ?, ?, 'Pending')
+'''
+
+# Number of Aadhaar numbers bound into one "IN (...)" list
+_IN_CHUNK = 500
+
+def add_months(start_date, months):
     """
-    Create installment records for a student
+    Add calendar months to a date, clamping to the last day of the month
+    
+    Args:
+        start_date: datetime or date to start from
+        months: Number of months to add
+        
+    Returns:
+        Same type as start_date (e.g. Jan 31 + 1 month -> Feb 28/29)
+    """
+    month_index = start_date.month - 1 + months
+    year = start_date.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(start_date.day, calendar.monthrange(year, month)[1])
+    return start_date.replace(year=year, month=month, day=day)
+
+@lru_cache(maxsize=1024)
+def get_due_dates(start_date_str, installment_count, calendar_months):
+    """
+    Get the due dates of a schedule (cached: a cohort shares its start date)
+    
+    Args:
+        start_date_str: Start date in format 'YYYY-MM-DD'
+        installment_count: Number of installments
+        calendar_months: True for the same day each month, False for every 30 days
+        
+    Returns:
+        Tuple of due date strings, one per installment
+    """
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+    if calendar_months:
+        dates = (add_months(start_date, i) for i in range(1, installment_count + 1))
+    else:
+        dates = (start_date + timedelta(days=30 * i) for i in range(1, installment_count + 1))
+    return tuple(d.strftime('%Y-%m-%d') for d in dates)
+
+def build_installment_rows(aadhaar_number, total_fee, installment_count, start_date_str,
+                           calendar_months=None):
+    """
+    Build installment rows for a student without touching the database
     
     Args:
         aadhaar_number: Student's Aadhaar number
         total_fee: Total amount to be paid
         installment_count: Number of installments
         start_date_str: Start date in format 'YYYY-MM-DD'
+        calendar_months: Due-date mode; None uses config.INSTALLMENT_CALENDAR_MONTHS
+        
+    Returns:
+        List of parameter tuples for INSERT_INSTALLMENT_SQL
+    """
+    if calendar_months is None:
+        calendar_months = getattr(config, 'INSTALLMENT_CALENDAR_MONTHS', False)
+    
+    # Calculate amount per installment
+    amount_per_installment = total_fee / installment_count
+    
+    due_dates = get_due_dates(start_date_str, installment_count, bool(calendar_months))
+    return [
+        (aadhaar_number, i, due_date, amount_per_installment)
+        for i, due_date in enumerate(due_dates, start=1)
+    ]
+
+def create_installment_schedules(schedules, calendar_months=None, replace=False):
+    """
+    Create installment schedules for many students in one transaction
+    
+    Args:
+        schedules: Iterable of (aadhaar_number, total_fee, installment_count, start_date_str)
+        calendar_months: Due-date mode; None uses config.INSTALLMENT_CALENDAR_MONTHS
+        replace: Delete each student's existing schedule first. Students with
+                 any money recorded (an installment paid in full or in part)
+                 are skipped, so no payment is lost.
         
     Returns:
         Tuple (success: bool, message: str)
     """
+    conn = None
     try:
+        schedules = list(schedules)
+        skipped = set()
+        
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Calculate amount per installment
-        amount_per_installment = total_fee / installment_count
+        if replace:
+            aadhaars = [schedule[0] for schedule in schedules]
+            for start in range(0, len(aadhaars), _IN_CHUNK):
+                chunk = aadhaars[start:start + _IN_CHUNK]
+                cursor.execute(f'''
+                    SELECT DISTINCT aadhaar_number FROM installments
+                    WHERE aadhaar_number IN ({', '.join('?' for _ in chunk)})
+                      AND (LOWER(payment_status) = 'paid' OR amount_paid > 0)
+                ''', chunk)
+                skipped.update(row[0] for row in cursor.fetchall())
+            schedules = [schedule for schedule in schedules if schedule[0] not in skipped]
+            cursor.executemany('DELETE FROM installments WHERE aadhaar_number = ?',
+                               [(schedule[0],) for schedule in schedules])
         
-        # Parse start date
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-        
-        # Create installment records
-        for i in range(1, installment_count + 1):
-            # Due date is one month after previous due date
-            due_date = start_date + timedelta(days=30 * i)
-            
-            cursor.execute('''
-                INSERT INTO installments 
-                (aadhaar_number, installment_number, due_date, amount, payment_status)
-                VALUES (?, ?, ?, ?, 'Pending')
-            ''', (aadhaar_number, i, due_date.strftime('%Y-%m-%d'), amount_per_installment))
+        rows = [
+            row
+            for aadhaar_number, total_fee, installment_count, start_date_str in schedules
+            for row in build_installment_rows(aadhaar_number, float(total_fee),
+                                              int(installment_count), start_date_str,
+                                              calendar_months)
+        ]
+        cursor.executemany(INSERT_INSTALLMENT_SQL, rows)
         
         conn.commit()
         conn.close()
+        invalidate_dashboard_cache()
         
-        return True, f"Created {installment_count} installments"
+        message = f"Created {len(rows)} installments for {len(schedules)} students"
+        if skipped:
+            message += f" ({len(skipped)} students with payments recorded skipped)"
+        return True, message
         
     except Exception as e:
+        if conn is not None:
+            conn.rollback()
+            conn.close()
         return False, f"Error: {str(e)}"
 
+def create_installments(aadhaar_number, total_fee, installment_count, start_date_str,
+                        calendar_months=None):
+    """
+    Create installment records for a student
+    
+    Args:
+        aadhaar_number: Student's Aadhaar number
+        total_fee: Total amount to be paid
+        installment_count: Number of installments
+        start_date_str: Start date in format 'YYYY-MM-DD'
+        calendar_months: Due-date mode; None uses config.INSTALLMENT_CALENDAR_MONTHS
+        
+    Returns:
+        Tuple (success: bool, message: str)
+    """
+    success, message = create_installment_schedules(
+        [(aadhaar_number, total_fee, installment_count, start_date_str)],
+        calendar_months=calendar_months
+    )
+    if not success:
+        return False, message
+    return True, f"Created {installment_count} installments"
+
 def get_student_installments(aadhaar_number):
     """Get all installments for a student"""
     conn = get_db_connection()
@@ -85,120 +207,432 @@ def mark_installment_paid(aadhaar_number, installment_number):
         
         cursor.execute('''
             UPDATE installments
-            SET payment_status = 'Paid', paid_date = ?
+            SET payment_status = 'Paid', paid_date = ?, amount_paid = amount
             WHERE aadhaar_number = ? AND installment_number = ?
         ''', (today, aadhaar_number, installment_number))
         
         conn.commit()
         conn.close()
+        invalidate_dashboard_cache()
         
         return True, "Installment marked as paid"
         
     except Exception as e:
         return False, f"Error: {str(e)}"
 
-def get_overdue_installments():
-    """Get all overdue installments across all students"""
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+# Aging buckets in report order, with display labels
+AGING_BUCKETS = (
+    ('due_7', 'Due in 7 days'),
+    ('due_30', 'Due in 8-30 days'),
+    ('not_due', 'Due after 30 days'),
+    ('overdue_30', 'Overdue 1-30 days'),
+    ('overdue_60', 'Overdue 31-60 days'),
+    ('overdue_90', 'Overdue 61-90 days'),
+    ('overdue_90_plus', 'Overdue over 90 days'),
+)
+OVERDUE_BUCKETS = ('overdue_30', 'overdue_60', 'overdue_90', 'overdue_90_plus')
+UPCOMING_BUCKETS = ('due_7', 'due_30')
+
+# Installments due further back than this never change bucket again
+_AGING_HORIZON_DAYS = 91
+
+# Due dates (days from today, inclusive; None = unbounded) of each bucket,
+# matching AGING_BUCKET_SQL
+_BUCKET_DUE_RANGES = {
+    'overdue_90_plus': (None, -91),
+    'overdue_90': (-90, -61),
+    'overdue_60': (-60, -31),
+    'overdue_30': (-30, -1),
+    'due_7': (0, 7),
+    'due_30': (8, 30),
+    'not_due': (31, None),
+}
+
+_INSTALLMENT_LIST_SQL = f'''
+    SELECT s.full_name, s.email, s.aadhaar_number,
+           i.installment_number, i.due_date, i.amount, i.amount_paid, i.payment_status,
+           {AGING_BUCKET_SQL.format(row='i.', today='?')} AS aging_bucket,
+           CAST(julianday(?) - julianday(i.due_date) AS INTEGER) AS overdue_days
+    FROM installments i
+    JOIN students s ON i.aadhaar_number = s.aadhaar_number
+'''
+
+def aging_bucket_condition(buckets, prefix='i.', today=None):
+    """
+    SQL condition selecting pending installments currently in any of the buckets
     
+    Works from the due date relative to today, so it is exact whether or not
+    the stored aging_bucket column has been rolled forward yet, and it uses
+    the (LOWER(payment_status), due_date) index.
+    
+    Args:
+        buckets: Bucket names from AGING_BUCKETS
+        prefix: Table alias prefix for the installments columns
+        today: Date to age against (default: today)
+        
+    Returns:
+        Tuple (sql: str, params: list)
+        
+    Raises:
+        ValueError for an unknown bucket
+    """
+    unknown = [bucket for bucket in buckets if bucket not in _BUCKET_DUE_RANGES]
+    if unknown:
+        raise ValueError(f"Unknown bucket '{unknown[0]}'")
+    if not buckets:
+        return '0', []
+    
+    # Merge neighbouring buckets into as few due-date ranges as possible
+    ranges = []
+    for first, last in sorted((_BUCKET_DUE_RANGES[b] for b in set(buckets)),
+                              key=lambda r: float('-inf') if r[0] is None else r[0]):
+        if ranges and ranges[-1][1] is not None and first == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], last)
+        else:
+            ranges.append((first, last))
+    
+    today = today or datetime.now().date()
+    parts = []
+    params = []
+    for first, last in ranges:
+        bounds = []
+        if first is not None:
+            bounds.append(f'{prefix}due_date >= ?')
+            params.append((today + timedelta(days=first)).strftime('%Y-%m-%d'))
+        if last is not None:
+            bounds.append(f'{prefix}due_date <= ?')
+            params.append((today + timedelta(days=last)).strftime('%Y-%m-%d'))
+        parts.append(' AND '.join(bounds) or '1')
+    return (f"LOWER({prefix}payment_status) = 'pending' AND "
+            f"({' OR '.join(f'({part})' for part in parts)})"), params
+
+_aging_lock = threading.Lock()
+_aging_refreshed_on = None
+
+def refresh_installment_aging(force=False):
+    """
+    Move pending installments into the aging bucket for today's date
+    
+    Triggers bucket an installment when it is written; this rolls the stored
+    buckets forward as days pass. Only installments whose due date is close
+    enough to a bucket boundary to have moved since the last run are
+    touched. Runs at most once per day per process unless force is set.
+    
+    Called by the nightly installment_aging job and manage.py, never on a
+    request: reads work out the current bucket themselves.
+    
+    Args:
+        force: Re-check every pending installment even if already aged today
+        
+    Returns:
+        Number of installments whose bucket changed
+    """
+    global _aging_refreshed_on
     today = datetime.now().strftime('%Y-%m-%d')
+    with _aging_lock:
+        if _aging_refreshed_on == today and not force:
+            return 0
     
-    cursor.execute('''
-        SELECT s.full_name, s.email, s.aadhaar_number,
-               i.installment_number, i.due_date, i.amount, i.payment_status
-        FROM installments i
-        JOIN students s ON i.aadhaar_number = s.aadhaar_number
-        WHERE LOWER(i.payment_status) = 'pending' AND i.due_date < ?
-        ORDER BY i.due_date ASC
-    ''', (today,))
+    conn = get_db_connection()
+    try:
+        with write_transaction(conn):
+            cursor = conn.cursor()
+            cursor.execute('SELECT as_of FROM installment_aging WHERE id = 1')
+            row = cursor.fetchone()
+            as_of = row[0] if row else None
+        
+            updated = 0
+            if force or as_of is None or as_of < today:
+                bucket = AGING_BUCKET_SQL.format(row='', today='?')
+                if force or as_of is None:
+                    window, params = '', []
+                else:
+                    # A row can only have changed bucket if a boundary (at most
+                    # 90 days back, 30 ahead) passed over it since as_of
+                    since = datetime.strptime(as_of, '%Y-%m-%d') - timedelta(days=_AGING_HORIZON_DAYS)
+                    until = datetime.now() + timedelta(days=31)
+                    window = 'AND due_date BETWEEN ? AND ?'
+                    params = [since.strftime('%Y-%m-%d'), until.strftime('%Y-%m-%d')]
+                bucket_params = [today] * bucket.count('?')
+                cursor.execute(f'''
+                    UPDATE installments SET aging_bucket = {bucket}
+                    WHERE LOWER(payment_status) = 'pending' {window}
+                      AND aging_bucket IS NOT {bucket}
+                ''', bucket_params + params + bucket_params)
+                updated = cursor.rowcount
+                cursor.execute('''
+                    UPDATE installment_aging SET as_of = ?, refreshed_at = ?, rows_updated = ?
+                    WHERE id = 1
+                ''', (today, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), updated))
+    finally:
+        conn.close()
     
-    installments = cursor.fetchall()
-    conn.close()
+    with _aging_lock:
+        _aging_refreshed_on = today
+    return updated
+
+def seconds_until_aging_run(now=None):
+    """Seconds from now until the next AGING_JOB_TIME (HH:MM, local time)"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in getattr(config, 'AGING_JOB_TIME', '00:05').split(':'))
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return int((run_at - now).total_seconds())
+
+def schedule_aging_job(exclude_job=None):
+    """
+    Queue the nightly aging job unless one is already queued or running
     
-    return [dict(inst) for inst in installments]
+    The job runs at AGING_JOB_TIME, or at once if buckets were last rolled
+    forward before today.
+    
+    Args:
+        exclude_job: Id of a running aging job to ignore (the caller itself)
+        
+    Returns:
+        Job id of the queued job, or None if one was already scheduled
+    """
+    for status in ('queued', 'running'):
+        if any(job['id'] != exclude_job
+               for job in list_jobs(status=status, kind='installment_aging')):
+            return None
+    
+    # Catch up straight away if the last run was missed (e.g. server down)
+    conn = get_db_connection()
+    try:
+        row = conn.execute('SELECT as_of FROM installment_aging WHERE id = 1').fetchone()
+    finally:
+        conn.close()
+    behind = not row or not row[0] or row[0] < datetime.now().strftime('%Y-%m-%d')
+    return enqueue('installment_aging', delay=0 if behind else seconds_until_aging_run())
 
-def get_pending_installments():
-    """Get all pending installments across all students (regardless of due date)"""
+@register_handler('installment_aging')
+def installment_aging_job(payload, job):
+    """Background job: roll aging buckets and overdue ledger figures to today, then reschedule"""
+    try:
+        result = {'buckets_updated': refresh_installment_aging(force=True),
+                  'ledger_rows_refreshed': refresh_overdue_ledger(force=True)}
+    except Exception:
+        # A failure that will be retried stays the scheduled run; only the
+        # last attempt hands over to tomorrow's
+        if not job.will_retry:
+            schedule_aging_job(exclude_job=job.id)
+        raise
+    schedule_aging_job(exclude_job=job.id)
+    return result
+
+def get_installments_by_bucket(buckets, limit=None, offset=0):
+    """
+    Get pending installments in the given aging buckets, oldest due date first
+    
+    Args:
+        buckets: Bucket name or sequence of names from AGING_BUCKETS
+        limit: Maximum number of rows (None for all)
+        offset: Rows to skip
+        
+    Returns:
+        List of installment dictionaries with student name and email,
+        aging_bucket and overdue_days (negative while not yet due)
+    """
+    if isinstance(buckets, str):
+        buckets = (buckets,)
+    today = datetime.now().date()
+    condition, params = aging_bucket_condition(buckets, today=today)
+    
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
-
-    cursor.execute('''
-        SELECT s.full_name, s.email, s.aadhaar_number,
-               i.installment_number, i.due_date, i.amount, i.payment_status
-        FROM installments i
-        JOIN students s ON i.aadhaar_number = s.aadhaar_number
-        WHERE LOWER(i.payment_status) = 'pending'
+    
+    # Every placeholder in the SELECT list is today's date
+    today_params = [today.strftime('%Y-%m-%d')] * _INSTALLMENT_LIST_SQL.count('?')
+    cursor.execute(_INSTALLMENT_LIST_SQL + f'''
+        WHERE {condition}
         ORDER BY i.due_date ASC
-    ''')
-
+        LIMIT ? OFFSET ?
+    ''', today_params + params + [-1 if limit is None else limit, offset])
+    
     installments = cursor.fetchall()
     conn.close()
-
+    
     return [dict(inst) for inst in installments]
 
+def get_overdue_installments():
+    """Get all overdue installments across all students"""
+    return get_installments_by_bucket(OVERDUE_BUCKETS)
+
+def get_pending_installments():
+    """Get all pending installments across all students (regardless of due date)"""
+    return get_installments_by_bucket([bucket for bucket, _ in AGING_BUCKETS])
+
 def get_upcoming_installments(days_ahead=7):
     """Get installments due within the next N days"""
+    if days_ahead <= 7:
+        buckets = ('due_7',)
+    elif days_ahead <= 30:
+        buckets = UPCOMING_BUCKETS
+    else:
+        buckets = UPCOMING_BUCKETS + ('not_due',)
+    future_date = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+    return [inst for inst in get_installments_by_bucket(buckets)
+            if inst['due_date'] <= future_date]
+
+def get_aging_report():
+    """
+    Get count, amount and number of students per aging bucket
+    
+    Returns:
+        Dictionary with as_of date (today), refreshed_at (last nightly run),
+        a list of buckets in report order and overdue/upcoming totals
+    """
+    as_of = datetime.now().strftime('%Y-%m-%d')
     conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
-    today = datetime.now().strftime('%Y-%m-%d')
-    future_date = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+    # Bucketed as of today, not as of the last nightly run
+    cursor.execute(f'''
+        SELECT {AGING_BUCKET_SQL.format(row='', today=':today')} AS bucket, COUNT(*),
+               COALESCE(SUM(amount - amount_paid), 0), COUNT(DISTINCT aadhaar_number)
+        FROM installments
+        WHERE LOWER(payment_status) = 'pending'
+        GROUP BY bucket
+    ''', {'today': as_of})
+    counts = {row[0]: row[1:] for row in cursor.fetchall()}
+    cursor.execute('SELECT refreshed_at FROM installment_aging WHERE id = 1')
+    refreshed_at = (cursor.fetchone() or (None,))[0]
+    conn.close()
     
-    cursor.execute('''
-        SELECT s.full_name, s.email, s.aadhaar_number,
-               i.installment_number, i.due_date, i.amount, i.payment_status
-        FROM installments i
-        JOIN students s ON i.aadhaar_number = s.aadhaar_number
-        WHERE LOWER(i.payment_status) = 'pending' AND i.due_date BETWEEN ? AND ?
-        ORDER BY i.due_date ASC
-    ''', (today, future_date))
+    buckets = []
+    for bucket, label in AGING_BUCKETS:
+        count, amount, students = counts.get(bucket, (0, 0, 0))
+        buckets.append({'bucket': bucket, 'label': label, 'count': count,
+                        'amount': amount, 'students': students})
     
-    installments = cursor.fetchall()
-    conn.close()
+    def total(names):
+        selected = [b for b in buckets if b['bucket'] in names]
+        return {'count': sum(b['count'] for b in selected),
+                'amount': sum(b['amount'] for b in selected)}
     
-    return [dict(inst) for inst in installments]
+    return {
+        'as_of': as_of,
+        'refreshed_at': refreshed_at,
+        'buckets': buckets,
+        'overdue': total(OVERDUE_BUCKETS),
+        'upcoming': total(UPCOMING_BUCKETS)
+    }
 
-def get_payment_statistics():
-    """Get payment statistics"""
+_ledger_lock = threading.Lock()
+_overdue_refreshed_on = None
+
+def refresh_overdue_ledger(force=False):
+    """
+    Roll the ledger's overdue figures forward to today
+    
+    Triggers compute overdue amounts when a student's installments change;
+    after midnight, installments that fell due without any write are picked
+    up here. Only students whose next due date has passed are recomputed,
+    and only once per day per process unless force is set. Run by the
+    nightly installment_aging job (and manage.py), not on reads.
+    
+    Returns:
+        Number of ledger rows refreshed
+    """
+    global _overdue_refreshed_on
+    today = datetime.now().strftime('%Y-%m-%d')
+    with _ledger_lock:
+        if _overdue_refreshed_on == today and not force:
+            return 0
+    
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute(LEDGER_RECOMPUTE_SQL.format(key='student_ledger.aadhaar_number') + '''
+        WHERE next_due_date < ? AND (overdue_as_of IS NULL OR overdue_as_of < ?)
+    ''', (today, today))
+    refreshed = cursor.rowcount
+    conn.commit()
+    conn.close()
     
-    # Total payments
-    cursor.execute('SELECT COUNT(*) FROM installments')
-    total_installments = cursor.fetchone()[0]
+    with _ledger_lock:
+        _overdue_refreshed_on = today
+    if refreshed:
+        invalidate_dashboard_cache()
+    return refreshed
+
+def rebuild_ledger():
+    """
+    Recompute every student's ledger row and the global totals from installments
     
-    # Paid payments
-    cursor.execute('SELECT COUNT(*) FROM installments WHERE LOWER(payment_status) = ?', ('paid',))
-    paid_installments = cursor.fetchone()[0]
+    Returns:
+        Tuple (success: bool, message: str)
+    """
+    try:
+        conn = get_db_connection()
+        with write_transaction(conn):
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO student_ledger (aadhaar_number)
+                SELECT aadhaar_number FROM students
+            ''')
+            cursor.execute(LEDGER_RECOMPUTE_SQL.format(key='student_ledger.aadhaar_number'))
+            # Recount the rollup in case it drifted from the rows
+            cursor.execute(f'''
+                UPDATE ledger_totals SET (students, {', '.join(LEDGER_SUM_COLUMNS)}) = (
+                    SELECT COUNT(*), {', '.join(f"COALESCE(SUM({c}), 0)" for c in LEDGER_SUM_COLUMNS)}
+                    FROM student_ledger
+                )
+                WHERE id = 1
+            ''')
+            cursor.execute('SELECT students FROM ledger_totals WHERE id = 1')
+            students = cursor.fetchone()[0]
+        conn.close()
+        invalidate_dashboard_cache()
+        
+        return True, f"Rebuilt payment ledger for {students} students"
+        
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+
+def get_student_ledger(aadhaar_number):
+    """
+    Get a student's payment summary (one row read)
     
-    # Pending payments
-    cursor.execute('SELECT COUNT(*) FROM installments WHERE LOWER(payment_status) = ?', ('pending',))
-    pending_installments = cursor.fetchone()[0]
+    Returns:
+        Dictionary with installment counts, paid/pending/overdue amounts and
+        next_due_date, or None if the student has no ledger row
+    """
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM student_ledger WHERE aadhaar_number = ?', (aadhaar_number,))
+    row = cursor.fetchone()
+    conn.close()
     
-    # Total amount pending
-    cursor.execute('SELECT SUM(amount) FROM installments WHERE LOWER(payment_status) = ?', ('pending',))
-    total_pending = cursor.fetchone()[0] or 0
+    return dict(row) if row else None
+
+def get_payment_statistics():
+    """Get payment statistics (read from the ledger rollup row)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
     
-    # Overdue count
-    today = datetime.now().strftime('%Y-%m-%d')
     cursor.execute('''
-        SELECT COUNT(*) FROM installments 
-        WHERE LOWER(payment_status) = 'pending' AND due_date < ?
-    ''', (today,))
-    overdue_count = cursor.fetchone()[0]
+        SELECT installments_total, installments_paid, installments_pending,
+               amount_pending, overdue_count, overdue_amount
+        FROM ledger_totals
+        WHERE id = 1
+    ''')
+    row = cursor.fetchone() or (0, 0, 0, 0, 0, 0)
+    (total_installments, paid_installments, pending_installments,
+     total_pending, overdue_count, overdue_amount) = row
     
     conn.close()
     
     return {
-        'total_installments': total_installments,
-        'paid_installments': paid_installments,
-        'pending_installments': pending_installments,
+        'total_installments': int(total_installments),
+        'paid_installments': int(paid_installments),
+        'pending_installments': int(pending_installments),
         'total_pending_amount': total_pending,
-        'overdue_count': overdue_count
+        'overdue_count': int(overdue_count),
+        'overdue_amount': overdue_amount
     }
 
 def delete_student_installments(aadhaar_number):
@@ -211,6 +645,7 @@ def delete_student_installments(aadhaar_number):
         
         conn.commit()
         conn.close()
+        invalidate_dashboard_cache()
         
         return True, "Installments deleted"
         
@@ -0,0 +1,440 @@
+"""
+Background job queue for Hostel Manager
+Runs long operations on worker threads, with jobs persisted in the jobs table
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+import config
+from app.database.connection import get_db_connection
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_handlers = {}
+_workers = []
+_wakeup = threading.Event()
+_stop = threading.Event()
+# Ids of the jobs this process's workers are running right now
+_running = set()
+_running_lock = threading.Lock()
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot help"""
+
+
+def register_handler(kind):
+    """
+    Register a function as the handler for a job kind
+
+    The handler is called as handler(payload, job) where job is a JobContext;
+    its return value (JSON-serializable) is stored as the job result.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def _now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+def _row_to_job(row):
+    job = dict(row)
+    job['payload'] = json.loads(job['payload']) if job['payload'] else None
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    if 'checkpoint' in job:
+        job['checkpoint'] = json.loads(job['checkpoint']) if job['checkpoint'] else None
+    return job
+
+
+def enqueue(kind, payload=None, max_attempts=None, delay=0):
+    """
+    Add a job to the queue
+
+    Args:
+        kind: Registered handler name
+        payload: JSON-serializable arguments for the handler
+        max_attempts: Attempts before the job is marked failed
+        delay: Seconds to wait before the job may start
+
+    Returns:
+        Integer job id
+    """
+    if max_attempts is None:
+        max_attempts = getattr(config, 'JOB_MAX_ATTEMPTS', 3)
+    run_after = (datetime.now() + timedelta(seconds=delay)).strftime(TIMESTAMP_FORMAT)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO jobs (kind, payload, status, max_attempts, run_after, created_at)
+        VALUES (?, ?, 'queued', ?, ?, ?)
+    ''', (kind, json.dumps(payload), max_attempts, run_after, _now()))
+    job_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id):
+    """Get a job by id (payload and result decoded), or None"""
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    return _row_to_job(row) if row else None
+
+
+def list_jobs(status=None, kind=None, limit=50):
+    """Get the most recent jobs, optionally filtered by status and kind"""
+    conditions = []
+    params = []
+    if status:
+        conditions.append('status = ?')
+        params.append(status)
+    if kind:
+        conditions.append('kind = ?')
+        params.append(kind)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT id, kind, status, attempts, max_attempts, progress_current, progress_total,
+               error, created_at, started_at, finished_at
+        FROM jobs {where}
+        ORDER BY id DESC
+        LIMIT ?
+    ''', params + [limit])
+    jobs = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    return jobs
+
+
+class JobContext:
+    """Handle passed to job handlers for reporting progress"""
+
+    def __init__(self, job_id, attempt, max_attempts=1, checkpoint=None):
+        self.id = job_id
+        self.attempt = attempt
+        self.max_attempts = max_attempts
+        # State saved by an earlier attempt with save_checkpoint(), or None
+        self.checkpoint = checkpoint
+        self._last_write = 0.0
+
+    @property
+    def will_retry(self):
+        """Whether the queue will run this job again if the handler fails"""
+        return self.attempt < self.max_attempts
+
+    def set_progress(self, current, total=None, force=False):
+        """Record progress; writes are throttled to a few per second"""
+        now = time.monotonic()
+        if not force and now - self._last_write < 0.5:
+            return
+        self._last_write = now
+
+        conn = get_db_connection()
+        conn.execute('''
+            UPDATE jobs SET progress_current = ?, progress_total = COALESCE(?, progress_total)
+            WHERE id = ?
+        ''', (current, total, self.id))
+        conn.commit()
+        conn.close()
+
+    def save_checkpoint(self, state):
+        """
+        Store JSON-serializable state that later attempts receive as checkpoint
+
+        Handlers that are not idempotent record what they have already done
+        here, so a retry (or a rerun after the worker died) can skip it.
+        """
+        self.checkpoint = state
+        conn = get_db_connection()
+        try:
+            conn.execute('UPDATE jobs SET checkpoint = ? WHERE id = ?',
+                         (json.dumps(state), self.id))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically move the oldest runnable job to 'running'
+
+    Returns:
+        Job dictionary, or None if nothing is due
+    """
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        # IMMEDIATE takes the write lock up front, so two workers (or two
+        # processes) can never claim the same job
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute('''
+            SELECT * FROM jobs
+            WHERE status = 'queued' AND run_after <= ?
+            ORDER BY run_after, id
+            LIMIT 1
+        ''', (_now(),)).fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+
+        now = _now()
+        conn.execute('''
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, locked_by = ?,
+                started_at = ?, heartbeat_at = ?, error = NULL
+            WHERE id = ?
+        ''', (worker_id, now, now, row['id']))
+        conn.commit()
+
+        job = _row_to_job(row)
+        job['attempts'] += 1
+        return job
+    finally:
+        conn.close()
+
+
+def _finish(job_id, status, result=None, error=None, run_after=None):
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE jobs
+        SET status = ?, result = ?, error = ?, locked_by = NULL,
+            run_after = COALESCE(?, run_after),
+            finished_at = CASE WHEN ? IN ('completed', 'failed') THEN ? ELSE NULL END
+        WHERE id = ?
+    ''', (status, json.dumps(result) if result is not None else None, error,
+          run_after, status, _now(), job_id))
+    conn.commit()
+    conn.close()
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome
+
+    Failures are retried with exponential backoff (JOB_RETRY_BACKOFF seconds,
+    doubled per attempt) until max_attempts is reached.
+    """
+    handler = _handlers.get(job['kind'])
+    if handler is None:
+        _finish(job['id'], 'failed', error=f"No handler registered for {job['kind']}")
+        return
+
+    try:
+        result = handler(job['payload'], JobContext(job['id'], job['attempts'],
+                                                       job['max_attempts'],
+                                                       job.get('checkpoint')))
+        _finish(job['id'], 'completed', result=result)
+    except PermanentJobError as e:
+        _finish(job['id'], 'failed', error=str(e))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        if job['attempts'] < job['max_attempts']:
+            backoff = getattr(config, 'JOB_RETRY_BACKOFF', 5) * 2 ** (job['attempts'] - 1)
+            run_after = (datetime.now() + timedelta(seconds=backoff)).strftime(TIMESTAMP_FORMAT)
+            _finish(job['id'], 'queued', error=error, run_after=run_after)
+        else:
+            _finish(job['id'], 'failed', error=error)
+
+
+def _worker_loop(worker_id):
+    poll_interval = getattr(config, 'JOB_POLL_INTERVAL', 1.0)
+    while not _stop.is_set():
+        try:
+            job = claim_next_job(worker_id)
+        except Exception:
+            # Database busy or unavailable: back off and try again
+            job = None
+        if job is None:
+            _wakeup.wait(poll_interval)
+            _wakeup.clear()
+            continue
+        with _running_lock:
+            _running.add(job['id'])
+        try:
+            run_job(job)
+        except Exception:
+            # Could not record the outcome; requeue_stale_jobs() recovers it
+            # once this process stops sending heartbeats for it
+            time.sleep(poll_interval)
+        finally:
+            with _running_lock:
+                _running.discard(job['id'])
+
+
+def worker_owner():
+    """
+    Get the owner prefix for this process's worker ids
+
+    Worker ids are "<host>:<pid>:<token>-<n>", so requeue_orphaned_jobs()
+    can tell from locked_by whether the process holding a job has exited.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        # os.kill() would terminate it; leave these to the heartbeat sweep
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _recover_jobs(job_ids, reason):
+    """Requeue running jobs whose worker is gone, or fail them if out of attempts"""
+    if not job_ids:
+        return 0
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            UPDATE jobs
+            SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END,
+                locked_by = NULL, heartbeat_at = NULL, error = ?
+            WHERE id = ? AND status = 'running'
+        ''', [(_now(), reason, job_id) for job_id in job_ids])
+        count = cursor.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    if count:
+        _wakeup.set()
+    return count
+
+
+def heartbeat():
+    """Mark the jobs this process is running as still alive"""
+    with _running_lock:
+        job_ids = list(_running)
+    if not job_ids:
+        return
+    conn = get_db_connection()
+    try:
+        now = _now()
+        conn.executemany("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                         [(now, job_id) for job_id in job_ids])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def requeue_stale_jobs():
+    """
+    Recover running jobs whose worker has not sent a heartbeat recently
+
+    Covers workers on another host or a process that hung; run at startup
+    and then every JOB_HEARTBEAT_SECONDS.
+
+    Returns:
+        Number of jobs requeued or failed
+    """
+    timeout = getattr(config, 'JOB_STALE_SECONDS', 120)
+    cutoff = (datetime.now() - timedelta(seconds=timeout)).strftime(TIMESTAMP_FORMAT)
+
+    conn = get_db_connection()
+    try:
+        job_ids = [row[0] for row in conn.execute('''
+            SELECT id FROM jobs
+            WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ?
+        ''', (cutoff,))]
+    finally:
+        conn.close()
+    return _recover_jobs(job_ids, f"Worker stopped responding for over {timeout}s")
+
+
+def requeue_orphaned_jobs():
+    """
+    Recover running jobs owned by a process on this host that has exited
+
+    Run at startup, so work held by a crashed or restarted process does not
+    wait out JOB_STALE_SECONDS.
+
+    Returns:
+        Number of jobs requeued or failed
+    """
+    host = socket.gethostname()
+    conn = get_db_connection()
+    try:
+        rows = conn.execute('''
+            SELECT id, locked_by FROM jobs WHERE status = 'running'
+        ''').fetchall()
+    finally:
+        conn.close()
+
+    job_ids = []
+    for job_id, locked_by in rows:
+        owner_host, _, rest = (locked_by or '').partition(':')
+        pid = rest.partition(':')[0]
+        if owner_host != host or not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        if not _process_alive(int(pid)):
+            job_ids.append(job_id)
+    return _recover_jobs(job_ids, "Worker process exited before the job finished")
+
+
+def _monitor_loop():
+    interval = getattr(config, 'JOB_HEARTBEAT_SECONDS', 30)
+    while not _stop.wait(interval):
+        try:
+            heartbeat()
+            requeue_stale_jobs()
+        except Exception:
+            # Database busy or unavailable: try again next round
+            pass
+
+
+def start_workers(count=None):
+    """Start background worker threads (no-op if already running)"""
+    if count is None:
+        count = getattr(config, 'JOB_WORKERS', 2)
+    if _workers or count <= 0:
+        return
+
+    requeue_orphaned_jobs()
+    requeue_stale_jobs()
+    _stop.clear()
+    owner = worker_owner()
+    for i in range(count):
+        worker = threading.Thread(target=_worker_loop, args=(f"{owner}-{i}",),
+                                  name=f"job-worker-{i}", daemon=True)
+        worker.start()
+        _workers.append(worker)
+    monitor = threading.Thread(target=_monitor_loop, name='job-monitor', daemon=True)
+    monitor.start()
+    _workers.append(monitor)
+
+
+def stop_workers(timeout=5):
+    """Ask worker threads to exit after their current job"""
+    _stop.set()
+    _wakeup.set()
+    for worker in _workers:
+        worker.join(timeout)
+    _workers.clear()
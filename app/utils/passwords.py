@@ -0,0 +1,212 @@
+"""
+Password hashing for Hostel Manager
+Self-describing hash strings with pluggable algorithms and tunable cost
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+
+import config
+
+# Hashes written before this module existed: 32-byte salt and PBKDF2-SHA256
+# digest, both hex, 100,000 iterations
+LEGACY_ITERATIONS = 100000
+LEGACY_LENGTH = 128
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PBKDF2Hasher:
+    """pbkdf2_sha256$<iterations>$<salt>$<hash>"""
+
+    algorithm = 'pbkdf2_sha256'
+
+    def available(self):
+        return True
+
+    def _iterations(self):
+        return getattr(config, 'PASSWORD_PBKDF2_ITERATIONS', 600000)
+
+    def encode(self, password):
+        salt = os.urandom(16)
+        iterations = self._iterations()
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+        return f'{self.algorithm}${iterations}${_b64encode(salt)}${_b64encode(digest)}'
+
+    def _parse(self, encoded):
+        if len(encoded) == LEGACY_LENGTH and '$' not in encoded:
+            return LEGACY_ITERATIONS, bytes.fromhex(encoded[:64]), bytes.fromhex(encoded[64:])
+        _, iterations, salt, digest = encoded.split('$')
+        return int(iterations), _b64decode(salt), _b64decode(digest)
+
+    def verify(self, password, encoded):
+        iterations, salt, expected = self._parse(encoded)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+        return hmac.compare_digest(digest, expected)
+
+    def needs_update(self, encoded):
+        return '$' not in encoded or self._parse(encoded)[0] != self._iterations()
+
+
+class ScryptHasher:
+    """scrypt$<n>$<r>$<p>$<salt>$<hash> using hashlib.scrypt (OpenSSL 1.1+)"""
+
+    algorithm = 'scrypt'
+
+    def available(self):
+        return hasattr(hashlib, 'scrypt')
+
+    def _cost(self):
+        return (getattr(config, 'PASSWORD_SCRYPT_N', 2 ** 14),
+                getattr(config, 'PASSWORD_SCRYPT_R', 8),
+                getattr(config, 'PASSWORD_SCRYPT_P', 1))
+
+    @staticmethod
+    def _derive(password, salt, n, r, p):
+        # scrypt needs 128 * n * r bytes; leave headroom over OpenSSL's 32 MB default
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r, dklen=32)
+
+    def encode(self, password):
+        salt = os.urandom(16)
+        n, r, p = self._cost()
+        digest = self._derive(password, salt, n, r, p)
+        return f'{self.algorithm}${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}'
+
+    def verify(self, password, encoded):
+        _, n, r, p, salt, expected = encoded.split('$')
+        digest = self._derive(password, _b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(digest, _b64decode(expected))
+
+    def needs_update(self, encoded):
+        _, n, r, p, _, _ = encoded.split('$')
+        return (int(n), int(r), int(p)) != self._cost()
+
+
+class Argon2Hasher:
+    """
+    argon2$<argon2-cffi encoded hash>
+
+    Requires the optional argon2-cffi package; cost comes from its defaults.
+    """
+
+    algorithm = 'argon2'
+
+    def _hasher(self):
+        try:
+            from argon2 import PasswordHasher
+        except ImportError:
+            raise ValueError("argon2 hashes require the argon2-cffi package (pip install argon2-cffi)")
+        return PasswordHasher()
+
+    def available(self):
+        try:
+            self._hasher()
+        except ValueError:
+            return False
+        return True
+
+    def encode(self, password):
+        return f'{self.algorithm}${self._hasher().hash(password)}'
+
+    def verify(self, password, encoded):
+        hasher = self._hasher()
+        from argon2.exceptions import VerificationError, InvalidHashError
+        try:
+            return hasher.verify(encoded.split('$', 1)[1], password)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    def needs_update(self, encoded):
+        return self._hasher().check_needs_rehash(encoded.split('$', 1)[1])
+
+
+_hashers = {}
+
+
+def register_hasher(hasher):
+    """Make a hasher available by its algorithm name (the hash string prefix)"""
+    _hashers[hasher.algorithm] = hasher
+
+
+for _hasher in (PBKDF2Hasher(), ScryptHasher(), Argon2Hasher()):
+    register_hasher(_hasher)
+
+
+def get_hasher(algorithm=None):
+    """
+    Get the hasher used for new passwords
+
+    Args:
+        algorithm: Name to use instead of config.PASSWORD_HASHER
+
+    Returns:
+        The named hasher, or PBKDF2 if it is not available here
+    """
+    algorithm = algorithm or getattr(config, 'PASSWORD_HASHER', 'scrypt')
+    if algorithm not in _hashers:
+        raise ValueError(f"Unknown password hasher: {algorithm}")
+    hasher = _hashers[algorithm]
+    return hasher if hasher.available() else _hashers[PBKDF2Hasher.algorithm]
+
+
+def identify_hasher(encoded):
+    """Get the hasher that wrote a stored hash (legacy hex hashes are PBKDF2)"""
+    if len(encoded) == LEGACY_LENGTH and '$' not in encoded:
+        return _hashers[PBKDF2Hasher.algorithm]
+    algorithm = encoded.split('$', 1)[0]
+    if algorithm not in _hashers:
+        raise ValueError(f"Unrecognised password hash format: {algorithm or encoded[:12]}")
+    return _hashers[algorithm]
+
+
+def hash_password(password, algorithm=None):
+    """
+    Hash a password with the configured algorithm and cost
+
+    Args:
+        password: Plain text password
+        algorithm: Optional algorithm name overriding config.PASSWORD_HASHER
+
+    Returns:
+        Hash string naming its algorithm and parameters
+    """
+    return get_hasher(algorithm).encode(password)
+
+
+def verify_password(password, encoded):
+    """
+    Verify a password against a stored hash of any supported format
+
+    Args:
+        password: Plain text password to verify
+        encoded: Stored hash string
+
+    Returns:
+        Boolean indicating if password is correct
+    """
+    return identify_hasher(encoded).verify(password, encoded)
+
+
+def needs_rehash(encoded):
+    """
+    Check whether a stored hash was made with another algorithm or cost
+
+    Args:
+        encoded: Stored hash string
+
+    Returns:
+        True if it should be replaced after the next successful login
+    """
+    hasher = identify_hasher(encoded)
+    if hasher.algorithm != get_hasher().algorithm:
+        return True
+    return hasher.needs_update(encoded)
@@ -0,0 +1,344 @@
+"""
+Bulk payment posting for Hostel Manager
+Matches received payments to installments and applies them in one transaction
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from app.database.connection import get_db_connection, write_transaction
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+
+# Amounts within half a paisa of the installment count as paid in full
+TOLERANCE = 0.005
+
+# Keys looked up / students loaded per "IN (...)" list
+_IN_CHUNK = 500
+
+
+class PostingAborted(Exception):
+    """Raised inside the transaction to roll a batch back"""
+
+
+def _money(value):
+    return round(float(value), 2)
+
+
+def upload_fingerprint(content):
+    """
+    Identify one uploaded payments file (or JSON body) by its contents
+
+    Args:
+        content: Raw bytes as received
+
+    Returns:
+        Hex digest used to build keys for rows without their own
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def normalize_payment(data, fallback_key=None):
+    """
+    Validate one payment record and fill in defaults
+
+    Args:
+        data: Dictionary with aadhaar_number, amount and optionally
+            installment_number, paid_date (YYYY-MM-DD), reference and
+            idempotency_key
+        fallback_key: Key for a record with neither idempotency_key nor
+            reference (normally the upload and row it came from)
+
+    Returns:
+        Normalized dictionary
+
+    Raises:
+        ValueError describing the problem
+    """
+    aadhaar_number = str(data.get('aadhaar_number') or '').strip()
+    if not aadhaar_number:
+        raise ValueError("aadhaar_number is required")
+
+    try:
+        amount = _money(data.get('amount'))
+    except (TypeError, ValueError):
+        raise ValueError("amount must be a number")
+    if amount <= 0:
+        raise ValueError("amount must be greater than 0")
+
+    installment_number = data.get('installment_number')
+    if installment_number in (None, ''):
+        installment_number = None
+    else:
+        try:
+            installment_number = int(installment_number)
+        except (TypeError, ValueError):
+            raise ValueError("installment_number must be a whole number")
+
+    paid_date = str(data.get('paid_date') or '').strip() or datetime.now().strftime('%Y-%m-%d')
+    try:
+        datetime.strptime(paid_date, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError("paid_date must be in YYYY-MM-DD format")
+
+    reference = str(data.get('reference') or '').strip() or None
+    key = str(data.get('idempotency_key') or '').strip() or reference
+    if not key:
+        # Two genuine payments can have identical fields, so they must not
+        # be used as the key; only the position in a known upload is safe
+        if not fallback_key:
+            raise ValueError("idempotency_key or reference is required")
+        key = fallback_key
+
+    return {
+        'idempotency_key': key,
+        'aadhaar_number': aadhaar_number,
+        'installment_number': installment_number,
+        'amount': amount,
+        'paid_date': paid_date,
+        'reference': reference
+    }
+
+
+def _existing_payments(cursor, keys):
+    """Stored outcome of payments already posted under any of the keys"""
+    found = {}
+    for start in range(0, len(keys), _IN_CHUNK):
+        chunk = keys[start:start + _IN_CHUNK]
+        cursor.execute(f'''
+            SELECT idempotency_key, amount_applied, amount_unapplied, allocations
+            FROM payment_postings
+            WHERE idempotency_key IN ({','.join('?' * len(chunk))})
+        ''', chunk)
+        for key, applied, unapplied, allocations in cursor.fetchall():
+            found[key] = (applied, unapplied, json.loads(allocations))
+    return found
+
+
+def _open_installments(cursor, aadhaar_numbers):
+    """Pending installments per student, oldest due date first"""
+    students = set()
+    installments = defaultdict(list)
+    for start in range(0, len(aadhaar_numbers), _IN_CHUNK):
+        chunk = aadhaar_numbers[start:start + _IN_CHUNK]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f'''
+            SELECT aadhaar_number FROM students WHERE aadhaar_number IN ({placeholders})
+        ''', chunk)
+        students.update(row[0] for row in cursor.fetchall())
+        cursor.execute(f'''
+            SELECT id, aadhaar_number, installment_number, amount, amount_paid
+            FROM installments
+            WHERE aadhaar_number IN ({placeholders}) AND LOWER(payment_status) = 'pending'
+            ORDER BY aadhaar_number, due_date, installment_number
+        ''', chunk)
+        for row_id, aadhaar_number, installment_number, amount, amount_paid in cursor.fetchall():
+            installments[aadhaar_number].append({
+                'id': row_id,
+                'installment_number': installment_number,
+                'amount': amount,
+                'amount_paid': amount_paid or 0
+            })
+    return students, installments
+
+
+def _apply(payment, open_installments):
+    """
+    Spread one payment over a student's pending installments in memory
+
+    The named installment (if any) is paid first, then the rest in due-date
+    order. Whatever is left over is reported as unapplied.
+
+    Returns:
+        Tuple (allocations: list of dicts, unapplied: float)
+    """
+    ordered = open_installments
+    if payment['installment_number'] is not None:
+        ordered = sorted(open_installments,
+                         key=lambda i: i['installment_number'] != payment['installment_number'])
+
+    remaining = payment['amount']
+    allocations = []
+    for installment in ordered:
+        if remaining <= TOLERANCE:
+            break
+        balance = _money(installment['amount'] - installment['amount_paid'])
+        if balance <= TOLERANCE:
+            continue
+        applied = min(balance, remaining)
+        installment['amount_paid'] = _money(installment['amount_paid'] + applied)
+        installment['paid_date'] = payment['paid_date']
+        remaining = _money(remaining - applied)
+        allocations.append({
+            'installment_number': installment['installment_number'],
+            'amount': applied,
+            'paid_in_full': balance - applied <= TOLERANCE
+        })
+    return allocations, remaining
+
+
+def post_payments(records, dry_run=False, source=None):
+    """
+    Post a batch of received payments against installments
+
+    Every payment in the batch is matched and written in one transaction:
+    installment updates and payment rows go in with executemany. A payment
+    whose idempotency key (or bank reference) was already posted is not
+    applied again; its original outcome is reported as a duplicate.
+
+    Rows with neither key are keyed by source and row number: re-posting
+    the identical upload is a no-op, while the same payment in a different
+    upload (or twice in one) is applied each time. Without a source such
+    rows are rejected.
+
+    Args:
+        records: Iterable of payment dictionaries (see normalize_payment)
+        dry_run: Match and report without saving anything
+        source: Fingerprint of the upload the records came from (see
+            upload_fingerprint)
+
+    Returns:
+        Tuple (success: bool, report: dict or None, message: str). The report
+        has per-row results and totals for reconciliation.
+    """
+    rows = []
+    valid = []
+    seen = {}
+    for row_number, data in enumerate(records, 1):
+        try:
+            payment = normalize_payment(
+                data, f"upload:{source}:{row_number}" if source else None)
+        except ValueError as e:
+            rows.append({'row': row_number, 'status': 'rejected', 'message': str(e),
+                         'aadhaar_number': str(data.get('aadhaar_number') or '') or None,
+                         'idempotency_key': None, 'amount': None,
+                         'amount_applied': 0, 'amount_unapplied': 0, 'allocations': []})
+            continue
+        row = {'row': row_number, 'status': None, 'message': '',
+               'aadhaar_number': payment['aadhaar_number'],
+               'idempotency_key': payment['idempotency_key'],
+               'amount': payment['amount'],
+               'amount_applied': 0, 'amount_unapplied': 0, 'allocations': []}
+        rows.append(row)
+        if payment['idempotency_key'] in seen:
+            row['status'] = 'duplicate'
+            row['message'] = f"Same key as row {seen[payment['idempotency_key']]} in this batch"
+            continue
+        seen[payment['idempotency_key']] = row_number
+        valid.append((row, payment))
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        with write_transaction(conn):
+            existing = _existing_payments(cursor, [p['idempotency_key'] for _, p in valid])
+            students, open_installments = _open_installments(
+                cursor, sorted({p['aadhaar_number'] for _, p in valid}))
+
+            touched = {}
+            payment_rows = []
+            posted_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for row, payment in valid:
+                if payment['idempotency_key'] in existing:
+                    applied, unapplied, allocations = existing[payment['idempotency_key']]
+                    row.update(status='duplicate', message='Already posted',
+                               amount_applied=applied, amount_unapplied=unapplied,
+                               allocations=allocations)
+                    continue
+                if payment['aadhaar_number'] not in students:
+                    row.update(status='rejected', message='Student not found')
+                    continue
+
+                installments = open_installments[payment['aadhaar_number']]
+                allocations, unapplied = _apply(payment, installments)
+                for installment in installments:
+                    if installment.get('paid_date'):
+                        touched[installment['id']] = installment
+                row.update(amount_applied=_money(payment['amount'] - unapplied),
+                           amount_unapplied=unapplied, allocations=allocations)
+                if not allocations:
+                    row.update(status='unapplied', message='No pending installments')
+                elif unapplied > TOLERANCE:
+                    row.update(status='overpaid', message=f"₹{unapplied:.2f} left unapplied")
+                else:
+                    row.update(status='applied')
+                payment_rows.append((
+                    payment['idempotency_key'], payment['aadhaar_number'],
+                    payment['installment_number'], payment['amount'],
+                    row['amount_applied'], unapplied, json.dumps(allocations),
+                    payment['paid_date'], payment['reference'], posted_at
+                ))
+
+            if dry_run:
+                raise PostingAborted()
+
+            updates = []
+            for installment in touched.values():
+                if installment['amount'] - installment['amount_paid'] <= TOLERANCE:
+                    updates.append((installment['amount_paid'], 'Paid',
+                                    installment['paid_date'], installment['id']))
+                else:
+                    updates.append((installment['amount_paid'], 'Pending', None,
+                                    installment['id']))
+            # The ledger and aging triggers follow amount_paid/payment_status
+            cursor.executemany('''
+                UPDATE installments SET amount_paid = ?, payment_status = ?, paid_date = ?
+                WHERE id = ?
+            ''', updates)
+            cursor.executemany('''
+                INSERT INTO payment_postings
+                (idempotency_key, aadhaar_number, installment_number, amount, amount_applied,
+                 amount_unapplied, allocations, paid_date, reference, posted_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', payment_rows)
+
+    except PostingAborted:
+        pass
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        return False, None, f"Error: {str(e)}"
+    conn.close()
+
+    if not dry_run and payment_rows:
+        invalidate_dashboard_cache()
+
+    report = _summarize(rows, dry_run)
+    verb = 'Would post' if dry_run else 'Posted'
+    message = (f"{verb} {report['posted']} of {report['total']} payments "
+               f"(₹{report['amount_applied']:,.2f} applied)")
+    if report['duplicates']:
+        message += f"; {report['duplicates']} duplicate(s) skipped"
+    if report['rejected']:
+        message += f"; {report['rejected']} rejected"
+    return True, report, message
+
+
+def _summarize(rows, dry_run):
+    """Totals for the reconciliation report"""
+    counts = defaultdict(int)
+    for row in rows:
+        counts[row['status']] += 1
+    new = [row for row in rows if row['status'] in ('applied', 'overpaid', 'unapplied')]
+    allocations = [a for row in new for a in row['allocations']]
+    return {
+        'dry_run': dry_run,
+        'total': len(rows),
+        'posted': len(new),
+        'applied': counts['applied'],
+        'overpaid': counts['overpaid'],
+        'unapplied': counts['unapplied'],
+        'duplicates': counts['duplicate'],
+        'rejected': counts['rejected'],
+        'amount_received': _money(sum(row['amount'] for row in new)),
+        'amount_applied': _money(sum(row['amount_applied'] for row in new)),
+        'amount_unapplied': _money(sum(row['amount_unapplied'] for row in new)),
+        'installments_paid': len({(row['aadhaar_number'], a['installment_number'])
+                                  for row in new for a in row['allocations']
+                                  if a['paid_in_full']}),
+        'installments_part_paid': sum(1 for a in allocations if not a['paid_in_full']),
+        'rows': rows
+    }
@@ -0,0 +1,339 @@
+"""
+Request profiling for Hostel Manager
+Opt-in timing of requests and SQL statements, exposed as Server-Timing
+headers, Prometheus metrics and a slow query log with query plans
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, request
+
+import config
+from app.database.connection import get_db_connection, get_pool_stats, set_instrumentation
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Only these statements can be given to EXPLAIN QUERY PLAN
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_enabled = False
+
+
+class QueryTiming:
+    """One statement run during a request; fetches add to its time"""
+
+    __slots__ = ('profile', 'sql', 'params', 'seconds')
+
+    def __init__(self, profile, sql, params, seconds):
+        self.profile = profile
+        self.sql = sql
+        self.params = params
+        self.seconds = seconds
+
+    def add(self, seconds):
+        self.seconds += seconds
+        self.profile.sql_seconds += seconds
+
+
+class RequestProfile:
+    """Counters for a single request, kept on flask.g"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.connections = 0
+        self.queries = []
+
+    def record(self, sql, params, seconds):
+        self.statements += 1
+        self.sql_seconds += seconds
+        timing = QueryTiming(self, sql, params, seconds)
+        self.queries.append(timing)
+        return timing
+
+    def server_timing(self, elapsed):
+        """Format the counters as a Server-Timing header value"""
+        return (f'total;dur={elapsed * 1000:.1f}, '
+                f'sql;dur={self.sql_seconds * 1000:.1f};desc="{self.statements} statements", '
+                f'db-conn;desc="{self.connections} connections"')
+
+
+def _current_profile():
+    if has_app_context():
+        return g.get('profile')
+    return None
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that times statements for the current request's profile
+
+    A SELECT does most of its work while rows are fetched, so fetch calls
+    are added to the statement that produced them.
+    """
+
+    _timing = None
+
+    def _timed(self, method, args, explain_params):
+        profile = _current_profile()
+        if profile is None:
+            self._timing = None
+            return method(*args)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._timing = profile.record(args[0], explain_params,
+                                          time.perf_counter() - started)
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, (sql, parameters), parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Keep a sample row for EXPLAIN without consuming a generator
+        sample = None
+        if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters:
+            sample = seq_of_parameters[0]
+        return self._timed(super().executemany, (sql, seq_of_parameters), sample)
+
+    def executescript(self, sql_script):
+        # False marks a script, which EXPLAIN cannot take
+        return self._timed(super().executescript, (sql_script,), False)
+
+    def _fetch(self, method, *args):
+        timing = self._timing
+        if timing is None:
+            return method(*args)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            timing.add(time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._fetch(super().fetchmany)
+        return self._fetch(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        return self._fetch(super().__next__)
+
+
+def _on_checkout(conn):
+    profile = _current_profile()
+    if profile is not None:
+        profile.connections += 1
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """Process-wide request and SQL counters in Prometheus form"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.durations = {}
+        self.sql = {}
+
+    def observe(self, endpoint, method, status, elapsed, profile):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            histogram = self.durations.setdefault(endpoint, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if elapsed <= bound:
+                    histogram[i] += 1
+            histogram[-2] += elapsed
+            histogram[-1] += 1
+
+            totals = self.sql.setdefault(endpoint, [0, 0.0, 0])
+            totals[0] += profile.statements
+            totals[1] += profile.sql_seconds
+            totals[2] += profile.connections
+
+    def render(self):
+        """Format every counter in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += ['# HELP hostel_http_requests_total Requests handled, by endpoint and status',
+                      '# TYPE hostel_http_requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'hostel_http_requests_total{{endpoint="{_escape_label(endpoint)}",'
+                             f'method="{method}",status="{status}"}} {count}')
+
+            lines += ['# HELP hostel_http_request_duration_seconds Request wall time',
+                      '# TYPE hostel_http_request_duration_seconds histogram']
+            for endpoint, histogram in sorted(self.durations.items()):
+                label = f'endpoint="{_escape_label(endpoint)}"'
+                for bound, count in zip(DURATION_BUCKETS, histogram):
+                    lines.append(f'hostel_http_request_duration_seconds_bucket'
+                                 f'{{{label},le="{bound}"}} {count}')
+                lines.append(f'hostel_http_request_duration_seconds_bucket'
+                             f'{{{label},le="+Inf"}} {histogram[-1]}')
+                lines.append(f'hostel_http_request_duration_seconds_sum{{{label}}} {histogram[-2]:.6f}')
+                lines.append(f'hostel_http_request_duration_seconds_count{{{label}}} {histogram[-1]}')
+
+            for index, name, kind, help_text in (
+                    (0, 'hostel_sql_statements_total', 'counter', 'SQL statements executed'),
+                    (1, 'hostel_sql_duration_seconds_total', 'counter',
+                     'Time spent executing SQL and fetching rows'),
+                    (2, 'hostel_db_connections_total', 'counter',
+                     'Connections checked out of the pool')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for endpoint, totals in sorted(self.sql.items()):
+                    value = f'{totals[index]:.6f}' if index == 1 else totals[index]
+                    lines.append(f'{name}{{endpoint="{_escape_label(endpoint)}"}} {value}')
+
+        pool = get_pool_stats()
+        for key, kind, help_text in (
+                ('hits', 'counter', 'Checkouts served by an idle connection'),
+                ('misses', 'counter', 'Checkouts that opened a new connection'),
+                ('waits', 'counter', 'Checkouts that waited for a free connection'),
+                ('timeouts', 'counter', 'Checkouts that gave up waiting'),
+                ('size', 'gauge', 'Open connections'),
+                ('idle', 'gauge', 'Idle connections'),
+                ('max_size', 'gauge', 'Pool size limit')):
+            name = f'hostel_db_pool_{key}' + ('_total' if kind == 'counter' else '')
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}',
+                      f'{name} {pool[key]}']
+
+        return '\n'.join(lines) + '\n'
+
+
+_metrics = RequestMetrics()
+_slow_queries = {}
+_slow_lock = threading.Lock()
+
+
+def explain_query_plan(conn, sql, params):
+    """
+    Get the query plan of a statement as indented lines
+
+    Args:
+        conn: Database connection
+        sql: Statement text
+        params: Parameters it ran with (None if unknown)
+
+    Returns:
+        List of plan lines, or a one-line note if it cannot be explained
+    """
+    keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    if keyword not in EXPLAINABLE or params is False:
+        return ['(not explainable)']
+    try:
+        rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params or ()).fetchall()
+    except sqlite3.Error as e:
+        return [f'(no plan: {e})']
+
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+def _collect_slow_queries(profile):
+    threshold = getattr(config, 'PROFILING_SLOW_QUERY_MS', 100) / 1000
+    keep = getattr(config, 'PROFILING_SLOW_QUERY_COUNT', 10)
+
+    for timing in profile.queries:
+        if timing.seconds < threshold:
+            continue
+        sql = ' '.join(timing.sql.split())
+        with _slow_lock:
+            entry = _slow_queries.get(sql)
+            if entry is not None:
+                entry['calls'] += 1
+                entry['last_seen'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                entry['max_ms'] = max(entry['max_ms'], round(timing.seconds * 1000, 1))
+                continue
+            if len(_slow_queries) >= keep:
+                fastest = min(_slow_queries, key=lambda s: _slow_queries[s]['max_ms'])
+                if _slow_queries[fastest]['max_ms'] >= timing.seconds * 1000:
+                    continue
+                del _slow_queries[fastest]
+
+        # New entry: explain it once (outside the lock, it runs SQL)
+        conn = get_db_connection()
+        try:
+            plan = explain_query_plan(conn, timing.sql, timing.params)
+        finally:
+            conn.close()
+        entry = {
+            'sql': sql,
+            'max_ms': round(timing.seconds * 1000, 1),
+            'calls': 1,
+            'endpoint': request.endpoint,
+            'last_seen': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'plan': plan
+        }
+        with _slow_lock:
+            _slow_queries[sql] = entry
+        current_app.logger.warning('Slow query (%.1f ms, %s): %s\n  %s', entry['max_ms'],
+                                   request.endpoint, sql, '\n  '.join(plan))
+
+
+def get_slow_queries():
+    """
+    Get the slowest distinct statements seen by this process
+
+    Returns:
+        List of dictionaries (sql, max_ms, calls, endpoint, last_seen, plan),
+        slowest first; empty when profiling is off
+    """
+    with _slow_lock:
+        entries = [dict(entry) for entry in _slow_queries.values()]
+    return sorted(entries, key=lambda e: e['max_ms'], reverse=True)
+
+
+def render_metrics():
+    """Get this process's metrics in the Prometheus text format"""
+    return _metrics.render()
+
+
+def profiling_enabled():
+    return _enabled
+
+
+def _start_profile():
+    g.profile = RequestProfile()
+
+
+def _finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+
+    elapsed = time.perf_counter() - profile.started
+    endpoint = request.endpoint or 'unmatched'
+    response.headers.add('Server-Timing', profile.server_timing(elapsed))
+    _metrics.observe(endpoint, request.method, response.status_code, elapsed, profile)
+    _collect_slow_queries(profile)
+    return response
+
+
+def init_app(app):
+    """Install the profiling hooks if config.PROFILING_ENABLED is set"""
+    global _enabled
+    if not getattr(config, 'PROFILING_ENABLED', False):
+        return
+    _enabled = True
+    set_instrumentation(cursor_factory=TimedCursor, checkout_listener=_on_checkout)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
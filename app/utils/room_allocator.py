@@ -0,0 +1,294 @@
+"""
+Batch room allocation for Hostel Manager
+Places many unallocated students in one pass under a selectable placement policy
+"""
+
+import heapq
+import time
+from collections import defaultdict
+
+from app.database.connection import get_db_connection, write_transaction
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+from app.utils.vacancy_index import invalidate_vacancy_index
+
+NOT_ALLOCATED = 'Not Allocated'
+
+# pack: fill partly occupied rooms before opening empty ones
+# spread: always use the room with the most free beds
+# gender: rooms hold a single gender
+# college: rooms hold a single gender, and a single college where possible
+POLICIES = ('pack', 'spread', 'college', 'gender')
+
+# Fields a grouping policy keeps rooms uniform on, most important first
+GROUP_POLICIES = {'college': ('gender', 'college_name'), 'gender': ('gender',)}
+
+
+def _order_by_policy(rooms, policy):
+    """Heap of (key, room_number) giving the order rooms are filled in"""
+    if policy == 'spread':
+        heap = [(room['occupied'] - room['capacity'], room['room_number']) for room in rooms]
+    else:
+        # Fewest free beds first, so partly filled rooms are closed off first
+        heap = [(room['capacity'] - room['occupied'], room['room_number']) for room in rooms]
+    heapq.heapify(heap)
+    return heap
+
+
+def plan_allocation(students, rooms, policy='pack', preferences=None):
+    """
+    Work out a bed for each student without touching the database
+
+    Args:
+        students: List of dictionaries with aadhaar_number, college_name and gender
+        rooms: List of dictionaries with room_number, capacity, occupied and
+            groups (set of (field, value) pairs for current occupants)
+        policy: One of POLICIES
+        preferences: Optional {aadhaar_number: [room_number, ...]}; a student
+            gets the first listed room that still has space
+
+    Returns:
+        Tuple (plan: list of (aadhaar_number, room_number), unplaced: list of aadhaar_number)
+
+    Raises:
+        ValueError for an unknown policy
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy '{policy}'. Choose from: {', '.join(POLICIES)}")
+
+    preferences = preferences or {}
+    free = {room['room_number']: room['capacity'] - room['occupied'] for room in rooms}
+    plan = []
+    remaining = []
+
+    # Preferences are honoured first, whatever the policy
+    for student in students:
+        placed = False
+        for room_number in preferences.get(student['aadhaar_number'], ()):
+            if free.get(room_number, 0) > 0:
+                free[room_number] -= 1
+                plan.append((student['aadhaar_number'], room_number))
+                placed = True
+                break
+        if not placed:
+            remaining.append(student)
+
+    vacant = [dict(room, occupied=room['capacity'] - free[room['room_number']])
+              for room in rooms if free[room['room_number']] > 0]
+
+    if policy in GROUP_POLICIES:
+        return _plan_grouped(remaining, vacant, GROUP_POLICIES[policy], plan)
+
+    heap = _order_by_policy(vacant, policy)
+    unplaced = []
+    for student in remaining:
+        if not heap:
+            unplaced.append(student['aadhaar_number'])
+            continue
+        key, room_number = heapq.heappop(heap)
+        plan.append((student['aadhaar_number'], room_number))
+        free[room_number] -= 1
+        if free[room_number] > 0:
+            # spread keys are negative free beds, pack keys are free beds
+            heapq.heappush(heap, (key + 1 if policy == 'spread' else key - 1, room_number))
+
+    return plan, unplaced
+
+
+def _plan_grouped(students, rooms, fields, plan):
+    """
+    Place students so each room holds a single group where possible
+
+    A group is the students sharing the values of `fields`. Order of
+    preference for a group: rooms already holding only that group, then
+    empty rooms. Students left over are tried again with the last field
+    dropped (so a college's overflow still goes to a same-gender room).
+    Rooms are never mixed on the first field: a student with no empty room
+    and no room of their own value left is reported as unplaced.
+    """
+    free = {}
+    occupied = {}
+    values = {}
+    for room in rooms:
+        room_number = room['room_number']
+        free[room_number] = room['capacity'] - room['occupied']
+        occupied[room_number] = room['occupied']
+        values[room_number] = defaultdict(set)
+        for name, value in room.get('groups', ()):
+            values[room_number][name].add(value or '')
+    order = sorted(free)
+
+    def assign(student, room_number):
+        plan.append((student['aadhaar_number'], room_number))
+        free[room_number] -= 1
+        occupied[room_number] += 1
+        for field in fields:
+            values[room_number][field].add(student.get(field) or '')
+
+    remaining = students
+    for depth in range(len(fields), 0, -1):
+        key_fields = fields[:depth]
+        pure = defaultdict(list)
+        empty = []
+        for room_number in order:
+            if free[room_number] == 0:
+                continue
+            if occupied[room_number] == 0:
+                empty.append(room_number)
+                continue
+            room_values = [values[room_number][field] for field in key_fields]
+            if all(len(v) == 1 for v in room_values):
+                pure[tuple(next(iter(v)) for v in room_values)].append(room_number)
+        empty.reverse()  # pop() from the end keeps room order
+
+        groups = defaultdict(list)
+        for student in remaining:
+            groups[tuple(student.get(field) or '' for field in key_fields)].append(student)
+
+        leftovers = []
+        # Biggest groups first so they get whole empty rooms
+        for key, members in sorted(groups.items(), key=lambda item: -len(item[1])):
+            own = pure[key]
+            for student in members:
+                while own and free[own[0]] == 0:
+                    own.pop(0)
+                if not own and empty:
+                    own.append(empty.pop())
+                if not own:
+                    leftovers.append(student)
+                    continue
+                assign(student, own[0])
+        remaining = leftovers
+        if not remaining:
+            break
+
+    # Anyone still left would have to share with another first-field value
+    # (gender); leave them unplaced rather than mix a room
+    return plan, [student['aadhaar_number'] for student in remaining]
+
+
+def _load_state(cursor, aadhaar_numbers=None):
+    """Read the unallocated students to place and every room with a free bed"""
+    if aadhaar_numbers:
+        students = []
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(aadhaar_numbers), 500):
+            chunk = aadhaar_numbers[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'''
+                SELECT aadhaar_number, college_name, gender FROM students
+                WHERE (room_allocation = ? OR room_allocation IS NULL OR room_allocation = '')
+                  AND aadhaar_number IN ({placeholders})
+            ''', [NOT_ALLOCATED] + list(chunk))
+            students.extend(cursor.fetchall())
+        order = {a: i for i, a in enumerate(aadhaar_numbers)}
+        students.sort(key=lambda row: order[row[0]])
+    else:
+        cursor.execute('''
+            SELECT aadhaar_number, college_name, gender FROM students
+            WHERE room_allocation = ? OR room_allocation IS NULL OR room_allocation = ''
+            ORDER BY registration_date, aadhaar_number
+        ''', (NOT_ALLOCATED,))
+        students = cursor.fetchall()
+
+    cursor.execute('''
+        SELECT room_number, capacity, occupied_count FROM rooms
+        WHERE occupied_count < capacity
+        ORDER BY room_number
+    ''')
+    rooms = {row[0]: {'room_number': row[0], 'capacity': row[1], 'occupied': row[2],
+                      'groups': set()} for row in cursor.fetchall()}
+
+    # Who already lives in the partly filled rooms (for the grouping policies)
+    cursor.execute('''
+        SELECT s.room_allocation, s.college_name, s.gender
+        FROM students s
+        JOIN rooms r ON r.room_number = s.room_allocation
+        WHERE r.occupied_count < r.capacity
+    ''')
+    for room_number, college_name, gender in cursor.fetchall():
+        rooms[room_number]['groups'].update({('college_name', college_name),
+                                             ('gender', gender)})
+
+    students = [{'aadhaar_number': row[0], 'college_name': row[1], 'gender': row[2]}
+                for row in students]
+    return students, list(rooms.values())
+
+
+def place_students(cursor, aadhaar_numbers=None, policy='pack', preferences=None, dry_run=False):
+    """
+    Plan (and unless dry_run, write) a batch allocation through a given cursor
+
+    For callers that already hold a write transaction, such as a capacity
+    change that re-homes overflow students.
+
+    Returns:
+        Tuple (students: list of dicts, plan: list of (aadhaar_number, room_number),
+        unplaced: list of aadhaar_number)
+    """
+    students, rooms = _load_state(cursor, aadhaar_numbers)
+    plan, unplaced = plan_allocation(students, rooms, policy, preferences)
+    if not dry_run and plan:
+        # The students_room_update trigger moves the room counters
+        cursor.executemany(
+            'UPDATE students SET room_allocation = ? WHERE aadhaar_number = ?',
+            [(room_number, aadhaar_number) for aadhaar_number, room_number in plan])
+    return students, plan, unplaced
+
+
+def allocate_batch(aadhaar_numbers=None, policy='pack', preferences=None, dry_run=False):
+    """
+    Allocate rooms to many unallocated students in one transaction
+
+    The current state is read and the plan applied under a single
+    BEGIN IMMEDIATE, so no other allocation can interleave with the batch.
+    With dry_run the plan is computed and returned but nothing is written.
+
+    Args:
+        aadhaar_numbers: Students to place (default: every unallocated student)
+        policy: One of POLICIES
+        preferences: Optional {aadhaar_number: [room_number, ...]}
+        dry_run: Only return the proposed plan
+
+    Returns:
+        Tuple (success: bool, result: dict or None, message: str); result has
+        policy, dry_run, requested, placed, unplaced, rooms_used, plan and seconds
+    """
+    if policy not in POLICIES:
+        return False, None, f"Unknown policy '{policy}'. Choose from: {', '.join(POLICIES)}"
+
+    started = time.perf_counter()
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        if dry_run:
+            students, plan, unplaced = place_students(cursor, aadhaar_numbers, policy,
+                                                      preferences, dry_run=True)
+            conn.close()
+        else:
+            try:
+                with write_transaction(conn):
+                    students, plan, unplaced = place_students(cursor, aadhaar_numbers,
+                                                              policy, preferences)
+            finally:
+                conn.close()
+            if plan:
+                invalidate_vacancy_index()
+                invalidate_dashboard_cache()
+
+        result = {
+            'policy': policy,
+            'dry_run': dry_run,
+            'requested': len(students),
+            'placed': len(plan),
+            'unplaced': unplaced,
+            'rooms_used': len({room_number for _, room_number in plan}),
+            'plan': [{'aadhaar_number': a, 'room_number': r} for a, r in plan],
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        verb = 'Would allocate' if dry_run else 'Allocated'
+        return True, result, (f"{verb} {len(plan)} of {len(students)} students "
+                              f"to {result['rooms_used']} rooms")
+
+    except Exception as e:
+        return False, None, f"Error: {str(e)}"
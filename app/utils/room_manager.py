@@ -4,7 +4,14 @@ Handles room allocation and capacity management
 """
 
 import sqlite3
-from app.database.connection import get_db_connection
+import threading
+import time
+from contextlib import contextmanager
+from app.database.connection import get_db_connection, write_transaction
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+from app.utils.vacancy_index import get_vacancy_index, invalidate_vacancy_index
+from app.utils.capacity_planner import apply_capacity_change
+from app.utils.settings_store import get_setting, save_settings
 
 def set_room_capacity(capacity):
     """
@@ -17,29 +24,17 @@ def set_room_capacity(capacity):
         Tuple (success: bool, message: str)
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                      ('room_capacity', str(capacity)))
-        
-        conn.commit()
-        conn.close()
-        
+        capacity = save_settings({'room_capacity': capacity})['room_capacity']
         return True, f"Room capacity set to {capacity} students per room"
         
+    except ValueError as e:
+        return False, str(e)
     except Exception as e:
         return False, f"Error: {str(e)}"
 
 def get_room_capacity():
-    """Get the current room capacity setting"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT value FROM settings WHERE key = ?', ('room_capacity',))
-    result = cursor.fetchone()
-    conn.close()
-    
-    return int(result[0]) if result else 2  # Default to 2 students per room
+    """Get the current room capacity setting (from the settings cache)"""
+    return get_setting('room_capacity')
 
 def create_room(room_number):
     """
@@ -64,6 +59,8 @@ def create_room(room_number):
         
         conn.commit()
         conn.close()
+        get_vacancy_index().set_room(room_number, capacity, 0)
+        invalidate_dashboard_cache()
         
         return True, f"Room {room_number} created successfully"
         
@@ -72,139 +69,292 @@ def create_room(room_number):
     except Exception as e:
         return False, f"Error: {str(e)}"
 
+ROOM_COLUMNS = '''
+    room_number, capacity, occupied_count,
+    (capacity - occupied_count) AS vacant_count
+'''
+
+def _room_to_dict(row):
+    """Convert a rooms row to a dictionary with numeric counters"""
+    room = dict(row)
+    room['occupied_count'] = int(room.get('occupied_count') or 0)
+    room['capacity'] = int(room.get('capacity') or 0)
+    room['vacant_count'] = int(room.get('vacant_count') or 0)
+    return room
+
 def get_all_rooms():
     """Get all rooms with their occupancy status.
 
-    Occupied counts are computed dynamically by counting students
-    allocated to each room to avoid stale `occupied_count` values.
+    Occupied counts come from rooms.occupied_count, which the students_room_*
+    triggers keep in step with students.room_allocation.
     """
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT r.room_number, r.capacity,
-               COUNT(s.aadhaar_number) as occupied_count,
-               (r.capacity - COUNT(s.aadhaar_number)) as vacant_count
-        FROM rooms r
-        LEFT JOIN students s ON s.room_allocation = r.room_number
-        GROUP BY r.room_number, r.capacity
-        ORDER BY r.room_number
+    cursor.execute(f'''
+        SELECT {ROOM_COLUMNS}
+        FROM rooms
+        ORDER BY room_number
     ''')
 
-    rooms = cursor.fetchall()
+    rooms = [_room_to_dict(r) for r in cursor.fetchall()]
     conn.close()
 
-    # Ensure numeric types and sensible defaults
-    result = []
-    for r in rooms:
-        row = dict(r)
-        row['occupied_count'] = int(row.get('occupied_count') or 0)
-        row['capacity'] = int(row.get('capacity') or 0)
-        row['vacant_count'] = int(row.get('vacant_count') or 0)
-        result.append(row)
+    return rooms
 
-    return result
+def get_room(room_number, cursor=None):
+    """
+    Get a single room with its occupancy (one primary-key lookup)
+    
+    Args:
+        room_number: Room number/identifier
+        cursor: Optional cursor to read through (e.g. inside a transaction)
+        
+    Returns:
+        Room dictionary, or None if the room does not exist
+    """
+    conn = None
+    if cursor is None:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+    
+    cursor.execute(f'''
+        SELECT {ROOM_COLUMNS}
+        FROM rooms
+        WHERE room_number = ?
+    ''', (room_number,))
+    row = cursor.fetchone()
+    if conn is not None:
+        conn.close()
+    
+    if not row:
+        return None
+    columns = [d[0] for d in cursor.description]
+    return _room_to_dict(zip(columns, row))
 
 def get_available_rooms():
-    """Get rooms that have available capacity (computed dynamically)."""
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    """Get rooms that have available capacity, served from the vacancy index."""
+    return get_vacancy_index().vacant_rooms()
 
-    cursor.execute('''
-        SELECT r.room_number, r.capacity,
-               COUNT(s.aadhaar_number) as occupied_count,
-               (r.capacity - COUNT(s.aadhaar_number)) as vacant_count
-        FROM rooms r
-        LEFT JOIN students s ON s.room_allocation = r.room_number
-        GROUP BY r.room_number, r.capacity
-        HAVING occupied_count < r.capacity
-        ORDER BY r.room_number
-    ''')
+NOT_ALLOCATED = 'Not Allocated'
 
-    rooms = cursor.fetchall()
-    conn.close()
+# Attempts to claim a bed before giving up when rooms fill up under us
+MAX_CLAIM_ATTEMPTS = 5
+
+_metrics_lock = threading.Lock()
+_metrics = {'allocations': 0, 'no_vacancy': 0, 'conflicts': 0, 'errors': 0,
+            'total_seconds': 0.0}
 
-    result = []
-    for r in rooms:
-        row = dict(r)
-        row['occupied_count'] = int(row.get('occupied_count') or 0)
-        row['capacity'] = int(row.get('capacity') or 0)
-        row['vacant_count'] = int(row.get('vacant_count') or 0)
-        result.append(row)
+def _record_metric(name, started=None):
+    with _metrics_lock:
+        _metrics[name] += 1
+        if started is not None:
+            _metrics['total_seconds'] += time.perf_counter() - started
 
+def get_allocation_metrics():
+    """
+    Get allocation engine counters for this process
+    
+    Returns:
+        Dictionary with allocations, no_vacancy, conflicts, errors and
+        the average allocation time in milliseconds
+    """
+    with _metrics_lock:
+        result = dict(_metrics)
+    done = result['allocations'] or 1
+    result['avg_allocation_ms'] = round(result.pop('total_seconds') * 1000 / done, 3)
     return result
 
+@contextmanager
+def _allocation_transaction(conn):
+    """write_transaction that drops the vacancy index if the work is rolled back"""
+    try:
+        with write_transaction(conn):
+            yield conn
+    except BaseException:
+        # Counts reported to the index inside the transaction never committed
+        invalidate_vacancy_index()
+        raise
+
+def sync_room_index(cursor, room_number):
+    """Report a room's counters, as seen inside the current transaction, to the vacancy index"""
+    if not room_number or room_number == NOT_ALLOCATED:
+        return
+    cursor.execute('SELECT capacity, occupied_count FROM rooms WHERE room_number = ?',
+                   (room_number,))
+    row = cursor.fetchone()
+    if row:
+        get_vacancy_index().set_room(room_number, row[0], row[1])
+    else:
+        get_vacancy_index().remove_room(room_number)
+
+def claim_bed(cursor, aadhaar_number, room_number, current_room=None):
+    """
+    Move a student into a room if it has a free bed (single conditional UPDATE)
+    
+    The students_room_* triggers move the bed between the rooms'
+    occupied_count counters, so only the student row is written here.
+    
+    Args:
+        cursor: Cursor of a connection inside a write transaction
+        aadhaar_number: Student to move
+        room_number: Room to move them into
+        current_room: Room the student is leaving, if known
+        
+    Returns:
+        True if the bed was claimed, False if the room is full or missing
+    """
+    cursor.execute('''
+        UPDATE students SET room_allocation = ?
+        WHERE aadhaar_number = ?
+          AND EXISTS (SELECT 1 FROM rooms
+                      WHERE room_number = ? AND occupied_count < capacity)
+    ''', (room_number, aadhaar_number, room_number))
+    claimed = cursor.rowcount == 1
+    # On failure the index was stale for this room; correct it either way
+    sync_room_index(cursor, room_number)
+    if claimed:
+        sync_room_index(cursor, current_room)
+    return claimed
+
+def claim_any_bed(cursor, aadhaar_number, current_room=None):
+    """
+    Move a student into the first room that has space
+    
+    Must run inside a write transaction. Candidates come from the in-memory
+    vacancy index when it is loaded; otherwise the idx_rooms_vacant partial
+    index is queried, so the cost never grows with the number of full rooms.
+    
+    Returns:
+        Room number, or None if every room is full
+    """
+    index = get_vacancy_index()
+    if index.is_fresh():
+        for _ in range(MAX_CLAIM_ATTEMPTS):
+            candidates = index.candidates(limit=1)
+            if not candidates:
+                break
+            if claim_bed(cursor, aadhaar_number, candidates[0], current_room):
+                return candidates[0]
+            # Filled by another process since the index was built
+            _record_metric('conflicts')
+    
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        cursor.execute('''
+            SELECT room_number FROM rooms
+            WHERE occupied_count < capacity
+            ORDER BY room_number
+            LIMIT 1
+        ''')
+        room = cursor.fetchone()
+        if not room:
+            return None
+        if claim_bed(cursor, aadhaar_number, room[0], current_room):
+            return room[0]
+        # Another writer filled the room between SELECT and UPDATE
+        _record_metric('conflicts')
+    return None
+
 def allocate_room_to_student(aadhaar_number):
     """
     Automatically allocate an available room to a student
     
+    The bed is claimed and the student updated in one IMMEDIATE transaction,
+    so concurrent admissions can never overfill a room.
+    
     Args:
         aadhaar_number: Student's Aadhaar number
         
     Returns:
         Tuple (success: bool, room_number: str or None, message: str)
     """
+    started = time.perf_counter()
     try:
+        # Rebuild outside the write lock if the index has expired
+        get_vacancy_index().ensure_fresh()
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Find an available room (compute occupancy dynamically)
-        cursor.execute('''
-            SELECT r.room_number, r.capacity, COUNT(s.aadhaar_number) as occupied
-            FROM rooms r
-            LEFT JOIN students s ON s.room_allocation = r.room_number
-            GROUP BY r.room_number, r.capacity
-            HAVING occupied < r.capacity
-            LIMIT 1
-        ''')
-
-        room = cursor.fetchone()
-        
-        if not room:
+        try:
+            cursor = conn.cursor()
+            
+            # Return from inside the block: the connection must not go back
+            # to the pool before the transaction has ended
+            with _allocation_transaction(conn):
+                cursor.execute('SELECT room_allocation FROM students WHERE aadhaar_number = ?',
+                               (aadhaar_number,))
+                student = cursor.fetchone()
+                if not student:
+                    return False, None, "Student not found"
+                
+                # Moving an already allocated student frees their old bed
+                room_number = claim_any_bed(cursor, aadhaar_number, student[0])
+                if room_number is None:
+                    _record_metric('no_vacancy')
+                    return False, None, "No available rooms"
+        finally:
             conn.close()
-            return False, None, "No available rooms"
-        
-        room_number = room[0]
-        
-        # Update student record with allocated room
-        cursor.execute('''
-            UPDATE students SET room_allocation = ?
-            WHERE aadhaar_number = ?
-        ''', (room_number, aadhaar_number))
         
-        conn.commit()
-        conn.close()
+        invalidate_dashboard_cache()
+        _record_metric('allocations', started)
         
         return True, room_number, f"Student allocated to room {room_number}"
         
     except Exception as e:
+        _record_metric('errors')
         return False, None, f"Error: {str(e)}"
 
+def allocate_rooms_in_transaction(cursor, aadhaar_numbers):
+    """
+    Give each student a bed, filling rooms in order
+    
+    For callers that already hold a write transaction (e.g. bulk import);
+    students are assumed to be unallocated.
+    
+    Args:
+        cursor: Cursor of a connection inside a write transaction
+        aadhaar_numbers: Students to place
+        
+    Returns:
+        List of (room_number, aadhaar_number) assignments made
+    """
+    assignments = []
+    for aadhaar_number in aadhaar_numbers:
+        room_number = claim_any_bed(cursor, aadhaar_number)
+        if room_number is None:
+            _record_metric('no_vacancy')
+            break
+        assignments.append((room_number, aadhaar_number))
+    
+    with _metrics_lock:
+        _metrics['allocations'] += len(assignments)
+    return assignments
+
 
 def vacate_student(aadhaar_number):
     """Vacate a student from their current room allocation."""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Find current allocation
-        cursor.execute('SELECT room_allocation FROM students WHERE aadhaar_number = ?', (aadhaar_number,))
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return False, 'Student not found', None
-
-        current = row[0]
-        if not current or current == 'Not Allocated':
+        try:
+            cursor = conn.cursor()
+
+            with _allocation_transaction(conn):
+                # Find current allocation
+                cursor.execute('SELECT room_allocation FROM students WHERE aadhaar_number = ?', (aadhaar_number,))
+                row = cursor.fetchone()
+                if not row:
+                    return False, 'Student not found', None
+
+                current = row[0]
+                if not current or current == NOT_ALLOCATED:
+                    return False, 'Student is not allocated to any room', None
+
+                # Set to Not Allocated; the update trigger frees the bed
+                cursor.execute('UPDATE students SET room_allocation = ? WHERE aadhaar_number = ?', (NOT_ALLOCATED, aadhaar_number))
+                sync_room_index(cursor, current)
+        finally:
             conn.close()
-            return False, 'Student is not allocated to any room', None
 
-        # Set to Not Allocated
-        cursor.execute('UPDATE students SET room_allocation = ? WHERE aadhaar_number = ?', ('Not Allocated', aadhaar_number))
-        conn.commit()
-        conn.close()
+        invalidate_dashboard_cache()
 
         return True, f'Student vacated from room {current}', current
 
@@ -214,80 +364,129 @@ def vacate_student(aadhaar_number):
 
 def assign_student_to_room(aadhaar_number, room_number):
     """Assign or move a student into a specific room, respecting capacity."""
+    started = time.perf_counter()
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Verify room exists and get capacity
-        cursor.execute('SELECT capacity FROM rooms WHERE room_number = ?', (room_number,))
-        room = cursor.fetchone()
-        if not room:
+        try:
+            cursor = conn.cursor()
+
+            with _allocation_transaction(conn):
+                cursor.execute('SELECT room_allocation FROM students WHERE aadhaar_number = ?', (aadhaar_number,))
+                student = cursor.fetchone()
+                if not student:
+                    return False, 'Student not found'
+
+                if student[0] == room_number:
+                    return True, f'Student is already in room {room_number}'
+
+                # Claim the bed with a conditional update (no separate COUNT)
+                if not claim_bed(cursor, aadhaar_number, room_number, student[0]):
+                    if not get_room(room_number, cursor):
+                        return False, 'Room not found'
+                    _record_metric('no_vacancy')
+                    return False, 'Room is full'
+        finally:
             conn.close()
-            return False, 'Room not found'
-
-        capacity = int(room[0])
 
-        # Count current occupants
-        cursor.execute('SELECT COUNT(*) FROM students WHERE room_allocation = ?', (room_number,))
-        occupied = cursor.fetchone()[0]
-
-        if occupied >= capacity:
-            conn.close()
-            return False, 'Room is full'
-
-        # Assign student
-        cursor.execute('UPDATE students SET room_allocation = ? WHERE aadhaar_number = ?', (room_number, aadhaar_number))
-        conn.commit()
-        conn.close()
+        invalidate_dashboard_cache()
+        _record_metric('allocations', started)
 
         return True, f'Student assigned to room {room_number}'
 
     except Exception as e:
+        _record_metric('errors')
         return False, f'Error: {str(e)}'
 
 def get_room_statistics():
     """Get room statistics"""
-    rooms = get_all_rooms()
-    
-    total_rooms = len(rooms)
-    total_capacity = sum(r['capacity'] for r in rooms)
-    occupied_count = sum(r['occupied_count'] for r in rooms)
-    vacant_count = total_capacity - occupied_count
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT COUNT(*),
+               COALESCE(SUM(capacity), 0),
+               COALESCE(SUM(occupied_count), 0),
+               COALESCE(SUM(CASE WHEN occupied_count > 0 THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN occupied_count < capacity THEN 1 ELSE 0 END), 0)
+        FROM rooms
+    ''')
+    total_rooms, total_capacity, occupied_count, occupied_rooms, vacant_rooms = cursor.fetchone()
+    conn.close()
     
     return {
         'total_rooms': total_rooms,
         'total_capacity': total_capacity,
-        'occupied_rooms': sum(1 for r in rooms if r['occupied_count'] > 0),
-        'vacant_rooms': sum(1 for r in rooms if r['occupied_count'] < r['capacity']),
+        'occupied_rooms': occupied_rooms,
+        'vacant_rooms': vacant_rooms,
         'total_occupied': occupied_count,
-        'total_vacant': vacant_count
+        'total_vacant': total_capacity - occupied_count
     }
 
-def update_room_capacity_for_all(new_capacity):
+def repair_occupancy_counters():
+    """
+    Rebuild rooms.occupied_count from students.room_allocation
+    
+    The triggers keep the counters correct for every write made through
+    SQLite; this repairs drift from edits made with the triggers dropped or
+    from before they existed.
+    
+    Returns:
+        Tuple (success: bool, message: str, repaired: list of room dictionaries)
+    """
+    try:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            
+            with _allocation_transaction(conn):
+                cursor.execute('''
+                    SELECT r.room_number, r.occupied_count, COUNT(s.aadhaar_number)
+                    FROM rooms r
+                    LEFT JOIN students s ON s.room_allocation = r.room_number
+                    GROUP BY r.room_number, r.occupied_count
+                    HAVING r.occupied_count IS NOT COUNT(s.aadhaar_number)
+                ''')
+                repaired = [{'room_number': room_number, 'was': was, 'now': now}
+                            for room_number, was, now in cursor.fetchall()]
+                cursor.executemany('UPDATE rooms SET occupied_count = ? WHERE room_number = ?',
+                                   [(room['now'], room['room_number']) for room in repaired])
+        finally:
+            conn.close()
+        
+        invalidate_vacancy_index()
+        if repaired:
+            invalidate_dashboard_cache()
+        
+        return True, f"Repaired occupancy counters for {len(repaired)} room(s)", repaired
+        
+    except Exception as e:
+        return False, f"Error: {str(e)}", []
+
+def update_room_capacity_for_all(new_capacity, rehome=False, policy='pack'):
     """
     Update room capacity for all existing rooms
     
+    Refused if a room would end up over capacity, unless rehome is set, in
+    which case the overflow students are moved to other rooms (see
+    capacity_planner.apply_capacity_change).
+    
     Args:
         new_capacity: New capacity value
+        rehome: Move students out of rooms that would overflow
+        policy: Allocation policy used for re-homing
         
     Returns:
         Tuple (success: bool, message: str)
     """
+    success, result, message = apply_capacity_change([('*', new_capacity)], rehome, policy)
+    if not success:
+        return False, message
+    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Update all rooms
-        cursor.execute('UPDATE rooms SET capacity = ?', (new_capacity,))
-        
-        # Update setting
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                      ('room_capacity', str(new_capacity)))
-        
-        conn.commit()
-        conn.close()
+        # New rooms are created with this capacity
+        save_settings({'room_capacity': new_capacity})
         
-        return True, f"Room capacity updated to {new_capacity} for all rooms"
+        moved = f" ({len(result['moves'])} student(s) moved)" if result['moves'] else ''
+        return True, f"Room capacity updated to {new_capacity} for all rooms{moved}"
         
     except Exception as e:
         return False, f"Error: {str(e)}"
@@ -0,0 +1,175 @@
+"""
+Application settings for Hostel Manager
+Typed access to the settings table, served from an in-process cache
+"""
+
+import threading
+import time
+
+import config
+from app.database.connection import get_db_connection, write_transaction
+from app.utils.table_versions import get_table_versions
+
+
+def _port(value):
+    if not 1 <= value <= 65535:
+        raise ValueError("must be between 1 and 65535")
+
+
+def _positive(value):
+    if value < 1:
+        raise ValueError("must be at least 1")
+
+
+# key -> (type, default, extra check or None)
+SETTINGS = {
+    'room_capacity': (int, getattr(config, 'DEFAULT_ROOM_CAPACITY', 2), _positive),
+    'email_sender': (str, '', None),
+    'email_password': (str, '', None),
+    'smtp_server': (str, getattr(config, 'SMTP_SERVER', 'smtp.gmail.com'), None),
+    'smtp_port': (int, getattr(config, 'SMTP_PORT', 587), _port),
+}
+
+
+def coerce_setting(key, value):
+    """
+    Convert and validate a value for a setting
+
+    Args:
+        key: Name from SETTINGS
+        value: Raw value (stored text or user input)
+
+    Returns:
+        The value as the setting's type
+
+    Raises:
+        ValueError for an unknown key or invalid value
+    """
+    if key not in SETTINGS:
+        raise ValueError(f"Unknown setting: {key}")
+    kind, _, check = SETTINGS[key]
+    try:
+        converted = kind(value.strip() if isinstance(value, str) and kind is not str else value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {key}: {value!r} is not a valid {kind.__name__}")
+    if check is not None:
+        try:
+            check(converted)
+        except ValueError as e:
+            raise ValueError(f"Invalid {key}: {e}")
+    return converted
+
+
+class SettingsCache:
+    """
+    All settings, typed, loaded in one query
+
+    Writes from this process refresh the cache at once. Writes from other
+    processes bump the settings row in table_versions; the cache compares
+    that counter at most every SETTINGS_RECHECK_SECONDS and reloads when it
+    moved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def load(self):
+        """Read every setting from the database, replacing the cache"""
+        version = get_table_versions(('settings',))['settings']
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('SELECT key, value FROM settings').fetchall()
+        finally:
+            conn.close()
+
+        stored = dict(rows)
+        values = {}
+        for key, (_, default, _) in SETTINGS.items():
+            try:
+                values[key] = coerce_setting(key, stored[key]) if key in stored else default
+            except ValueError:
+                # A hand-edited bad value must not take the app down
+                values[key] = default
+        with self._lock:
+            self._values = values
+            self._version = version
+            self._checked_at = time.monotonic()
+        return values
+
+    def _current(self):
+        interval = getattr(config, 'SETTINGS_RECHECK_SECONDS', 2)
+        with self._lock:
+            values, version, checked_at = self._values, self._version, self._checked_at
+        if values is None:
+            return self.load()
+        if time.monotonic() - checked_at >= interval:
+            if get_table_versions(('settings',))['settings'] != version:
+                return self.load()
+            with self._lock:
+                self._checked_at = time.monotonic()
+        return values
+
+    def get(self, key):
+        if key not in SETTINGS:
+            raise ValueError(f"Unknown setting: {key}")
+        return self._current()[key]
+
+    def get_many(self, keys=None):
+        values = self._current()
+        return {key: values[key] for key in (keys or SETTINGS)}
+
+
+_cache = SettingsCache()
+
+
+def load_settings():
+    """Fill the settings cache (called once at startup)"""
+    return _cache.load()
+
+
+def get_setting(key):
+    """
+    Get one setting
+
+    Args:
+        key: Name from SETTINGS
+
+    Returns:
+        The typed value (its default if never saved)
+    """
+    return _cache.get(key)
+
+
+def get_settings(keys=None):
+    """Get several settings as a dictionary (default: all of them)"""
+    return _cache.get_many(keys)
+
+
+def save_settings(values):
+    """
+    Validate and store settings in one transaction, then refresh the cache
+
+    Args:
+        values: Dictionary of key -> value
+
+    Returns:
+        Dictionary of the stored, typed values
+
+    Raises:
+        ValueError if any key or value is invalid (nothing is written)
+    """
+    typed = {key: coerce_setting(key, value) for key, value in values.items()}
+
+    conn = get_db_connection()
+    try:
+        with write_transaction(conn):
+            conn.executemany('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                             [(key, str(value)) for key, value in typed.items()])
+    finally:
+        conn.close()
+
+    _cache.load()
+    return typed
@@ -0,0 +1,283 @@
+"""
+Bulk student import for Hostel Manager
+Streams CSV/XLSX files row by row and inserts students in chunked transactions
+"""
+
+import csv
+import io
+import os
+import sqlite3
+
+from app.database.connection import get_db_connection
+from app.database.models import Student, STUDENT_REQUIRED_FIELDS
+from app.utils.installment_manager import build_installment_rows, INSERT_INSTALLMENT_SQL
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+from app.utils.room_manager import allocate_rooms_in_transaction, claim_bed, NOT_ALLOCATED
+from app.utils.vacancy_index import get_vacancy_index, invalidate_vacancy_index
+from app.utils.job_queue import register_handler, PermanentJobError
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def normalize_header(name):
+    """Map a spreadsheet column header to a student field name"""
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def normalize_value(value):
+    """Convert a cell value to the string form the student table expects"""
+    if value is None:
+        return ''
+    # Spreadsheets store numbers such as mobile and Aadhaar as floats
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    return str(value).strip()
+
+
+def iter_csv_rows(stream):
+    """
+    Yield student dictionaries from a CSV file, one row at a time
+
+    Args:
+        stream: Binary or text file object whose first row is the header
+    """
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    fields = [normalize_header(h) for h in header]
+
+    for values in reader:
+        if not any(v.strip() for v in values):
+            continue
+        yield {field: normalize_value(value) for field, value in zip(fields, values)}
+
+
+def iter_xlsx_rows(stream):
+    """
+    Yield student dictionaries from the first sheet of an XLSX workbook
+
+    Requires the optional openpyxl package.
+
+    Args:
+        stream: Path or binary file object
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import requires the openpyxl package (pip install openpyxl)")
+
+    # read_only mode streams rows instead of loading the whole sheet
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        fields = [normalize_header(h) for h in header]
+
+        for values in rows:
+            if not any(v not in (None, '') for v in values):
+                continue
+            yield {field: normalize_value(value) for field, value in zip(fields, values)}
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(stream, filename):
+    """Pick the CSV or XLSX reader based on the file extension"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return iter_csv_rows(stream)
+    if extension in ('.xlsx', '.xlsm'):
+        return iter_xlsx_rows(stream)
+    raise ValueError("Unsupported file type. Upload a .csv or .xlsx file")
+
+
+def _validate_row(data):
+    """Apply the same checks as the Add Student form"""
+    missing = [f for f in STUDENT_REQUIRED_FIELDS if not data.get(f)]
+    if missing:
+        return False, f"Missing required fields: {', '.join(missing)}"
+
+    success, message = Student.validate_student_data(data)
+    if not success:
+        return False, message
+
+    try:
+        total_fee = float(data['total_fee'])
+        installment_count = int(data['installment_count'])
+        if installment_count <= 0:
+            return False, "installment_count must be at least 1"
+        build_installment_rows(data['aadhaar_number'], total_fee, installment_count,
+                               data['registration_date'])
+    except ValueError:
+        return False, "Invalid total_fee, installment_count or registration_date"
+
+    return True, "Valid"
+
+
+def _insert_chunk(cursor, chunk, errors):
+    """
+    Insert a chunk of (row_number, data) pairs and their installments
+
+    Tries one executemany for the whole chunk; if any row violates a
+    constraint, the chunk is rolled back to its savepoint and retried row by
+    row so only the offending rows are reported.
+
+    Returns:
+        List of (row_number, data) pairs that were inserted
+    """
+    cursor.execute('SAVEPOINT import_chunk')
+    try:
+        cursor.executemany(Student.INSERT_SQL, [Student.to_insert_row(d) for _, d in chunk])
+        cursor.executemany(INSERT_INSTALLMENT_SQL, [
+            row for _, d in chunk
+            for row in build_installment_rows(d['aadhaar_number'], float(d['total_fee']),
+                                              int(d['installment_count']),
+                                              d['registration_date'])
+        ])
+        cursor.execute('RELEASE SAVEPOINT import_chunk')
+        return list(chunk)
+    except sqlite3.IntegrityError:
+        cursor.execute('ROLLBACK TO SAVEPOINT import_chunk')
+        cursor.execute('RELEASE SAVEPOINT import_chunk')
+
+    inserted = []
+    for row_number, data in chunk:
+        cursor.execute('SAVEPOINT import_row')
+        try:
+            cursor.execute(Student.INSERT_SQL, Student.to_insert_row(data))
+            cursor.executemany(INSERT_INSTALLMENT_SQL, build_installment_rows(
+                data['aadhaar_number'], float(data['total_fee']),
+                int(data['installment_count']), data['registration_date']))
+            cursor.execute('RELEASE SAVEPOINT import_row')
+            inserted.append((row_number, data))
+        except sqlite3.IntegrityError as e:
+            cursor.execute('ROLLBACK TO SAVEPOINT import_row')
+            cursor.execute('RELEASE SAVEPOINT import_row')
+            errors.append({'row': row_number, 'aadhaar_number': data.get('aadhaar_number'),
+                           'message': f"Error: {str(e)}"})
+    return inserted
+
+
+def import_students(rows, chunk_size=DEFAULT_CHUNK_SIZE, allocate_rooms=True):
+    """
+    Import students from an iterable of dictionaries
+
+    Rows are validated with the same Aadhaar/mobile rules as the Add Student
+    form, inserted with their installments in chunked transactions, and
+    (optionally) given beds through the room allocation engine. Invalid rows are
+    reported and skipped; they never abort the rest of the batch.
+
+    Args:
+        rows: Iterable of student dictionaries (e.g. from iter_file_rows)
+        chunk_size: Number of students written per transaction
+        allocate_rooms: Whether to allocate a free room to each new student
+
+    Returns:
+        Dictionary with total, imported, failed, rooms_allocated and errors
+    """
+    report = {'total': 0, 'imported': 0, 'failed': 0, 'rooms_allocated': 0, 'errors': []}
+
+    if allocate_rooms:
+        get_vacancy_index().ensure_fresh()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    chunk = []
+    # Students are inserted unallocated and then claim the room named in the
+    # file like any other allocation, so a full room is never overfilled
+    requested_rooms = {}
+
+    def flush():
+        # Explicit BEGIN keeps the chunk's savepoints nested in one transaction;
+        # IMMEDIATE because beds are claimed against the live room counters
+        if not conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        inserted = _insert_chunk(cursor, chunk, report['errors'])
+        unplaced = []
+        placed = 0
+        for row_number, data in inserted:
+            room_number = requested_rooms.get(row_number)
+            if room_number and claim_bed(cursor, data['aadhaar_number'], room_number):
+                placed += 1
+            else:
+                # No room in the file, or the named room is full or missing
+                unplaced.append(data['aadhaar_number'])
+        if allocate_rooms and unplaced:
+            placed += len(allocate_rooms_in_transaction(cursor, unplaced))
+        conn.commit()
+        report['imported'] += len(inserted)
+        report['rooms_allocated'] += placed
+        requested_rooms.clear()
+        chunk.clear()
+
+    try:
+        # Row 1 is the header, so data rows start at 2 like in a spreadsheet
+        for row_number, data in enumerate(rows, start=2):
+            report['total'] += 1
+            requested = data.get('room_allocation')
+            data['room_allocation'] = NOT_ALLOCATED
+            valid, message = _validate_row(data)
+            if not valid:
+                report['errors'].append({'row': row_number,
+                                         'aadhaar_number': data.get('aadhaar_number'),
+                                         'message': message})
+                continue
+            if requested and requested != NOT_ALLOCATED:
+                requested_rooms[row_number] = requested
+            chunk.append((row_number, data))
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+            # Beds claimed in the failed chunk were reported to the index
+            invalidate_vacancy_index()
+        conn.close()
+        if report['imported']:
+            invalidate_dashboard_cache()
+
+    report['failed'] = len(report['errors'])
+    return report
+
+
+@register_handler('import_students')
+def import_students_job(payload, job):
+    """
+    Background job: import a previously uploaded file
+
+    Args:
+        payload: Dictionary with path, filename and allocate_rooms
+        job: JobContext used to report progress
+
+    Returns:
+        The import report
+    """
+    path = payload['path']
+    try:
+        with open(path, 'rb') as stream:
+            def rows():
+                for count, row in enumerate(iter_file_rows(stream, payload['filename']), 1):
+                    if count % DEFAULT_CHUNK_SIZE == 0:
+                        job.set_progress(count)
+                    yield row
+            try:
+                report = import_students(rows(), allocate_rooms=payload.get('allocate_rooms', True))
+            except ValueError as e:
+                raise PermanentJobError(str(e))
+        job.set_progress(report['total'], report['total'], force=True)
+        return report
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
@@ -0,0 +1,40 @@
+"""
+Table change counters for Hostel Manager
+Reads the per-table versions that triggers bump on every write
+"""
+
+from app.database.connection import get_db_connection
+from app.database.migrations import VERSIONED_TABLES
+
+
+def get_table_versions(tables=VERSIONED_TABLES):
+    """
+    Get the change counter and last change time of some tables
+
+    Every INSERT, UPDATE or DELETE on a versioned table increments its
+    version in the same transaction, so an unchanged version means the
+    table's contents are unchanged.
+
+    Args:
+        tables: Table names from VERSIONED_TABLES
+
+    Returns:
+        Dictionary of table name -> (version, changed_at unix seconds)
+
+    Raises:
+        ValueError for a table that is not versioned
+    """
+    unknown = [t for t in tables if t not in VERSIONED_TABLES]
+    if unknown:
+        raise ValueError(f"Not a versioned table: {', '.join(unknown)}")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT table_name, version, changed_at FROM table_versions
+        WHERE table_name IN ({','.join('?' * len(tables))})
+    ''', list(tables))
+    versions = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    conn.close()
+
+    return {table: versions.get(table, (0, 0)) for table in tables}
@@ -0,0 +1,222 @@
+"""
+In-memory room vacancy index for Hostel Manager
+Keeps free-bed counts per room so allocation and room pickers skip the SQL aggregate
+"""
+
+import bisect
+import threading
+import time
+
+import config
+from app.database.connection import get_pool
+
+
+class VacancyIndex:
+    """
+    Free beds per room, with the vacant rooms kept in sorted order
+
+    Two sorted lists are maintained with bisect:
+      - room numbers with at least one free bed (fill rooms in order)
+      - (-free_beds, room_number) pairs (emptiest room first)
+
+    The index is only a hint. Beds are still claimed with a conditional
+    UPDATE, so a stale entry costs a retry, never an overfilled room.
+    Writers report the counts they just wrote (inside their transaction, so
+    updates arrive in commit order); anything else calls invalidate().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}
+        self._vacant = []
+        self._by_free = []
+        self._loaded_at = None
+
+    def _discard(self, room_number):
+        room = self._rooms.pop(room_number, None)
+        if room is None:
+            return
+        capacity, occupied = room
+        if occupied < capacity:
+            i = bisect.bisect_left(self._vacant, room_number)
+            if i < len(self._vacant) and self._vacant[i] == room_number:
+                del self._vacant[i]
+            key = (occupied - capacity, room_number)
+            i = bisect.bisect_left(self._by_free, key)
+            if i < len(self._by_free) and self._by_free[i] == key:
+                del self._by_free[i]
+
+    def _store(self, room_number, capacity, occupied):
+        self._rooms[room_number] = (capacity, occupied)
+        if occupied < capacity:
+            bisect.insort(self._vacant, room_number)
+            bisect.insort(self._by_free, (occupied - capacity, room_number))
+
+    def rebuild(self):
+        """Reload every room from the rooms table"""
+        conn = get_pool().acquire()
+        try:
+            rows = conn.execute('''
+                SELECT room_number, capacity, occupied_count FROM rooms
+                ORDER BY room_number
+            ''').fetchall()
+        finally:
+            conn.close()
+
+        rooms = {}
+        vacant = []
+        by_free = []
+        for room_number, capacity, occupied in rows:
+            capacity = int(capacity or 0)
+            occupied = int(occupied or 0)
+            rooms[room_number] = (capacity, occupied)
+            if occupied < capacity:
+                vacant.append(room_number)
+                by_free.append((occupied - capacity, room_number))
+        by_free.sort()
+
+        with self._lock:
+            self._rooms = rooms
+            self._vacant = vacant
+            self._by_free = by_free
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Force a rebuild on next use"""
+        with self._lock:
+            self._loaded_at = None
+
+    def is_fresh(self):
+        """
+        Check whether the index may be used without rebuilding
+
+        Expires after VACANCY_INDEX_TTL seconds so allocations made by other
+        processes are picked up.
+        """
+        ttl = getattr(config, 'VACANCY_INDEX_TTL', 60)
+        with self._lock:
+            return (self._loaded_at is not None
+                    and time.monotonic() - self._loaded_at < ttl)
+
+    def ensure_fresh(self):
+        """Rebuild the index if it was invalidated or has expired"""
+        if not self.is_fresh():
+            self.rebuild()
+
+    def set_room(self, room_number, capacity, occupied):
+        """Record the current capacity and occupancy of one room"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._discard(room_number)
+            self._store(room_number, int(capacity or 0), int(occupied or 0))
+
+    def remove_room(self, room_number):
+        """Forget a deleted room"""
+        with self._lock:
+            self._discard(room_number)
+
+    def candidates(self, emptiest_first=False, limit=None):
+        """
+        Get vacant room numbers in allocation order
+
+        Args:
+            emptiest_first: Order by most free beds instead of room number
+            limit: Maximum number of rooms to return
+
+        Returns:
+            List of room numbers (empty if the index is not loaded)
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return []
+            if emptiest_first:
+                rooms = [room for _, room in self._by_free[:limit]]
+            else:
+                rooms = self._vacant[:limit]
+        return list(rooms)
+
+    def vacant_rooms(self):
+        """Get room dictionaries for every room with a free bed, in room order"""
+        self.ensure_fresh()
+        with self._lock:
+            result = []
+            for room_number in self._vacant:
+                capacity, occupied = self._rooms[room_number]
+                result.append({'room_number': room_number,
+                               'capacity': capacity,
+                               'occupied_count': occupied,
+                               'vacant_count': capacity - occupied})
+        return result
+
+    def stats(self):
+        """Get index size and age"""
+        with self._lock:
+            loaded_at = self._loaded_at
+            return {
+                'loaded': loaded_at is not None,
+                'age_seconds': round(time.monotonic() - loaded_at, 1) if loaded_at else None,
+                'rooms': len(self._rooms),
+                'vacant_rooms': len(self._vacant),
+                'free_beds': -sum(free for free, _ in self._by_free)
+            }
+
+    def check(self):
+        """
+        Compare the index with the database
+
+        Occupancy is recounted from students.room_allocation, so this also
+        catches rooms.occupied_count drifting from the real allocations.
+
+        Returns:
+            Dictionary with consistent flag, rooms_checked and a list of mismatches
+        """
+        conn = get_pool().acquire()
+        try:
+            rows = conn.execute('''
+                SELECT r.room_number, r.capacity, r.occupied_count,
+                       COUNT(s.aadhaar_number) AS allocated
+                FROM rooms r
+                LEFT JOIN students s ON s.room_allocation = r.room_number
+                GROUP BY r.room_number, r.capacity, r.occupied_count
+            ''').fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            indexed = dict(self._rooms)
+            loaded = self._loaded_at is not None
+
+        mismatches = []
+        for room_number, capacity, occupied_count, allocated in rows:
+            entry = indexed.pop(room_number, None)
+            expected = (int(capacity or 0), allocated)
+            if (loaded and entry != expected) or (occupied_count or 0) != allocated:
+                mismatches.append({'room_number': room_number,
+                                   'capacity': capacity,
+                                   'allocated': allocated,
+                                   'occupied_count': occupied_count,
+                                   'indexed': list(entry) if entry else None})
+        if loaded:
+            for room_number, entry in indexed.items():
+                mismatches.append({'room_number': room_number, 'capacity': None,
+                                   'allocated': None, 'occupied_count': None,
+                                   'indexed': list(entry)})
+
+        return {'consistent': not mismatches,
+                'loaded': loaded,
+                'rooms_checked': len(rows),
+                'mismatches': mismatches}
+
+
+_index = VacancyIndex()
+
+
+def get_vacancy_index():
+    """Get the process-wide vacancy index"""
+    return _index
+
+
+def invalidate_vacancy_index():
+    """Drop the vacancy index; call after bulk room or allocation changes"""
+    _index.invalidate()
@@ -0,0 +1,4 @@
+"""
+Benchmarks for Hostel Manager
+Seeded synthetic data, micro/macro suites and JSON results (see python -m benchmarks --help)
+"""
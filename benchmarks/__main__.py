@@ -0,0 +1,176 @@
+"""
+Benchmark commands for Hostel Manager
+
+Usage:
+    python -m benchmarks generate [--students N] [--rooms N] [--installments N] [--seed N]
+    python -m benchmarks run [--suite micro|macro|all] [--rounds N] [--output results.json]
+    python -m benchmarks compare base.json new.json [--threshold PCT]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+import app.database.connection as connection  # noqa: E402
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench.db')
+
+
+def _metadata_path(database):
+    return database + '.json'
+
+
+def generate_command(args):
+    """Build a fresh synthetic database"""
+    from benchmarks.datagen import generate_dataset
+
+    if os.path.exists(args.database):
+        if not args.force:
+            print(f"✗ {args.database} already exists (use --force to replace it)")
+            return 1
+        for suffix in ('', '-wal', '-shm', '.json'):
+            if os.path.exists(args.database + suffix):
+                os.remove(args.database + suffix)
+
+    connection.DATABASE_PATH = args.database
+
+    def progress(stage, done, total):
+        print(f"\r   {stage}: {done}/{total}", end='', flush=True)
+
+    print(f"🏗  Generating {args.students} students, {args.rooms} rooms, "
+          f"{args.installments} installments (seed {args.seed})")
+    metadata = generate_dataset(
+        seed=args.seed, students=args.students, rooms=args.rooms,
+        installments=args.installments, colleges=args.colleges, capacity=args.capacity,
+        batch_size=args.batch_size,
+        as_of=date.fromisoformat(args.as_of) if args.as_of else None,
+        progress=progress
+    )
+    print()
+    connection.get_pool().close_all()
+
+    with open(_metadata_path(args.database), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    for stage, seconds in metadata['timings'].items():
+        print(f"   {stage:<28} {seconds:8.2f} s")
+    print(f"✓ Wrote {args.database} ({metadata['counts']})")
+    return 0
+
+
+def run_command(args):
+    """Run the suites against a scratch copy of the generated database"""
+    from benchmarks.harness import BenchmarkSession, write_results
+    from benchmarks.suites import run_macro, run_micro
+
+    if not os.path.exists(args.database):
+        print(f"✗ {args.database} not found; run 'python -m benchmarks generate' first")
+        return 1
+
+    dataset = {'database': os.path.abspath(args.database)}
+    if os.path.exists(_metadata_path(args.database)):
+        with open(_metadata_path(args.database), encoding='utf-8') as f:
+            dataset.update(json.load(f))
+
+    # Allocation writes to the database; keep the generated file pristine
+    scratch = tempfile.mkdtemp(prefix='hostel-bench-')
+    copy = os.path.join(scratch, 'bench.db')
+    source = sqlite3.connect(args.database)
+    target = sqlite3.connect(copy)
+    source.backup(target)
+    source.close()
+    target.close()
+
+    connection.DATABASE_PATH = copy
+    config.JOB_WORKERS = 0
+    session = BenchmarkSession(rounds=args.rounds, warmup=args.warmup)
+    try:
+        if args.suite in ('micro', 'all'):
+            run_micro(session)
+        if args.suite in ('macro', 'all'):
+            from app import create_app
+            run_macro(session, create_app())
+    finally:
+        connection.get_pool().close_all()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    write_results(args.output, session, dataset)
+    print(f"\n✓ Results written to {args.output}")
+    return 0
+
+
+def compare_command(args):
+    """Show how median times changed between two result files"""
+    from benchmarks.harness import compare_results
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    rows = compare_results(base, new, args.threshold)
+    print(f"{'benchmark':<44} {'base ms':>10} {'new ms':>10} {'change':>8}")
+    for row in rows:
+        base_ms = f"{row['base'] * 1000:.2f}" if row['base'] is not None else '-'
+        change = f"{row['change_pct']:+.1f}%" if row['change_pct'] is not None else 'new'
+        marker = {'slower': ' ⚠', 'faster': ' ✓'}.get(row['verdict'], '')
+        print(f"{row['name']:<44} {base_ms:>10} {row['new'] * 1000:>10.2f} {change:>8}{marker}")
+
+    regressions = [row for row in rows if row['verdict'] == 'slower']
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+def build_parser():
+    """Build the argument parser with one sub-command per task"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Hostel Manager benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('generate', help='Build a synthetic benchmark database')
+    cmd.add_argument('--database', default=DEFAULT_DATABASE)
+    cmd.add_argument('--seed', type=int, default=42)
+    cmd.add_argument('--students', type=int, default=100000)
+    cmd.add_argument('--rooms', type=int, default=5000)
+    cmd.add_argument('--installments', type=int, default=500000)
+    cmd.add_argument('--colleges', type=int, default=40)
+    cmd.add_argument('--capacity', type=int, default=2, help='Beds per room (default: 2)')
+    cmd.add_argument('--batch-size', type=int, default=5000,
+                     help='Students written per transaction (default: 5000)')
+    cmd.add_argument('--as-of', help='Reference date YYYY-MM-DD (default: today)')
+    cmd.add_argument('--force', action='store_true', help='Replace an existing database')
+    cmd.set_defaults(func=generate_command)
+
+    cmd = commands.add_parser('run', help='Run benchmark suites and save JSON results')
+    cmd.add_argument('--database', default=DEFAULT_DATABASE)
+    cmd.add_argument('--suite', default='all', choices=('micro', 'macro', 'all'))
+    cmd.add_argument('--rounds', type=int, default=20)
+    cmd.add_argument('--warmup', type=int, default=2)
+    cmd.add_argument('--output', default='benchmark-results.json')
+    cmd.set_defaults(func=run_command)
+
+    cmd = commands.add_parser('compare', help='Compare two result files')
+    cmd.add_argument('base')
+    cmd.add_argument('new')
+    cmd.add_argument('--threshold', type=float, default=10.0,
+                     help='Median change (%%) reported as slower/faster (default: 10)')
+    cmd.add_argument('--fail-on-regression', action='store_true',
+                     help='Exit with status 1 if anything got slower')
+    cmd.set_defaults(func=compare_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Synthetic data generator for Hostel Manager benchmarks
+Fills a database with seeded, reproducible students, rooms and installments
+"""
+
+import random
+import time
+from datetime import date, timedelta
+
+from app.database.connection import get_db_connection, write_transaction, init_db
+from app.database.models import Student
+from app.utils.installment_manager import create_installment_schedules
+
+FIRST_NAMES = ('Aarav', 'Aditi', 'Amit', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kavya',
+               'Krishna', 'Meera', 'Neha', 'Nikhil', 'Pooja', 'Priya', 'Rahul', 'Ravi',
+               'Riya', 'Rohan', 'Sanjay', 'Shreya', 'Sneha', 'Tanvi', 'Varun', 'Vikram')
+LAST_NAMES = ('Agarwal', 'Bose', 'Chopra', 'Das', 'Gupta', 'Iyer', 'Jain', 'Kapoor',
+              'Kumar', 'Mehta', 'Nair', 'Patel', 'Rao', 'Reddy', 'Sharma', 'Singh',
+              'Verma', 'Yadav')
+CITIES = ('New Delhi', 'Mumbai', 'Bengaluru', 'Chennai', 'Kolkata', 'Pune', 'Jaipur',
+          'Lucknow', 'Hyderabad', 'Ahmedabad')
+FEES = (40000, 45000, 50000, 55000, 60000, 75000)
+
+DEFAULTS = {
+    'students': 100000,
+    'rooms': 5000,
+    'installments': 500000,
+    'colleges': 40,
+    'capacity': 2,
+    'allocated': 0.9,
+    'paid': 0.6,
+    'batch_size': 5000,
+}
+
+
+def _installment_counts(rng, students, installments):
+    """Spread an installment total over students (each gets 1-12)"""
+    mean = installments / max(students, 1)
+    low = max(1, int(mean) - 2)
+    high = min(12, max(low, int(mean) + 2))
+    counts = [rng.randint(low, high) for _ in range(students)]
+
+    # Nudge random students until the total matches
+    difference = installments - sum(counts)
+    while difference:
+        i = rng.randrange(students)
+        step = 1 if difference > 0 else -1
+        if 1 <= counts[i] + step <= 12:
+            counts[i] += step
+            difference -= step
+    return counts
+
+
+def _student_rows(rng, students, colleges, as_of):
+    for i in range(students):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        registered = as_of - timedelta(days=rng.randint(0, 330))
+        yield {
+            'aadhaar_number': str(200000000000 + i),
+            'full_name': f'{first} {last}',
+            'date_of_birth': (date(2002, 1, 1) + timedelta(days=rng.randint(0, 1460))).isoformat(),
+            'mobile_number': str(rng.randint(6000000000, 9999999999)),
+            'college_name': rng.choice(colleges),
+            'admission_number': f'ADM-{i:07d}',
+            'parent_names': f'Mr. {rng.choice(FIRST_NAMES)} {last}',
+            'gender': rng.choice(('Male', 'Female')),
+            'registration_date': registered.isoformat(),
+            'session_expiration_date': (registered + timedelta(days=365)).isoformat(),
+            'full_address': f'{rng.randint(1, 999)}, Sector {rng.randint(1, 60)}, '
+                            f'{rng.choice(CITIES)}',
+            'email': f'{first.lower()}.{last.lower()}{i}@example.com',
+            'emergency_contact': f'{rng.choice(FIRST_NAMES)} {last} - '
+                                 f'{rng.randint(6000000000, 9999999999)}',
+            'room_allocation': 'Not Allocated',
+            'total_fee': rng.choice(FEES),
+        }
+
+
+def generate_dataset(seed=42, students=None, rooms=None, installments=None, colleges=None,
+                     capacity=None, allocated=None, paid=None, batch_size=None, as_of=None,
+                     progress=None):
+    """
+    Fill the configured database with synthetic data
+
+    The same seed and sizes always give the same rows; dates are laid out
+    relative to `as_of` so the mix of overdue and upcoming installments
+    looks the same whenever the dataset is built.
+
+    Args:
+        seed: Random seed
+        students, rooms, installments: Row counts (see DEFAULTS)
+        colleges: Number of distinct colleges
+        capacity: Beds per room
+        allocated: Fraction of beds to fill
+        paid: Fraction of already-due installments marked paid
+        batch_size: Students written per transaction
+        as_of: Reference date (default: today)
+        progress: Optional callback(stage, done, total)
+
+    Returns:
+        Dictionary of the parameters used, row counts and timings
+    """
+    params = dict(DEFAULTS)
+    params.update({key: value for key, value in {
+        'students': students, 'rooms': rooms, 'installments': installments,
+        'colleges': colleges, 'capacity': capacity, 'allocated': allocated,
+        'paid': paid, 'batch_size': batch_size}.items() if value is not None})
+    as_of = as_of or date.today()
+    params['seed'] = seed
+    params['as_of'] = as_of.isoformat()
+
+    rng = random.Random(seed)
+    timings = {}
+    init_db()
+
+    started = time.perf_counter()
+    room_numbers = [f'B{i // 100 + 1:02d}-{i % 100 + 1:03d}' for i in range(params['rooms'])]
+    conn = get_db_connection()
+    with write_transaction(conn):
+        conn.executemany('INSERT INTO rooms (room_number, capacity, occupied_count) VALUES (?, ?, 0)',
+                         [(room, params['capacity']) for room in room_numbers])
+    conn.close()
+    timings['rooms'] = time.perf_counter() - started
+
+    # Fill beds room by room, in a shuffled student order
+    beds = [room for room in room_numbers for _ in range(params['capacity'])]
+    placed = min(int(len(beds) * params['allocated']), params['students'])
+    order = list(range(params['students']))
+    rng.shuffle(order)
+    allocation = dict(zip(order[:placed], beds[:placed]))
+
+    college_names = [f'College of {rng.choice(CITIES)} #{i + 1}' for i in range(params['colleges'])]
+    counts = _installment_counts(rng, params['students'], params['installments'])
+
+    started = time.perf_counter()
+    batch, schedules = [], []
+    written = 0
+    for i, student in enumerate(_student_rows(rng, params['students'], college_names, as_of)):
+        student['room_allocation'] = allocation.get(i, 'Not Allocated')
+        student['installment_count'] = counts[i]
+        batch.append(Student.to_insert_row(student))
+        schedules.append((student['aadhaar_number'], student['total_fee'], counts[i],
+                          student['registration_date']))
+        if len(batch) >= params['batch_size'] or i == params['students'] - 1:
+            conn = get_db_connection()
+            with write_transaction(conn):
+                conn.executemany(Student.INSERT_SQL, batch)
+            conn.close()
+            success, message = create_installment_schedules(schedules)
+            if not success:
+                raise RuntimeError(message)
+            written += len(batch)
+            batch, schedules = [], []
+            if progress:
+                progress('students', written, params['students'])
+    timings['students_and_installments'] = time.perf_counter() - started
+
+    # Pay a share of what has fallen due; hashing the id picks the same rows
+    # every time with a single UPDATE
+    started = time.perf_counter()
+    conn = get_db_connection()
+    with write_transaction(conn):
+        conn.execute('''
+            UPDATE installments
+            SET payment_status = 'Paid', amount_paid = amount, paid_date = due_date
+            WHERE due_date <= ? AND (id * 2654435761 + ?) % 1000 < ?
+        ''', (as_of.isoformat(), seed, int(params['paid'] * 1000)))
+    counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+              for table in ('students', 'rooms', 'installments')}
+    counts['allocated'] = conn.execute(
+        "SELECT COUNT(*) FROM students WHERE room_allocation != 'Not Allocated'").fetchone()[0]
+    counts['paid'] = conn.execute(
+        "SELECT COUNT(*) FROM installments WHERE payment_status = 'Paid'").fetchone()[0]
+    conn.commit()
+    conn.close()
+    timings['payments'] = time.perf_counter() - started
+
+    return {'params': params, 'counts': counts,
+            'timings': {stage: round(seconds, 3) for stage, seconds in timings.items()}}
@@ -0,0 +1,150 @@
+"""
+Timing harness for Hostel Manager benchmarks
+Runs callables for a number of rounds and reports pytest-benchmark style statistics
+"""
+
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+
+def summarize(times):
+    """
+    Get statistics for a list of round times
+
+    Args:
+        times: Round durations in seconds
+
+    Returns:
+        Dictionary with min, max, mean, stddev, median, iqr, ops and rounds
+    """
+    ordered = sorted(times)
+    quartiles = statistics.quantiles(ordered, n=4) if len(ordered) > 1 else [ordered[0]] * 3
+    mean = statistics.fmean(ordered)
+    return {
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': mean,
+        'stddev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'median': statistics.median(ordered),
+        'iqr': quartiles[2] - quartiles[0],
+        'ops': 1 / mean if mean else 0.0,
+        'rounds': len(ordered),
+    }
+
+
+class BenchmarkSession:
+    """
+    Collects benchmark results for one run
+
+    Each benchmark runs `warmup` untimed rounds, then `rounds` timed ones.
+    A setup callable runs before every round outside the timing and its
+    return value is passed to the benchmarked function (and to teardown).
+    """
+
+    def __init__(self, rounds=20, warmup=2):
+        self.rounds = rounds
+        self.warmup = warmup
+        self.results = []
+
+    def bench(self, name, group, fn, setup=None, teardown=None, rounds=None, **extra):
+        rounds = rounds or self.rounds
+        times = []
+        for i in range(self.warmup + rounds):
+            arg = setup() if setup else None
+            started = time.perf_counter()
+            fn(arg) if setup else fn()
+            elapsed = time.perf_counter() - started
+            if teardown:
+                teardown(arg)
+            if i >= self.warmup:
+                times.append(elapsed)
+
+        result = {'name': name, 'group': group, 'stats': summarize(times)}
+        if extra:
+            result['extra'] = extra
+        self.results.append(result)
+        print(f"   {name:<44} median {result['stats']['median'] * 1000:9.2f} ms  "
+              f"(min {result['stats']['min'] * 1000:.2f}, {rounds} rounds)")
+        return result
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                              ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def machine_info():
+    """Describe the code version and machine a run used"""
+    return {
+        'commit': _git('rev-parse', 'HEAD'),
+        'describe': _git('describe', '--always', '--dirty'),
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_results(path, session, dataset):
+    """
+    Save a run as JSON
+
+    Args:
+        path: Output file
+        session: BenchmarkSession that ran
+        dataset: Metadata of the dataset it ran against
+
+    Returns:
+        The saved document
+    """
+    document = {
+        'datetime': datetime.now().isoformat(timespec='seconds'),
+        'machine_info': machine_info(),
+        'dataset': dataset,
+        'benchmarks': session.results,
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    return document
+
+
+def compare_results(base, new, threshold=10.0):
+    """
+    Compare two saved runs benchmark by benchmark
+
+    Args:
+        base, new: Loaded result documents
+        threshold: Percentage change in median treated as a regression/improvement
+
+    Returns:
+        List of dictionaries (name, base, new, change_pct, verdict) in the new run's order
+    """
+    base_medians = {b['name']: b['stats']['median'] for b in base['benchmarks']}
+    rows = []
+    for benchmark in new['benchmarks']:
+        name = benchmark['name']
+        median = benchmark['stats']['median']
+        if name not in base_medians:
+            rows.append({'name': name, 'base': None, 'new': median, 'change_pct': None,
+                         'verdict': 'new'})
+            continue
+        change = (median - base_medians[name]) / base_medians[name] * 100 \
+            if base_medians[name] else 0.0
+        verdict = 'slower' if change > threshold else 'faster' if change < -threshold else 'same'
+        rows.append({'name': name, 'base': base_medians[name], 'new': median,
+                     'change_pct': round(change, 1), 'verdict': verdict})
+    return rows
@@ -0,0 +1,88 @@
+"""
+Benchmark suites for Hostel Manager
+Micro: model and utility functions called directly
+Macro: full page requests through the Flask test client
+"""
+
+import config
+from app.database.connection import get_db_connection
+from app.database.models import Student
+from app.utils.dashboard_stats import invalidate_dashboard_cache
+from app.utils.installment_manager import get_payment_statistics
+from app.utils.room_manager import allocate_room_to_student, get_all_rooms, vacate_student
+from app.utils.vacancy_index import get_vacancy_index
+
+SEARCH_QUERIES = (
+    ('name', 'Sharma'),
+    ('two_words', 'priya sh'),
+    ('admission', 'ADM-00012'),
+    ('aadhaar', '200000000123'),
+)
+
+MACRO_ROUTES = (
+    ('dashboard', '/'),
+    ('installments_pending', '/installments/pending'),
+    ('students_list', '/students/'),
+    ('students_list_by_name', '/students/?sort=full_name'),
+)
+
+
+def _unallocated_students(limit):
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT aadhaar_number FROM students
+        WHERE room_allocation = 'Not Allocated'
+        ORDER BY aadhaar_number LIMIT ?
+    ''', (limit,)).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+def run_micro(session):
+    """Time search, room listing, payment statistics and allocation"""
+    print("\n🔬 Micro benchmarks")
+    get_vacancy_index().rebuild()
+
+    for label, query in SEARCH_QUERIES:
+        session.bench(f'search_students[{label}]', 'search',
+                      lambda query=query: Student.search_students(query))
+
+    session.bench('get_all_rooms', 'rooms', get_all_rooms)
+    session.bench('get_payment_statistics', 'installments', get_payment_statistics)
+
+    # Each round places a different student and vacates them again
+    # afterwards, so the dataset is unchanged when the suite finishes
+    candidates = iter(_unallocated_students(session.warmup + session.rounds))
+
+    def allocate(aadhaar_number):
+        success, _, message = allocate_room_to_student(aadhaar_number)
+        if not success:
+            raise RuntimeError(f"Allocation failed: {message}")
+
+    session.bench('allocate_room_to_student', 'rooms', allocate,
+                  setup=lambda: next(candidates),
+                  teardown=vacate_student)
+
+
+def run_macro(session, app):
+    """Time page requests for the dashboard, pending installments and student list"""
+    print("\n🌐 Macro benchmarks")
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['admin_id'] = 1
+        flask_session['username'] = 'benchmark'
+
+    def get(path):
+        response = client.get(path)
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+
+    for label, path in MACRO_ROUTES:
+        session.bench(f'GET {path}', label, lambda _=None, path=path: get(path),
+                      route=path)
+
+    # The dashboard normally serves a cached snapshot; time a rebuild too
+    session.bench('GET / (cold cache)', 'dashboard', lambda _: get('/'),
+                  setup=invalidate_dashboard_cache, route='/',
+                  cache_ttl=getattr(config, 'DASHBOARD_CACHE_TTL', None))
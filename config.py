@@ -6,12 +6,61 @@ Customize settings here
 import os
 
 # Application Settings
-DEBUG = True  # Set to False in production
+# Werkzeug debugger and reloader for `python run.py`; never enable in production
+DEBUG = os.environ.get('HOSTEL_DEBUG', '').lower() in ('1', 'true', 'yes', 'on')
 SECRET_KEY = 'hostel-manager-secret-key-change-in-production'  # Change this!
 PERMANENT_SESSION_LIFETIME = 3600  # Session timeout in seconds (1 hour)
 
 # Database Settings
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'hostel_manager.db')
+DB_POOL_SIZE = 5  # Maximum number of pooled SQLite connections per process
+DB_POOL_TIMEOUT = 10.0  # Seconds to wait for a free connection before failing
+
+# SQLite pragmas applied once to every pooled connection.
+# WAL lets readers keep working while a writer commits; busy_timeout (ms)
+# makes writers wait for a lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',  # Safe with WAL, avoids an fsync per commit
+    'cache_size': -16000,  # Negative values are KiB (about 16 MB)
+    'mmap_size': 134217728,  # 128 MB memory-mapped I/O
+    'temp_store': 'MEMORY',
+}
+
+# Profiling Settings
+PROFILING_ENABLED = False  # Time requests and SQL; adds Server-Timing headers and /metrics
+PROFILING_SLOW_QUERY_MS = 100  # Statements slower than this are logged with their query plan
+PROFILING_SLOW_QUERY_COUNT = 10  # Slowest distinct statements listed on /settings/diagnostics
+METRICS_TOKEN = None  # Bearer token for /metrics scrapers; None means an admin login is required
+
+# Login Settings
+PASSWORD_HASHER = 'scrypt'  # 'scrypt', 'pbkdf2_sha256' or 'argon2' (needs argon2-cffi)
+PASSWORD_PBKDF2_ITERATIONS = 600000  # Cost of pbkdf2_sha256 hashes
+PASSWORD_SCRYPT_N = 16384  # scrypt cost (memory is 128 * N * R bytes)
+PASSWORD_SCRYPT_R = 8
+PASSWORD_SCRYPT_P = 1
+LOGIN_MAX_FAILURES = 5  # Failed logins per username within the window before locking
+LOGIN_MAX_FAILURES_PER_ADDRESS = 20  # Failed logins per client address within the window
+LOGIN_THROTTLE_WINDOW = 900  # Seconds failed logins are remembered
+LOGIN_MAX_CONCURRENT_HASHES = 2  # Password checks run at once per process
+LOGIN_HASH_WAIT = 5  # Seconds a login waits for a free hashing slot
+
+# Settings Cache
+SETTINGS_RECHECK_SECONDS = 2  # How often cached settings check for writes by other processes
+
+# Dashboard Settings
+DASHBOARD_CACHE_TTL = 30  # Seconds a cached dashboard snapshot may be served
+VACANCY_INDEX_TTL = 60  # Seconds before the in-memory room vacancy index is reloaded
+
+# Background Job Settings
+JOB_WORKERS = 2  # Worker threads per process (0 disables background processing)
+JOB_POLL_INTERVAL = 1.0  # Seconds an idle worker waits before checking for jobs
+JOB_MAX_ATTEMPTS = 3  # Attempts before a job is marked failed
+JOB_RETRY_BACKOFF = 5  # Seconds before the first retry; doubles on each attempt
+JOB_HEARTBEAT_SECONDS = 30  # How often a process marks its running jobs alive and sweeps for stale ones
+JOB_STALE_SECONDS = 120  # Running jobs with no heartbeat for this long are requeued
+UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')  # Files waiting for import
 
 # Application Settings
 APP_NAME = 'Hostel Manager'
@@ -22,10 +71,18 @@ DEFAULT_ROOM_CAPACITY = 2  # Number of students per room
 
 # Payment Settings
 DEFAULT_INSTALLMENTS = 2  # Default number of installments
+# True: installments fall due on the same day of each following month
+# False: every 30 days from the registration date (original behaviour)
+INSTALLMENT_CALENDAR_MONTHS = False
+AGING_JOB_TIME = '00:05'  # Local time (HH:MM) the nightly installment aging job runs
 
 # Email Settings (Override in application settings page)
 SMTP_SERVER = 'smtp.gmail.com'
 SMTP_PORT = 587
+SMTP_USE_TLS = True  # STARTTLS before LOGIN (disable only for a local test server)
+SMTP_TIMEOUT = 30  # Seconds before an SMTP connection attempt gives up
+SMTP_MAX_CONNECTIONS = 3  # Parallel SMTP sessions used for bulk reminders
+SMTP_MESSAGES_PER_SECOND = 5  # Sending rate limit per SMTP server (0 = unlimited)
 
 # Flask Settings
 SESSION_COOKIE_HTTPONLY = True
@@ -35,6 +92,8 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 # Server Settings
 HOST = 'localhost'
 PORT = 5000
+SERVER_WORKERS = 0  # Processes started by serve.py (0 = one per CPU core)
+SERVER_THREADS = 4  # Request threads per serve.py process
 
 # UI Settings
 ITEMS_PER_PAGE = 20
@@ -9,7 +9,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from app.database.models import Student
 from app.database.connection import get_db_connection, init_db
-from app.utils.installment_manager import create_installments
+from app.utils.installment_manager import create_installment_schedules
 from app.utils.room_manager import create_room, get_all_rooms
 
 def create_sample_students():
@@ -103,20 +103,24 @@ def create_sample_students():
     ]
     
     print("\n📝 Adding sample students...")
+    schedules = []
     for i, student in enumerate(sample_students, 1):
         success, message = Student.add_student(student)
         if success:
-            # Create installments for the student
-            aadhaar = student['aadhaar_number']
-            create_installments(
-                aadhaar,
+            # Queue the student's installment schedule for one batch insert
+            schedules.append((
+                student['aadhaar_number'],
                 student['total_fee'],
                 student['installment_count'],
                 student['registration_date']
-            )
+            ))
             print(f"   ✓ Student {i}: {student['full_name']} added successfully")
         else:
             print(f"   ✗ Student {i}: {message}")
+    
+    if schedules:
+        success, message = create_installment_schedules(schedules)
+        print(f"   {'✓' if success else '✗'} {message}")
 
 def main():
     """Main function"""
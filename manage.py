@@ -0,0 +1,318 @@
+"""
+Command-line maintenance tasks for Hostel Manager
+Run `python manage.py --help` to see the available commands
+"""
+
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database.connection import init_db
+from app.utils.room_allocator import POLICIES
+
+
+def import_students_command(args):
+    """Import students from a CSV or XLSX file"""
+    from app.utils.student_import import iter_file_rows, import_students
+
+    with open(args.path, 'rb') as stream:
+        rows = iter_file_rows(stream, args.path)
+        report = import_students(rows, chunk_size=args.chunk_size,
+                                 allocate_rooms=not args.no_rooms)
+
+    print(f"✓ Imported {report['imported']} of {report['total']} rows "
+          f"({report['rooms_allocated']} rooms allocated)")
+    for err in report['errors']:
+        print(f"   ✗ Row {err['row']} ({err['aadhaar_number'] or '-'}): {err['message']}")
+
+    return 1 if report['failed'] else 0
+
+
+def regenerate_installments_command(args):
+    """Rebuild installment schedules for a cohort of students"""
+    from app.database.connection import get_db_connection
+    from app.utils.installment_manager import create_installment_schedules
+
+    conditions = []
+    params = []
+    if args.registration_date:
+        conditions.append('registration_date = ?')
+        params.append(args.registration_date)
+    if args.college:
+        conditions.append('college_name = ?')
+        params.append(args.college)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT aadhaar_number, total_fee, installment_count, registration_date
+        FROM students {where}
+    ''', params)
+    schedules = cursor.fetchall()
+    conn.close()
+
+    success, message = create_installment_schedules(
+        schedules, calendar_months=args.calendar_months, replace=True)
+    print(f"{'✓' if success else '✗'} {message}")
+    return 0 if success else 1
+
+
+def allocate_rooms_command(args):
+    """Allocate rooms to every unallocated student in one pass"""
+    import json
+    from app.utils.room_allocator import allocate_batch
+
+    preferences = None
+    if args.preferences:
+        with open(args.preferences, encoding='utf-8') as f:
+            preferences = json.load(f)
+
+    success, result, message = allocate_batch(policy=args.policy, preferences=preferences,
+                                              dry_run=args.dry_run)
+    print(f"{'✓' if success else '✗'} {message}")
+    if not success:
+        return 1
+    if args.dry_run:
+        for item in result['plan'][:args.show]:
+            print(f"   {item['aadhaar_number']} → {item['room_number']}")
+        if len(result['plan']) > args.show:
+            print(f"   ... {len(result['plan']) - args.show} more")
+    if result['unplaced']:
+        print(f"   ⚠ {len(result['unplaced'])} students could not be placed (no free beds)")
+    return 0
+
+
+def benchmark_allocator_command(args):
+    """Time the batch planner on synthetic students and rooms"""
+    import random
+    import time
+    from app.utils.room_allocator import plan_allocation
+
+    rng = random.Random(args.seed)
+    colleges = [f'College {i}' for i in range(20)]
+    students = [{'aadhaar_number': str(100000000000 + i),
+                 'college_name': rng.choice(colleges),
+                 'gender': rng.choice(('Male', 'Female'))}
+                for i in range(args.students)]
+    rooms = []
+    for i in range(args.rooms):
+        occupied = rng.randint(0, args.capacity - 1) if rng.random() < 0.3 else 0
+        rooms.append({'room_number': f'R-{i:05d}', 'capacity': args.capacity,
+                      'occupied': occupied,
+                      'groups': {('college_name', rng.choice(colleges)),
+                                 ('gender', rng.choice(('Male', 'Female')))} if occupied else set()})
+
+    print(f"📊 {args.students} students × {args.rooms} rooms (capacity {args.capacity})")
+    for policy in POLICIES:
+        started = time.perf_counter()
+        plan, unplaced = plan_allocation(students, rooms, policy)
+        elapsed = time.perf_counter() - started
+        print(f"   {policy:<8} {elapsed * 1000:8.1f} ms  placed {len(plan)}, unplaced {len(unplaced)}")
+    return 0
+
+
+def repair_occupancy_command(args):
+    """Rebuild room occupancy counters from student allocations"""
+    from app.utils.room_manager import repair_occupancy_counters
+
+    success, message, repaired = repair_occupancy_counters()
+    print(f"{'✓' if success else '✗'} {message}")
+    for room in repaired:
+        print(f"   {room['room_number']}: {room['was']} → {room['now']}")
+    return 0 if success else 1
+
+
+def set_capacity_command(args):
+    """Change room capacities by pattern, previewing the impact first"""
+    from app.utils.capacity_planner import (
+        parse_capacity_rules, preview_capacity_change, apply_capacity_change
+    )
+
+    try:
+        rules = parse_capacity_rules('\n'.join(args.rule))
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+
+    success, impact, message = preview_capacity_change(rules)
+    print(f"{'📊' if success else '✗'} {message}")
+    if not success:
+        return 1
+    print(f"   Total capacity {impact['capacity_before']} → {impact['capacity_after']}, "
+          f"{impact['free_beds_after']} free beds afterwards")
+    for room in impact['overflow_rooms'][:args.show]:
+        print(f"   ⚠ {room['room_number']}: {room['occupied_count']} students, "
+              f"new capacity {room['new_capacity']}")
+    if args.dry_run:
+        return 0
+
+    success, result, message = apply_capacity_change(rules, rehome=args.rehome, policy=args.policy)
+    print(f"{'✓' if success else '✗'} {message}")
+    if success:
+        for move in result['moves'][:args.show]:
+            print(f"   {move['aadhaar_number']}: {move['from_room']} → {move['to_room']}")
+    return 0 if success else 1
+
+
+def rebuild_ledger_command(args):
+    """Recompute the payment ledger from installments"""
+    from app.utils.installment_manager import rebuild_ledger
+
+    success, message = rebuild_ledger()
+    print(f"{'✓' if success else '✗'} {message}")
+    return 0 if success else 1
+
+
+def rebuild_search_index_command(args):
+    """Rebuild the student full-text search index"""
+    from app.database.models import Student
+
+    success, message = Student.rebuild_search_index()
+    print(f"{'✓' if success else '✗'} {message}")
+    return 0 if success else 1
+
+
+def age_installments_command(args):
+    """Roll installment aging buckets forward and print the aging report"""
+    from app.utils.installment_manager import (
+        refresh_installment_aging, refresh_overdue_ledger, get_aging_report
+    )
+
+    updated = refresh_installment_aging(force=True)
+    refresh_overdue_ledger(force=True)
+    report = get_aging_report()
+    print(f"✓ Aged installments as of {report['as_of']} ({updated} changed bucket)")
+    for bucket in report['buckets']:
+        print(f"   {bucket['label']:<22} {bucket['count']:>7}  ₹{bucket['amount']:,.2f}")
+    return 0
+
+
+def post_payments_command(args):
+    """Post payments from a CSV/XLSX or JSON file"""
+    import io
+    import json
+    from app.utils.payment_posting import post_payments, upload_fingerprint
+    from app.utils.student_import import iter_file_rows
+
+    with open(args.path, 'rb') as stream:
+        content = stream.read()
+    if args.path.lower().endswith('.json'):
+        records = json.loads(content.decode('utf-8'))
+        if isinstance(records, dict):
+            records = records.get('payments', [])
+    else:
+        records = list(iter_file_rows(io.BytesIO(content), args.path))
+
+    success, report, message = post_payments(records, dry_run=args.dry_run,
+                                             source=upload_fingerprint(content))
+    print(f"{'✓' if success else '✗'} {message}")
+    if not success:
+        return 1
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as stream:
+            json.dump(report, stream, indent=2)
+        print(f"   Reconciliation report written to {args.report}")
+    for row in report['rows']:
+        if row['status'] not in ('applied', 'duplicate'):
+            print(f"   {row['status']:<9} row {row['row']} ({row['aadhaar_number'] or '-'}): "
+                  f"{row['message']}")
+    return 1 if report['rejected'] else 0
+
+
+def build_parser():
+    """Build the argument parser with one sub-command per task"""
+    parser = argparse.ArgumentParser(description='Hostel Manager maintenance commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('import-students', help='Bulk import students from CSV/XLSX')
+    cmd.add_argument('path', help='Path to a .csv or .xlsx file')
+    cmd.add_argument('--chunk-size', type=int, default=500,
+                     help='Students written per transaction (default: 500)')
+    cmd.add_argument('--no-rooms', action='store_true',
+                     help='Do not allocate rooms to imported students')
+    cmd.set_defaults(func=import_students_command)
+
+    cmd = commands.add_parser('regenerate-installments',
+                              help='Rebuild installment schedules for a cohort; students '
+                                   'with any payment recorded (full or partial) are skipped')
+    cmd.add_argument('--registration-date', help='Only students registered on this date')
+    cmd.add_argument('--college', help='Only students of this college')
+    mode = cmd.add_mutually_exclusive_group()
+    mode.add_argument('--calendar-months', dest='calendar_months', action='store_true',
+                      default=None, help='Due on the same day of each month')
+    mode.add_argument('--every-30-days', dest='calendar_months', action='store_false',
+                      help='Due every 30 days from registration')
+    cmd.set_defaults(func=regenerate_installments_command)
+
+    cmd = commands.add_parser('allocate-rooms',
+                              help='Allocate rooms to all unallocated students')
+    cmd.add_argument('--policy', default='pack', choices=sorted(POLICIES),
+                     help='Placement policy (default: pack). gender never mixes genders in '
+                          'a room; college also keeps each college together where possible. '
+                          'Students that fit nowhere without mixing are left unplaced')
+    cmd.add_argument('--preferences', help='JSON file mapping Aadhaar numbers to preferred rooms')
+    cmd.add_argument('--dry-run', action='store_true', help='Show the plan without saving it')
+    cmd.add_argument('--show', type=int, default=20, help='Plan lines to print in a dry run')
+    cmd.set_defaults(func=allocate_rooms_command)
+
+    cmd = commands.add_parser('repair-occupancy',
+                              help='Rebuild room occupancy counters from student allocations')
+    cmd.set_defaults(func=repair_occupancy_command)
+
+    cmd = commands.add_parser('set-capacity', help='Change room capacities by pattern')
+    cmd.add_argument('rule', nargs='+',
+                     help="Rule as 'pattern=capacity', e.g. 'A-1*=3' (first match wins)")
+    cmd.add_argument('--rehome', action='store_true',
+                     help='Move students out of rooms that would be over capacity')
+    cmd.add_argument('--policy', default='pack', choices=sorted(POLICIES),
+                     help='Placement policy for re-homed students (default: pack)')
+    cmd.add_argument('--dry-run', action='store_true', help='Only show the impact')
+    cmd.add_argument('--show', type=int, default=20, help='Rooms/moves to list')
+    cmd.set_defaults(func=set_capacity_command)
+
+    cmd = commands.add_parser('rebuild-ledger',
+                              help='Recompute per-student payment summaries and totals')
+    cmd.set_defaults(func=rebuild_ledger_command)
+
+    cmd = commands.add_parser('rebuild-search-index',
+                              help='Rebuild the student full-text search index (e.g. after VACUUM)')
+    cmd.set_defaults(func=rebuild_search_index_command)
+
+    cmd = commands.add_parser('post-payments',
+                              help='Apply received payments to installments from a file',
+                              description='Rows with an idempotency_key or reference are '
+                                          'applied once, ever. Rows without either are keyed '
+                                          'by the file contents and row number: posting the '
+                                          'same file again is a no-op, but the same payment '
+                                          'in a different file is applied again.')
+    cmd.add_argument('path', help='Path to a .csv, .xlsx or .json file of payments')
+    cmd.add_argument('--dry-run', action='store_true', help='Match payments without saving')
+    cmd.add_argument('--report', help='Write the full reconciliation report to this JSON file')
+    cmd.set_defaults(func=post_payments_command)
+
+    cmd = commands.add_parser('age-installments',
+                              help='Recompute installment aging buckets and show the report')
+    cmd.set_defaults(func=age_installments_command)
+
+    cmd = commands.add_parser('benchmark-allocator',
+                              help='Time the batch allocator on synthetic data')
+    cmd.add_argument('--students', type=int, default=10000)
+    cmd.add_argument('--rooms', type=int, default=2000)
+    cmd.add_argument('--capacity', type=int, default=5)
+    cmd.add_argument('--seed', type=int, default=42)
+    cmd.set_defaults(func=benchmark_allocator_command)
+
+    return parser
+
+
+def main(argv=None):
+    """Main function"""
+    args = build_parser().parse_args(argv)
+    init_db()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,16 +4,13 @@ Run this file to start the Flask server
 """
 
 import os
+import config
 from app import create_app
-from app.database.connection import init_db
 
-# Create Flask app
+# Create Flask app (this also initializes the database)
 app = create_app()
 
 if __name__ == '__main__':
-    # Initialize database and create tables
-    init_db()
-
     # Allow overriding host/port via environment variables for flexibility
     host = os.environ.get('HOST', '127.0.0.1')
     port = int(os.environ.get('PORT', os.environ.get('PYTHON_PORT', 5000)))
@@ -21,9 +18,9 @@ if __name__ == '__main__':
     print("=" * 60)
     print("🏨 Hostel Manager Application")
     print("=" * 60)
-    print("\n✓ Database initialized")
+    print(f"\n✓ Database initialized (started in {app.config['STARTUP_TIMINGS']['total'] * 1000:.0f} ms)")
 
-    # Start the Flask development server
+    # Start the Flask development server (use serve.py for production)
     print(f"\n🚀 Starting Hostel Manager server on http://{host}:{port} ...")
     print("\n⚠️  Press Ctrl+C to stop the server")
     print("\nInitial Setup:")
@@ -32,5 +29,5 @@ if __name__ == '__main__':
     print("3. Log in with your credentials")
     print("\n" + "=" * 60 + "\n")
 
-    # Run app (debug mode by default for development)
-    app.run(debug=True, host=host, port=port)
+    # Debug mode (reloader and debugger) is off unless HOSTEL_DEBUG=1
+    app.run(debug=config.DEBUG, host=host, port=port)
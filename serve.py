@@ -0,0 +1,207 @@
+"""
+Production launcher for Hostel Manager
+Pre-forks worker processes that share one listening socket, each serving
+requests from a fixed pool of threads
+
+Usage:
+    python serve.py [--workers N] [--threads N] [--host HOST] [--port PORT]
+
+The app is created (and the database initialised and migrated) once in the
+parent before forking, so workers start warm. Debug mode is always off.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer
+
+import config
+from app.database.connection import reset_pool
+
+
+class ThreadPoolWSGIServer(BaseWSGIServer):
+    """Werkzeug server that hands each connection to a fixed-size thread pool"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd=None):
+        super().__init__(host, port, app, fd=fd)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+# A worker that dies sooner than this after being forked is not restarted
+STARTUP_GRACE = 5
+
+
+def _raise_exit(signum, frame):
+    # Ctrl-C reaches the whole process group and the parent forwards SIGTERM
+    # too; only the first signal should interrupt, not the cleanup after it
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    raise SystemExit(0)
+
+
+def run_worker(app, listener, args, launched, index):
+    """Serve requests in this process until told to stop"""
+    from app import start_background_workers
+    from app.utils.job_queue import stop_workers
+
+    signal.signal(signal.SIGTERM, _raise_exit)
+    signal.signal(signal.SIGINT, _raise_exit)
+    start_background_workers()
+    server = ThreadPoolWSGIServer(args.host, args.port, app, args.threads,
+                                  fd=listener.fileno())
+    print(f"   ✓ Worker {index} (pid {os.getpid()}) ready "
+          f"{(time.monotonic() - launched) * 1000:.0f} ms after launch", flush=True)
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass
+    finally:
+        server.server_close()
+        # Let requests already being handled finish
+        server.executor.shutdown(wait=True)
+        stop_workers()
+
+
+def spawn(app, listener, args, launched, index):
+    """Fork one worker process and return its pid"""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, listener, args, launched, index)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    return pid
+
+
+def supervise(app, listener, args, launched):
+    """Keep args.workers children running until SIGTERM/SIGINT"""
+    children = {}
+    stopping = False
+    failed = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    started = {}
+    for index in range(args.workers):
+        pid = spawn(app, listener, args, launched, index)
+        children[pid], started[pid] = index, time.monotonic()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        if time.monotonic() - started.pop(pid) < STARTUP_GRACE:
+            # Failing straight away will not be fixed by restarting
+            print(f"✗ Worker {index} (pid {pid}) failed during startup; shutting down",
+                  flush=True)
+            failed = True
+            stop(signal.SIGTERM, None)
+            continue
+        print(f"   ⚠ Worker {index} (pid {pid}) exited with status {status}; restarting",
+              flush=True)
+        pid = spawn(app, listener, args, launched, index)
+        children[pid], started[pid] = index, time.monotonic()
+
+    listener.close()
+    print("✓ Hostel Manager stopped")
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Serve Hostel Manager with several processes')
+    parser.add_argument('--host', default=os.environ.get('HOST', getattr(config, 'HOST', '127.0.0.1')))
+    parser.add_argument('--port', type=int,
+                        default=int(os.environ.get('PORT', getattr(config, 'PORT', 5000))))
+    parser.add_argument('--workers', type=int, default=getattr(config, 'SERVER_WORKERS', 0),
+                        help='Worker processes (default: config.SERVER_WORKERS, 0 = CPU cores)')
+    parser.add_argument('--threads', type=int, default=getattr(config, 'SERVER_THREADS', 4),
+                        help='Request threads per worker (default: config.SERVER_THREADS)')
+    return parser
+
+
+def main(argv=None):
+    """Main function"""
+    args = build_parser().parse_args(argv)
+    if args.workers <= 0:
+        args.workers = os.cpu_count() or 1
+    if not hasattr(os, 'fork'):
+        # No fork() on Windows: one process, still multi-threaded
+        args.workers = 1
+
+    launched = time.monotonic()
+
+    # Every request thread holds a connection (two while a helper nests),
+    # plus job workers and streams
+    needed = args.threads * 2 + getattr(config, 'JOB_WORKERS', 2) + 1
+    if getattr(config, 'DB_POOL_SIZE', 5) < needed:
+        config.DB_POOL_SIZE = needed
+
+    from app import create_app
+    app = create_app(start_background=False)
+    app.debug = False
+    timings = app.config['STARTUP_TIMINGS']
+
+    # Connections must not cross fork(); each worker opens its own
+    reset_pool()
+
+    listener = socket.create_server((args.host, args.port), backlog=128,
+                                    family=socket.AF_INET6 if ':' in args.host else socket.AF_INET)
+    listener.setblocking(False)
+    listener.set_inheritable(True)
+
+    print("=" * 60)
+    print("🏨 Hostel Manager")
+    print("=" * 60)
+    print(f"✓ App loaded in {timings['total'] * 1000:.0f} ms "
+          f"(database {timings['init_db'] * 1000:.0f} ms, caches {timings['caches'] * 1000:.0f} ms)")
+    print(f"🚀 Serving http://{args.host}:{args.port} with {args.workers} worker(s) "
+          f"× {args.threads} thread(s)", flush=True)
+
+    if args.workers == 1 and not hasattr(os, 'fork'):
+        return run_worker(app, listener, args, launched, 0) or 0
+    return supervise(app, listener, args, launched)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Shared fixtures for the Hostel Manager tests
+
+Every test gets its own SQLite file; the shipped hostel_manager.db is never
+opened. Background job threads are not started: tests run jobs directly.
+"""
+
+import pytest
+
+import config
+import app.database.connection as connection
+
+STUDENT_DEFAULTS = {
+    'full_name': 'Test Student',
+    'date_of_birth': '2004-01-01',
+    'mobile_number': '9876543210',
+    'college_name': 'College A',
+    'parent_names': 'Parent',
+    'gender': 'Male',
+    'registration_date': '2024-01-01',
+    'session_expiration_date': '2025-06-30',
+    'full_address': 'Address',
+    'email': 'student@example.com',
+    'emergency_contact': 'Contact',
+    'total_fee': 30000,
+    'installment_count': 3,
+}
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Point the app at an empty, migrated database in a temporary directory"""
+    from app.utils import installment_manager
+    from app.utils.settings_store import load_settings
+    from app.utils.dashboard_stats import invalidate_dashboard_cache
+    from app.utils.vacancy_index import invalidate_vacancy_index
+
+    monkeypatch.setattr(config, 'JOB_WORKERS', 0)
+    monkeypatch.setattr(connection, 'DATABASE_PATH', str(tmp_path / 'test.db'))
+    monkeypatch.setattr(installment_manager, '_aging_refreshed_on', None)
+    monkeypatch.setattr(installment_manager, '_overdue_refreshed_on', None)
+    connection.reset_pool()
+    invalidate_vacancy_index()
+    invalidate_dashboard_cache()
+    connection.init_db()
+    load_settings()
+    yield connection.DATABASE_PATH
+    connection.reset_pool()
+    invalidate_vacancy_index()
+    invalidate_dashboard_cache()
+
+
+@pytest.fixture
+def app(database):
+    from app import create_app
+
+    flask_app = create_app()
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    """Test client logged in as a freshly created admin"""
+    from app.utils.auth import create_admin_user
+
+    create_admin_user('admin', 'secret-password')
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['admin_id'] = 1
+    return test_client
+
+
+@pytest.fixture
+def add_student(database):
+    """Insert a student (with installments); returns its Aadhaar number"""
+    from app.database.models import Student
+    from app.utils.installment_manager import create_installments
+
+    counter = iter(range(1, 100000))
+
+    def add(aadhaar_number=None, installments=True, **fields):
+        number = next(counter)
+        data = dict(STUDENT_DEFAULTS, admission_number=f'ADM-{number}',
+                    aadhaar_number=aadhaar_number or str(100000000000 + number))
+        data.update(fields)
+        success, message = Student.add_student(data)
+        assert success, message
+        if installments:
+            success, message = create_installments(
+                data['aadhaar_number'], float(data['total_fee']),
+                int(data['installment_count']), data['registration_date'])
+            assert success, message
+        return data['aadhaar_number']
+
+    return add
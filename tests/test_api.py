@@ -0,0 +1,70 @@
+"""Tests for the /api/v1 conditional GET handling and paging"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.routes.api as api
+
+
+class Tomorrow(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.now(tz) + timedelta(days=1)
+
+
+def test_unchanged_students_answer_304(client, add_student):
+    add_student()
+    first = client.get('/api/v1/students')
+    etag = first.headers['ETag']
+
+    again = client.get('/api/v1/students', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+
+    add_student()
+    changed = client.get('/api/v1/students', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert len(changed.get_json()['data']) == 2
+
+
+def test_installment_validators_expire_at_midnight(client, add_student, monkeypatch):
+    add_student()
+    first = client.get('/api/v1/installments')
+    headers = {'If-None-Match': first.headers['ETag']}
+    assert client.get('/api/v1/installments', headers=headers).status_code == 304
+
+    monkeypatch.setattr(api, 'datetime', Tomorrow)
+    assert client.get('/api/v1/installments', headers=headers).status_code == 200
+    modified_since = {'If-Modified-Since': first.headers['Last-Modified']}
+    assert client.get('/api/v1/installments', headers=modified_since).status_code == 200
+
+
+def test_student_validators_do_not_depend_on_the_date(client, add_student, monkeypatch):
+    add_student()
+    etag = client.get('/api/v1/students').headers['ETag']
+
+    monkeypatch.setattr(api, 'datetime', Tomorrow)
+    assert client.get('/api/v1/students', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_keyset_pages_cover_every_row_once(client, add_student):
+    expected = {add_student() for _ in range(5)}
+    seen = []
+    url = '/api/v1/students?limit=2&fields=aadhaar_number'
+    while url:
+        payload = client.get(url).get_json()
+        seen += [row['aadhaar_number'] for row in payload['data']]
+        cursor = payload['next_cursor']
+        url = f'/api/v1/students?limit=2&fields=aadhaar_number&cursor={cursor}' if cursor else None
+
+    assert sorted(seen) == sorted(expected)
+
+
+@pytest.mark.parametrize('values', [[[1], [2]], [{'a': 1}, 1], 'text', [1]])
+def test_crafted_cursor_is_a_400(client, values):
+    cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    assert client.get(f'/api/v1/students?cursor={cursor}').status_code == 400
+    assert client.get(f'/students/?cursor={cursor}').status_code == 400
@@ -0,0 +1,145 @@
+"""Tests for admin login: throttling and password hash upgrades"""
+
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from app.database.connection import get_db_connection
+from app.utils import auth
+from app.utils.auth import LoginThrottle, create_admin_user, verify_admin_credentials
+from app.utils.passwords import verify_password
+
+
+@pytest.fixture(autouse=True)
+def cheap_hashes(monkeypatch):
+    """Low hashing cost and an empty throttle for every test"""
+    monkeypatch.setattr(config, 'PASSWORD_HASHER', 'scrypt')
+    monkeypatch.setattr(config, 'PASSWORD_SCRYPT_N', 2 ** 10, raising=False)
+    monkeypatch.setattr(config, 'PASSWORD_PBKDF2_ITERATIONS', 1000, raising=False)
+    monkeypatch.setattr(auth, 'login_throttle', LoginThrottle())
+    monkeypatch.setattr(auth, '_dummy_hash', None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls the throttle's notion of time"""
+    now = [1000.0]
+    monkeypatch.setattr(auth, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def admin(database):
+    success, message = create_admin_user('warden', 'correct-horse')
+    assert success, message
+    return 'warden'
+
+
+def stored_hash(username):
+    conn = get_db_connection()
+    try:
+        return conn.execute('SELECT password_hash FROM admin_users WHERE username = ?',
+                            (username,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def set_stored_hash(username, password_hash):
+    conn = get_db_connection()
+    try:
+        conn.execute('UPDATE admin_users SET password_hash = ? WHERE username = ?',
+                     (password_hash, username))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_correct_password_logs_in(admin):
+    success, admin_id, message = verify_admin_credentials(admin, 'correct-horse', '10.0.0.1')
+    assert (success, admin_id) == (True, 1), message
+    assert not verify_admin_credentials(admin, 'wrong', '10.0.0.1')[0]
+    assert not verify_admin_credentials('nobody', 'correct-horse', '10.0.0.1')[0]
+
+
+def test_username_is_locked_after_too_many_failures(admin, clock, monkeypatch):
+    for _ in range(config.LOGIN_MAX_FAILURES):
+        assert verify_admin_credentials(admin, 'wrong', '10.0.0.1')[2] == \
+            'Invalid username or password'
+
+    # Refused before any hashing, even with the right password
+    checks = []
+    monkeypatch.setattr(auth, 'verify_password', lambda *args: checks.append(args))
+    success, _, message = verify_admin_credentials(admin, 'correct-horse', '10.0.0.2')
+    assert not success
+    assert message.startswith('Too many failed login attempts')
+    assert checks == []
+
+
+def test_lock_expires_after_the_window(admin, clock):
+    for _ in range(config.LOGIN_MAX_FAILURES):
+        verify_admin_credentials(admin, 'wrong', '10.0.0.1')
+    assert not verify_admin_credentials(admin, 'correct-horse')[0]
+
+    clock[0] += config.LOGIN_THROTTLE_WINDOW + 1
+    assert verify_admin_credentials(admin, 'correct-horse')[0]
+
+
+def test_success_clears_username_failures(admin, clock):
+    for _ in range(config.LOGIN_MAX_FAILURES - 1):
+        verify_admin_credentials(admin, 'wrong')
+    assert verify_admin_credentials(admin, 'correct-horse')[0]
+
+    # The count starts again from zero
+    for _ in range(config.LOGIN_MAX_FAILURES - 1):
+        verify_admin_credentials(admin, 'wrong')
+    assert verify_admin_credentials(admin, 'correct-horse')[0]
+
+
+def test_address_is_locked_across_usernames(admin, clock, monkeypatch):
+    monkeypatch.setattr(config, 'LOGIN_MAX_FAILURES_PER_ADDRESS', 3)
+    for name in ('alice', 'bob', 'carol'):
+        verify_admin_credentials(name, 'guess', '10.0.0.9')
+
+    assert 'Too many' in verify_admin_credentials(admin, 'correct-horse', '10.0.0.9')[2]
+    assert verify_admin_credentials(admin, 'correct-horse', '10.0.0.10')[0]
+
+
+def test_login_route_reports_lockout(client, clock):
+    for _ in range(config.LOGIN_MAX_FAILURES):
+        client.post('/login', data={'username': 'admin', 'password': 'wrong'})
+
+    response = client.post('/login', data={'username': 'admin', 'password': 'secret-password'})
+    assert response.status_code == 200
+    assert b'Too many failed login attempts' in response.data
+
+
+def test_legacy_hash_is_upgraded_on_login(admin):
+    salt = os.urandom(32)
+    digest = hashlib.pbkdf2_hmac('sha256', b'correct-horse', salt, 100000)
+    set_stored_hash(admin, salt.hex() + digest.hex())
+
+    assert verify_admin_credentials(admin, 'correct-horse')[0]
+
+    upgraded = stored_hash(admin)
+    assert upgraded.startswith('scrypt$1024$')
+    assert verify_password('correct-horse', upgraded)
+    assert verify_admin_credentials(admin, 'correct-horse')[0]
+
+
+def test_hash_is_upgraded_when_cost_changes(admin, monkeypatch):
+    monkeypatch.setattr(config, 'PASSWORD_SCRYPT_N', 2 ** 11)
+    assert verify_admin_credentials(admin, 'correct-horse')[0]
+    assert stored_hash(admin).startswith('scrypt$2048$')
+
+
+def test_failed_login_does_not_upgrade(admin, monkeypatch):
+    before = stored_hash(admin)
+    monkeypatch.setattr(config, 'PASSWORD_HASHER', 'pbkdf2_sha256')
+
+    assert not verify_admin_credentials(admin, 'wrong')[0]
+    assert stored_hash(admin) == before
+    assert verify_admin_credentials(admin, 'correct-horse')[0]
+    assert stored_hash(admin).startswith('pbkdf2_sha256$1000$')
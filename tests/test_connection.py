@@ -0,0 +1,117 @@
+"""Tests for the connection pool, request-scoped connections and write_transaction"""
+
+import sqlite3
+
+import pytest
+
+from app.database.connection import get_db_connection, get_pool, write_transaction
+
+
+def count_rooms():
+    conn = get_db_connection()
+    try:
+        return conn.execute('SELECT COUNT(*) FROM rooms').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_close_returns_connection_to_pool(database):
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    conn.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R1', 2, 0)")
+    conn.close()
+
+    again = get_db_connection()
+    try:
+        assert again is conn
+        assert again.row_factory is None
+        assert not again.in_transaction
+    finally:
+        again.close()
+    assert count_rooms() == 0
+    assert get_pool().stats()['idle'] == get_pool().stats()['size']
+
+
+def test_request_reuses_one_connection(app):
+    with app.app_context():
+        first = get_db_connection()
+        first.close()
+        second = get_db_connection()
+        second.close()
+        assert first is second
+
+
+def test_nested_helper_does_not_disturb_outer(app):
+    with app.app_context():
+        outer = get_db_connection()
+        outer.row_factory = sqlite3.Row
+        outer.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R1', 2, 0)")
+
+        inner = get_db_connection()
+        assert inner is not outer
+        inner.execute('SELECT 1').fetchall()
+        inner.close()
+
+        assert outer.row_factory is sqlite3.Row
+        assert outer.in_transaction
+        outer.commit()
+        outer.close()
+        assert count_rooms() == 1
+
+
+def test_close_on_request_connection_rolls_back(app):
+    with app.app_context():
+        conn = get_db_connection()
+        conn.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R1', 2, 0)")
+        conn.close()
+        assert count_rooms() == 0
+
+
+def test_leaked_request_connection_is_not_shared(app):
+    with app.app_context():
+        leaked = get_db_connection()
+        leaked.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R1', 2, 0)")
+
+        # Later helpers get their own connection and cannot see or end the
+        # leaked transaction
+        assert count_rooms() == 0
+        assert leaked.in_transaction
+    # Teardown hands everything back and discards the uncommitted row
+    stats = get_pool().stats()
+    assert stats['idle'] == stats['size']
+    assert count_rooms() == 0
+
+
+def test_write_transaction_commits_and_rolls_back(database):
+    conn = get_db_connection()
+    try:
+        with write_transaction(conn):
+            conn.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R1', 2, 0)")
+        with pytest.raises(RuntimeError):
+            with write_transaction(conn):
+                conn.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R2', 2, 0)")
+                raise RuntimeError('boom')
+    finally:
+        conn.close()
+    assert count_rooms() == 1
+
+
+def test_nested_write_transaction_leaves_outer_work_alone(database):
+    conn = get_db_connection()
+    try:
+        conn.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R1', 2, 0)")
+
+        with pytest.raises(RuntimeError):
+            with write_transaction(conn):
+                conn.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R2', 2, 0)")
+                raise RuntimeError('boom')
+        with write_transaction(conn):
+            conn.execute("INSERT INTO rooms (room_number, capacity, occupied_count) VALUES ('R3', 2, 0)")
+
+        # Neither block committed or rolled back the caller's transaction
+        assert conn.in_transaction
+        conn.commit()
+        rooms = [row[0] for row in conn.execute('SELECT room_number FROM rooms ORDER BY 1')]
+    finally:
+        conn.close()
+    assert rooms == ['R1', 'R3']
@@ -0,0 +1,214 @@
+"""Tests for reminder emails, sent to a minimal SMTP server on localhost"""
+
+import base64
+import socketserver
+import threading
+from email import message_from_bytes
+
+import pytest
+
+import config
+from app.utils import email_service
+from app.utils.job_queue import claim_next_job, get_job, run_job
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        stub = self.server
+        with stub.lock:
+            stub.connections += 1
+        sent_here = 0
+        self.reply('220 localhost ESMTP stub')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode().strip().partition(' ')
+            command = command.upper()
+            if command == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 AUTH PLAIN')
+            elif command == 'AUTH':
+                credentials = base64.b64decode(argument.split()[1]).split(b'\0')
+                if credentials[2].decode() == stub.password:
+                    self.reply('235 Authentication successful')
+                else:
+                    self.reply('535 Authentication failed')
+            elif command == 'MAIL':
+                if stub.drop_after and sent_here >= stub.drop_after:
+                    # The server gave up on an idle session
+                    return
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                address = argument.split(':', 1)[1].strip('<>')
+                if address in stub.deferred:
+                    self.reply('451 Try again later')
+                else:
+                    self.reply('550 No such user' if address in stub.refused else '250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                with stub.lock:
+                    stub.messages.append(message_from_bytes(data))
+                sent_here += 1
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.password = 'app-password'
+        self.refused = set()
+        self.deferred = set()
+        self.drop_after = 0
+        self.connections = 0
+        self.messages = []
+
+    def recipients(self):
+        return sorted(message['To'] for message in self.messages)
+
+
+@pytest.fixture
+def smtp_server(database, monkeypatch):
+    """A local SMTP server, with the email settings pointing at it"""
+    server = StubSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(config, 'SMTP_USE_TLS', False, raising=False)
+    monkeypatch.setattr(config, 'SMTP_MESSAGES_PER_SECOND', 0, raising=False)
+    monkeypatch.setattr(config, 'SMTP_MAX_CONNECTIONS', 2, raising=False)
+    monkeypatch.setattr(config, 'JOB_RETRY_BACKOFF', 0)
+    monkeypatch.setattr(email_service, '_rate_limiters', {})
+    success, message = email_service.save_email_config(
+        'office@example.com', server.password, '127.0.0.1', str(server.server_address[1]))
+    assert success, message
+
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def overdue(count, domain='example.com'):
+    return [{'full_name': f'Student {i}', 'email': f'student{i}@{domain}',
+             'amount': 1000, 'due_date': '2024-01-10'} for i in range(count)]
+
+
+def test_single_reminder_is_delivered(smtp_server):
+    success, message = email_service.send_reminder_email(
+        'student@example.com', 'Test Student', 1500, '2024-01-10')
+
+    assert success, message
+    [sent] = smtp_server.messages
+    assert sent['To'] == 'student@example.com'
+    assert sent['From'] == 'office@example.com'
+    assert '2024-01-10' in sent.get_payload(0).get_payload(decode=True).decode()
+
+
+def test_bulk_reminders_reuse_sessions(smtp_server):
+    total, sent, failed, errors = email_service.send_bulk_reminders(overdue(10))
+
+    assert (total, sent, failed, errors) == (10, 10, 0, [])
+    assert len(smtp_server.messages) == 10
+    assert smtp_server.connections <= 2
+
+
+def test_dropped_session_reconnects(smtp_server):
+    smtp_server.drop_after = 3
+
+    total, sent, failed, errors = email_service.send_bulk_reminders(overdue(10))
+
+    assert (sent, failed) == (10, 0), errors
+    assert smtp_server.recipients() == sorted(s['email'] for s in overdue(10))
+    assert smtp_server.connections > 2
+
+
+def test_refused_recipient_does_not_stop_the_batch(smtp_server):
+    students = overdue(5)
+    smtp_server.refused.add(students[2]['email'])
+
+    total, sent, failed, errors = email_service.send_bulk_reminders(students)
+
+    assert (sent, failed) == (4, 1)
+    assert errors[0].startswith('Student 2:')
+    assert smtp_server.connections <= 2
+
+
+def test_bad_password_fails_every_reminder(smtp_server):
+    smtp_server.password = 'something-else'
+
+    total, sent, failed, errors = email_service.send_bulk_reminders(overdue(6))
+
+    assert (sent, failed) == (0, 6)
+    assert all('authentication failed' in error for error in errors)
+    assert smtp_server.messages == []
+
+
+def test_missing_configuration_sends_nothing(database):
+    total, sent, failed, errors = email_service.send_bulk_reminders(overdue(2))
+
+    assert (total, sent, failed) == (2, 0, 2)
+    assert 'not set' in errors[0]
+
+
+def run_next_job():
+    job = claim_next_job('test-worker')
+    assert job is not None
+    run_job(job)
+    return get_job(job['id'])
+
+
+def test_reminder_job_retry_skips_students_already_sent(smtp_server):
+    students = overdue(5)
+    smtp_server.deferred.add(students[3]['email'])
+    job_id = email_service.start_bulk_reminders(students)
+
+    job = run_next_job()
+    assert job['status'] == 'queued'
+    assert 'will be retried' in job['error']
+    assert len(smtp_server.messages) == 4
+
+    smtp_server.deferred.clear()
+    job = run_next_job()
+    assert job['id'] == job_id and job['status'] == 'completed'
+    assert job['result'] == {'total': 5, 'sent': 5, 'failed': 0, 'errors': []}
+    # Every student got exactly one reminder
+    assert smtp_server.recipients() == sorted(s['email'] for s in students)
+
+
+def test_reminder_job_does_not_retry_permanent_refusals(smtp_server):
+    students = overdue(3)
+    smtp_server.refused.add(students[0]['email'])
+    email_service.start_bulk_reminders(students)
+
+    job = run_next_job()
+    assert job['status'] == 'completed'
+    assert (job['result']['sent'], job['result']['failed']) == (2, 1)
+    assert job['result']['errors'][0].startswith('Student 0:')
+
+
+def test_reminder_job_reports_transient_failures_on_last_attempt(smtp_server):
+    students = overdue(3)
+    smtp_server.deferred.add(students[1]['email'])
+    email_service.start_bulk_reminders(students)
+
+    for _ in range(config.JOB_MAX_ATTEMPTS):
+        job = run_next_job()
+
+    assert job['status'] == 'completed'
+    assert (job['result']['sent'], job['result']['failed']) == (2, 1)
+    assert len(smtp_server.messages) == 2
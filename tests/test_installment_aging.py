@@ -0,0 +1,103 @@
+"""Tests for installment aging buckets computed on read"""
+
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from app.database.connection import get_db_connection
+from app.utils.installment_manager import (
+    AGING_BUCKETS, aging_bucket_condition, get_aging_report, get_installments_by_bucket,
+    installment_aging_job, refresh_installment_aging
+)
+
+TODAY = date(2024, 6, 15)
+
+
+def bucket_of(due_offset):
+    """Bucket the stored-bucket SQL gives an installment due due_offset days from TODAY"""
+    from app.database.migrations import AGING_BUCKET_SQL
+
+    conn = sqlite3.connect(':memory:')
+    sql = AGING_BUCKET_SQL.format(row='', today='?')
+    due = (TODAY + timedelta(days=due_offset)).strftime('%Y-%m-%d')
+    bucket = conn.execute(
+        f"SELECT {sql} FROM (SELECT ? AS due_date, 'Pending' AS payment_status)",
+        [TODAY.strftime('%Y-%m-%d')] * sql.count('?') + [due]).fetchone()[0]
+    conn.close()
+    return bucket
+
+
+@pytest.mark.parametrize('names', [
+    [name] for name, _ in AGING_BUCKETS
+] + [['overdue_30', 'overdue_60'], ['due_7', 'not_due'], [name for name, _ in AGING_BUCKETS]])
+def test_condition_matches_the_stored_bucket_definition(names):
+    condition, params = aging_bucket_condition(names, prefix='', today=TODAY)
+    conn = sqlite3.connect(':memory:')
+    for offset in range(-200, 200):
+        due = (TODAY + timedelta(days=offset)).strftime('%Y-%m-%d')
+        matched = conn.execute(
+            f"SELECT 1 FROM (SELECT ? AS due_date, 'Pending' AS payment_status) WHERE {condition}",
+            [due] + params).fetchone() is not None
+        assert matched == (bucket_of(offset) in names), offset
+    conn.close()
+
+
+def test_unknown_bucket_is_rejected():
+    with pytest.raises(ValueError):
+        aging_bucket_condition(['overdue_1000'])
+
+
+def age_stored_buckets_back(days):
+    """Pretend the nightly job last ran `days` ago by shifting every due date"""
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE installments SET due_date = date(due_date, ?)
+    ''', (f'-{days} days',))
+    conn.commit()
+    conn.close()
+
+
+def test_reads_see_current_buckets_before_the_nightly_run(add_student):
+    aadhaar = add_student(registration_date=date.today().strftime('%Y-%m-%d'),
+                          installment_count=1)
+    # Due in 30 days when written; 40 days later it is 10 days overdue, but
+    # only the nightly job would update the stored bucket
+    age_stored_buckets_back(40)
+
+    overdue = get_installments_by_bucket('overdue_30')
+    report = get_aging_report()
+
+    assert [row['aadhaar_number'] for row in overdue] == [aadhaar]
+    assert overdue[0]['aging_bucket'] == 'overdue_30'
+    assert {b['bucket']: b['count'] for b in report['buckets']}['overdue_30'] == 1
+
+
+def test_reads_do_not_write(add_student, database):
+    add_student()
+    # Another process holds the write lock; reads must not wait for it
+    writer = sqlite3.connect(database, timeout=0)
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        get_installments_by_bucket([name for name, _ in AGING_BUCKETS])
+        get_aging_report()
+    finally:
+        writer.rollback()
+        writer.close()
+
+
+def test_nightly_job_rolls_stored_buckets_forward(add_student):
+    add_student(registration_date=date.today().strftime('%Y-%m-%d'), installment_count=1)
+    age_stored_buckets_back(40)
+
+    class Job:
+        id = None
+        will_retry = False
+
+    installment_aging_job(None, Job())
+
+    conn = get_db_connection()
+    stored = conn.execute('SELECT aging_bucket FROM installments').fetchone()[0]
+    conn.close()
+    assert stored == 'overdue_30'
+    assert refresh_installment_aging() == 0
@@ -0,0 +1,128 @@
+"""Tests for job claiming, retries and recovery of jobs left by dead workers"""
+
+import socket
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database.connection import get_db_connection
+from app.utils import job_queue
+from app.utils.job_queue import (PermanentJobError, claim_next_job, enqueue, get_job,
+                                 register_handler, requeue_orphaned_jobs,
+                                 requeue_stale_jobs, run_job)
+
+HOST = socket.gethostname()
+
+
+@pytest.fixture
+def dead_pid():
+    """Pid of a process that has already exited"""
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    return child.pid
+
+
+def mark_running(job_id, locked_by, attempts=1, heartbeat_age=0):
+    beat = (datetime.now() - timedelta(seconds=heartbeat_age)).strftime(job_queue.TIMESTAMP_FORMAT)
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE jobs SET status = 'running', locked_by = ?, attempts = ?,
+                            started_at = ?, heartbeat_at = ?
+            WHERE id = ?
+        ''', (locked_by, attempts, beat, beat, job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@register_handler('test_flaky')
+def flaky_job(payload, job):
+    if job.attempt < payload['succeed_on']:
+        raise RuntimeError('try again')
+    return {'attempt': job.attempt}
+
+
+@register_handler('test_permanent')
+def permanent_job(payload, job):
+    raise PermanentJobError('cannot work')
+
+
+def test_claim_records_owner_and_heartbeat(database):
+    job_id = enqueue('test_flaky', {'succeed_on': 1})
+    job = claim_next_job(f'{HOST}:1:abc-0')
+
+    stored = get_job(job_id)
+    assert job['id'] == job_id and job['attempts'] == 1
+    assert stored['status'] == 'running'
+    assert stored['locked_by'] == f'{HOST}:1:abc-0'
+    assert stored['heartbeat_at'] is not None
+    assert claim_next_job('other') is None
+
+
+def test_failed_job_is_retried_until_it_succeeds(database, monkeypatch):
+    monkeypatch.setattr(job_queue.config, 'JOB_RETRY_BACKOFF', 0)
+    job_id = enqueue('test_flaky', {'succeed_on': 2}, max_attempts=3)
+
+    run_job(claim_next_job('w'))
+    assert get_job(job_id)['status'] == 'queued'
+    run_job(claim_next_job('w'))
+
+    job = get_job(job_id)
+    assert job['status'] == 'completed'
+    assert job['result'] == {'attempt': 2}
+
+
+def test_permanent_error_is_not_retried(database):
+    job_id = enqueue('test_permanent', max_attempts=3)
+    run_job(claim_next_job('w'))
+
+    job = get_job(job_id)
+    assert (job['status'], job['error'], job['attempts']) == ('failed', 'cannot work', 1)
+
+
+def test_jobs_of_exited_process_are_requeued_at_once(database, dead_pid):
+    job_id = enqueue('test_flaky', {'succeed_on': 1})
+    mark_running(job_id, f'{HOST}:{dead_pid}:abc-0')
+
+    assert requeue_orphaned_jobs() == 1
+    job = get_job(job_id)
+    assert (job['status'], job['locked_by']) == ('queued', None)
+    assert 'exited' in job['error']
+
+
+def test_jobs_of_live_processes_are_left_alone(database):
+    parent = enqueue('test_flaky', {'succeed_on': 1})
+    mark_running(parent, f'{HOST}:{job_queue.os.getppid()}:abc-0')
+    elsewhere = enqueue('test_flaky', {'succeed_on': 1})
+    mark_running(elsewhere, 'another-host:1:abc-0')
+
+    assert requeue_orphaned_jobs() == 0
+    assert get_job(parent)['status'] == get_job(elsewhere)['status'] == 'running'
+
+
+def test_orphaned_job_out_of_attempts_fails(database, dead_pid):
+    job_id = enqueue('test_flaky', {'succeed_on': 1}, max_attempts=1)
+    mark_running(job_id, f'{HOST}:{dead_pid}:abc-0', attempts=1)
+
+    assert requeue_orphaned_jobs() == 1
+    job = get_job(job_id)
+    assert job['status'] == 'failed'
+    assert job['finished_at'] is not None
+
+
+def test_stale_sweep_uses_heartbeat(database, monkeypatch):
+    monkeypatch.setattr(job_queue.config, 'JOB_STALE_SECONDS', 60)
+    silent = enqueue('test_flaky', {'succeed_on': 1})
+    mark_running(silent, 'another-host:1:abc-0', heartbeat_age=120)
+    alive = enqueue('test_flaky', {'succeed_on': 1})
+    mark_running(alive, 'another-host:1:abc-1', heartbeat_age=120)
+
+    monkeypatch.setattr(job_queue, '_running', {alive})
+    job_queue.heartbeat()
+
+    assert requeue_stale_jobs() == 1
+    assert get_job(silent)['status'] == 'queued'
+    assert get_job(alive)['status'] == 'running'
@@ -0,0 +1,97 @@
+"""Tests for bulk payment posting and its replay rules"""
+
+from app.database.connection import get_db_connection
+from app.utils.installment_manager import create_installment_schedules
+from app.utils.payment_posting import post_payments, upload_fingerprint
+
+
+def amounts_paid(aadhaar_number):
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT installment_number, amount_paid, payment_status FROM installments
+        WHERE aadhaar_number = ? ORDER BY installment_number
+    ''', (aadhaar_number,)).fetchall()
+    conn.close()
+    return rows
+
+
+def statuses(report):
+    return [row['status'] for row in report['rows']]
+
+
+def test_payment_with_key_is_applied_once(add_student):
+    aadhaar = add_student()
+    payment = {'aadhaar_number': aadhaar, 'amount': 100, 'idempotency_key': 'bank-1'}
+
+    success, report, _ = post_payments([payment])
+    assert success and statuses(report) == ['applied']
+
+    success, report, _ = post_payments([payment])
+    assert success and statuses(report) == ['duplicate']
+    assert report['rows'][0]['amount_applied'] == 100
+    assert amounts_paid(aadhaar)[0][1] == 100
+
+
+def test_identical_keyless_payments_in_one_upload_are_both_applied(add_student):
+    aadhaar = add_student()
+    payment = {'aadhaar_number': aadhaar, 'amount': 100, 'paid_date': '2024-02-01'}
+
+    success, report, _ = post_payments([payment, payment], source=upload_fingerprint(b'one'))
+
+    assert success and statuses(report) == ['applied', 'applied']
+    assert amounts_paid(aadhaar)[0][1] == 200
+
+
+def test_replaying_an_upload_is_a_no_op_but_a_new_upload_applies(add_student):
+    aadhaar = add_student()
+    payment = {'aadhaar_number': aadhaar, 'amount': 100, 'paid_date': '2024-02-01'}
+
+    post_payments([payment], source=upload_fingerprint(b'first'))
+    _, replay, _ = post_payments([payment], source=upload_fingerprint(b'first'))
+    _, later, _ = post_payments([payment], source=upload_fingerprint(b'second'))
+
+    assert statuses(replay) == ['duplicate']
+    assert statuses(later) == ['applied']
+    assert amounts_paid(aadhaar)[0][1] == 200
+
+
+def test_keyless_payment_without_a_source_is_rejected(add_student):
+    aadhaar = add_student()
+
+    success, report, _ = post_payments([{'aadhaar_number': aadhaar, 'amount': 100}])
+
+    assert success and statuses(report) == ['rejected']
+    assert amounts_paid(aadhaar)[0][1] == 0
+
+
+def test_payment_spills_over_into_later_installments(add_student):
+    aadhaar = add_student(total_fee=3000, installment_count=3)
+
+    post_payments([{'aadhaar_number': aadhaar, 'amount': 1500, 'reference': 'r1'}])
+
+    assert amounts_paid(aadhaar) == [(1, 1000, 'Paid'), (2, 500, 'Pending'), (3, 0, 'Pending')]
+
+
+def test_dry_run_saves_nothing(add_student):
+    aadhaar = add_student()
+
+    success, report, _ = post_payments([{'aadhaar_number': aadhaar, 'amount': 100,
+                                         'reference': 'r1'}], dry_run=True)
+
+    assert success and statuses(report) == ['applied']
+    assert amounts_paid(aadhaar)[0][1] == 0
+    _, report, _ = post_payments([{'aadhaar_number': aadhaar, 'amount': 100, 'reference': 'r1'}])
+    assert statuses(report) == ['applied']
+
+
+def test_regenerating_schedules_keeps_partly_paid_students(add_student):
+    partly_paid = add_student(total_fee=3000, installment_count=3)
+    unpaid = add_student(total_fee=3000, installment_count=3)
+    post_payments([{'aadhaar_number': partly_paid, 'amount': 400, 'reference': 'r1'}])
+
+    success, message = create_installment_schedules(
+        [(partly_paid, 6000, 2, '2024-01-01'), (unpaid, 6000, 2, '2024-01-01')], replace=True)
+
+    assert success, message
+    assert amounts_paid(partly_paid) == [(1, 400, 'Pending'), (2, 0, 'Pending'), (3, 0, 'Pending')]
+    assert [row[0] for row in amounts_paid(unpaid)] == [1, 2]
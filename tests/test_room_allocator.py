@@ -0,0 +1,70 @@
+"""Tests for batch room allocation policies"""
+
+import pytest
+
+from app.utils.room_allocator import POLICIES, plan_allocation
+
+
+def student(aadhaar_number, gender, college='College A'):
+    return {'aadhaar_number': aadhaar_number, 'gender': gender, 'college_name': college}
+
+
+def room(room_number, capacity=2, occupants=()):
+    groups = set()
+    for gender, college in occupants:
+        groups.update({('gender', gender), ('college_name', college)})
+    return {'room_number': room_number, 'capacity': capacity,
+            'occupied': len(occupants), 'groups': groups}
+
+
+@pytest.mark.parametrize('policy', ['college', 'gender'])
+def test_grouping_policies_never_share_an_empty_room_across_genders(policy):
+    plan, unplaced = plan_allocation([student('1', 'Male'), student('2', 'Female')],
+                                     [room('R1')], policy)
+
+    assert plan == [('1', 'R1')]
+    assert unplaced == ['2']
+
+
+@pytest.mark.parametrize('policy', ['college', 'gender'])
+def test_grouping_policies_do_not_join_a_room_of_another_gender(policy):
+    plan, unplaced = plan_allocation([student('1', 'Female')],
+                                     [room('R1', occupants=[('Male', 'College A')])], policy)
+
+    assert plan == []
+    assert unplaced == ['1']
+
+
+def test_college_overflow_goes_to_a_same_gender_room():
+    students = [student('1', 'Male', 'College A'), student('2', 'Male', 'College B')]
+    plan, unplaced = plan_allocation(students, [room('R1', capacity=3,
+                                                     occupants=[('Male', 'College A')])],
+                                     'college')
+
+    assert sorted(plan) == [('1', 'R1'), ('2', 'R1')]
+    assert unplaced == []
+
+
+def test_college_policy_keeps_colleges_in_separate_rooms_when_it_can():
+    students = [student(str(i), 'Male', college) for i, college in
+                enumerate(['College A', 'College B', 'College A', 'College B'])]
+    plan, unplaced = plan_allocation(students, [room('R1'), room('R2')], 'college')
+
+    rooms = {}
+    for aadhaar_number, room_number in plan:
+        rooms.setdefault(room_number, set()).add(students[int(aadhaar_number)]['college_name'])
+    assert unplaced == []
+    assert all(len(colleges) == 1 for colleges in rooms.values())
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+def test_preferences_are_honoured_first(policy):
+    plan, _ = plan_allocation([student('1', 'Male')], [room('R1'), room('R2')], policy,
+                              preferences={'1': ['R2']})
+
+    assert plan == [('1', 'R2')]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        plan_allocation([], [], 'bogus')
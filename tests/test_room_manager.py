@@ -0,0 +1,65 @@
+"""Tests for bed claims in app.utils.room_manager"""
+
+import threading
+
+from app.database.connection import get_db_connection
+from app.utils.room_manager import allocate_room_to_student, create_room, set_room_capacity
+from app.utils.vacancy_index import get_vacancy_index
+
+
+def room_counts():
+    conn = get_db_connection()
+    try:
+        return conn.execute('''
+            SELECT r.room_number, r.capacity, r.occupied_count,
+                   (SELECT COUNT(*) FROM students s WHERE s.room_allocation = r.room_number)
+            FROM rooms r ORDER BY r.room_number
+        ''').fetchall()
+    finally:
+        conn.close()
+
+
+def test_concurrent_allocations_never_overfill(add_student):
+    set_room_capacity(2)
+    for room in ('101', '102', '103'):
+        create_room(room)
+    students = [add_student(installments=False) for _ in range(10)]
+
+    results = {}
+    barrier = threading.Barrier(len(students))
+
+    def allocate(aadhaar_number):
+        barrier.wait()
+        results[aadhaar_number] = allocate_room_to_student(aadhaar_number)
+
+    threads = [threading.Thread(target=allocate, args=(s,)) for s in students]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    placed = [r for r in results.values() if r[0]]
+    assert len(placed) == 6
+    assert all(r[2] == 'No available rooms' for r in results.values() if not r[0])
+    for room_number, capacity, occupied, actual in room_counts():
+        assert occupied == actual == capacity, room_number
+
+
+def test_stale_vacancy_index_does_not_overfill(add_student):
+    set_room_capacity(1)
+    create_room('101')
+    create_room('102')
+    first, second = add_student(installments=False), add_student(installments=False)
+    get_vacancy_index().ensure_fresh()
+
+    # Another process fills room 101 behind the index's back
+    conn = get_db_connection()
+    try:
+        conn.execute("UPDATE students SET room_allocation = '101' WHERE aadhaar_number = ?",
+                     (first,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    assert allocate_room_to_student(second)[:2] == (True, '102')
+    assert [row[2:] for row in room_counts()] == [(1, 1), (1, 1)]
@@ -0,0 +1,26 @@
+"""
+WSGI entry point for Hostel Manager
+
+Any WSGI server can serve `wsgi:application`, for example:
+
+    gunicorn --workers 4 --threads 4 wsgi:application
+    waitress-serve --threads 8 wsgi:application
+
+Or use the bundled pre-forking launcher, which needs no extra packages:
+
+    python serve.py --workers 4 --threads 4
+
+The database is initialised and migrated, and the background job threads
+are started, when this module is imported. Do not use `gunicorn --preload`:
+the master would then fork its workers while those threads and the
+connection pool's lock are live. Without it each worker imports this module
+and starts its own. (serve.py creates the app before forking safely, as it
+defers the job threads until after fork.)
+"""
+
+from app import create_app
+
+application = create_app()
+application.debug = False
+
+app = application